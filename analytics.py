@@ -0,0 +1,147 @@
+# analytics.py
+# Order aggregates (orders, units, revenue) per day, per product per day and per customer per day,
+# updated in the same transaction that saves each order. Stats for any date range are summed
+# from these day buckets, so they never rescan the orders table.
+
+import sqlite3
+from config import DB_NAME
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS order_stats_daily (
+        day TEXT PRIMARY KEY,
+        orders INTEGER NOT NULL DEFAULT 0,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS order_stats_product (
+        day TEXT NOT NULL,
+        item TEXT NOT NULL,
+        item_id INTEGER,
+        orders INTEGER NOT NULL DEFAULT 0,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, item)
+    );
+    CREATE TABLE IF NOT EXISTS order_stats_customer (
+        day TEXT NOT NULL,
+        customer TEXT NOT NULL,
+        name TEXT,
+        orders INTEGER NOT NULL DEFAULT 0,
+        units INTEGER NOT NULL DEFAULT 0,
+        revenue INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, customer)
+    );
+"""
+
+# One statement per bucket table; the orders are bound as (day, item, item_id, customer, name, quantity, revenue)
+UPSERTS = [
+    """INSERT INTO order_stats_daily (day, orders, units, revenue) VALUES (:day, 1, :quantity, :revenue)
+       ON CONFLICT(day) DO UPDATE SET orders = orders + 1, units = units + excluded.units,
+                                      revenue = revenue + excluded.revenue""",
+    """INSERT INTO order_stats_product (day, item, item_id, orders, units, revenue)
+       VALUES (:day, :item, :item_id, 1, :quantity, :revenue)
+       ON CONFLICT(day, item) DO UPDATE SET orders = orders + 1, units = units + excluded.units,
+                                            revenue = revenue + excluded.revenue,
+                                            item_id = COALESCE(excluded.item_id, item_id)""",
+    """INSERT INTO order_stats_customer (day, customer, name, orders, units, revenue)
+       VALUES (:day, :customer, :name, 1, :quantity, :revenue)
+       ON CONFLICT(day, customer) DO UPDATE SET orders = orders + 1, units = units + excluded.units,
+                                                revenue = revenue + excluded.revenue, name = excluded.name""",
+]
+
+def _bucket_row(order):
+    quantity = order.get("quantity") or 1
+    return {
+        "day": (order.get("timestamp") or "")[:10],  # "" collects legacy orders without a timestamp
+        "item": order.get("item") or "",
+        "item_id": order.get("item_id"),
+        # Contact number identifies a customer better than the free-text name
+        "customer": order.get("contact_number") or order.get("customer_name") or "",
+        "name": order.get("customer_name"),
+        "quantity": quantity,
+        "revenue": (order.get("price") or 0) * quantity,
+    }
+
+def record_orders(conn, orders):
+    """Add saved orders to the aggregates; call inside the transaction that inserted them."""
+    rows = [_bucket_row(order) for order in orders]
+    for statement in UPSERTS:
+        conn.executemany(statement, rows)
+
+def init_analytics():
+    """Create the aggregate tables; the first time, backfill them from existing orders."""
+    conn = sqlite3.connect(DB_NAME, timeout=30)
+    try:
+        with conn:
+            # Check, create and backfill under one write lock, so workers starting together
+            # cannot both backfill (and double-count) the aggregates. Not executescript: it
+            # would commit the transaction first.
+            conn.execute("BEGIN IMMEDIATE")
+            empty = not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'order_stats_daily'"
+            ).fetchone()
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            if empty:
+                _backfill(conn)
+    finally:
+        conn.close()
+
+def rebuild():
+    """Recompute every aggregate from the orders table (one full scan)."""
+    conn = sqlite3.connect(DB_NAME)
+    with conn:
+        conn.execute("DELETE FROM order_stats_daily")
+        conn.execute("DELETE FROM order_stats_product")
+        conn.execute("DELETE FROM order_stats_customer")
+        _backfill(conn)
+    conn.close()
+
+def _backfill(conn):
+    cur = conn.execute("SELECT customer_name, contact_number, item_id, item, price, quantity, timestamp FROM orders")
+    names = [d[0] for d in cur.description]
+    while True:
+        batch = cur.fetchmany(1000)
+        if not batch:
+            break
+        record_orders(conn, [dict(zip(names, row)) for row in batch])
+
+def _range(start, end):
+    clauses, params = [], []
+    if start:
+        clauses.append("day >= ?")
+        params.append(start)
+    if end:
+        clauses.append("day <= ?")
+        params.append(end)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+def order_stats(start=None, end=None, top=10):
+    """Totals, per-day series and top products/customers for days in [start, end] (YYYY-MM-DD, inclusive)."""
+    where, params = _range(start, end)
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    days = [{"day": r[0], "orders": r[1], "units": r[2], "revenue": r[3]} for r in c.execute(
+        f"SELECT day, orders, units, revenue FROM order_stats_daily{where} ORDER BY day", params
+    )]
+    products = [{"item": r[0], "item_id": r[1], "orders": r[2], "units": r[3], "revenue": r[4]} for r in c.execute(
+        f"""SELECT item, MAX(item_id), SUM(orders), SUM(units), SUM(revenue) FROM order_stats_product{where}
+            GROUP BY item ORDER BY SUM(revenue) DESC LIMIT ?""", params + [top]
+    )]
+    customers = [{"customer": r[0], "name": r[1], "orders": r[2], "units": r[3], "revenue": r[4]} for r in c.execute(
+        f"""SELECT customer, MAX(name), SUM(orders), SUM(units), SUM(revenue) FROM order_stats_customer{where}
+            GROUP BY customer ORDER BY SUM(revenue) DESC LIMIT ?""", params + [top]
+    )]
+    conn.close()
+    return {
+        "range": {"start": start, "end": end},
+        "totals": {
+            "orders": sum(d["orders"] for d in days),
+            "units": sum(d["units"] for d in days),
+            "revenue": sum(d["revenue"] for d in days),
+        },
+        "by_day": days,
+        "top_products": products,
+        "top_customers": customers,
+    }
@@ -0,0 +1,104 @@
+# api_client.py
+# HTTP client for the app.py backend, used by streamlit_app.py in thin-client mode (BACKEND_URL).
+# One pooled keep-alive session per process, connect/read timeouts on every call, NDJSON
+# streaming for chat; only requests that are safe to repeat are retried.
+
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from config import BACKEND_URL, BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT, BACKEND_POOL_SIZE, ADMIN_TOKEN
+
+
+class BackendError(Exception):
+    """The backend could not be reached or refused the request (retry_after is set for 429)."""
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Shared requests.Session with a connection pool sized for concurrent Streamlit sessions."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=BACKEND_POOL_SIZE, pool_block=False)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                if ADMIN_TOKEN:
+                    session.headers["X-Admin-Token"] = ADMIN_TOKEN
+                _session = session
+    return _session
+
+def _request(method, path, attempts=1, **kwargs):
+    """Send a request; connection failures are retried up to `attempts` times in total."""
+    kwargs.setdefault("timeout", (BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT))
+    for attempt in range(attempts):
+        try:
+            response = get_session().request(method, BACKEND_URL.rstrip("/") + path, **kwargs)
+            break
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt + 1 == attempts:
+                raise BackendError(f"Backend unreachable: {e}") from e
+    if response.status_code == 429:
+        response.close()
+        raise BackendError("Backend busy", 429, int(response.headers.get("Retry-After", "1")))
+    if response.status_code >= 400:
+        response.close()
+        raise BackendError(f"Backend error {response.status_code}", response.status_code)
+    return response
+
+def chat_stream(name, email, message):
+    """Yield /chat/stream events: {"delta": text} chunks, then {"done": True, "response", "action", "order_draft"}.
+
+    Raises BackendError (status 429) when the backend is busy, before or inside the stream.
+    """
+    # Not retried: the backend may already have recorded the message
+    response = _request("POST", "/chat/stream", json={"name": name, "email": email, "message": message}, stream=True)
+    with response:
+        try:
+            for line in response.iter_lines():
+                if line:
+                    event = json.loads(line)
+                    if event.get("error"):
+                        raise BackendError("Backend busy", 429, event.get("retry_after") or 1)
+                    yield event
+        except requests.RequestException as e:
+            raise BackendError(f"Chat stream interrupted: {e}") from e
+
+def place_order(name, address, contact_number, item_id, quantity, idempotency_key):
+    """POST /order; safe to retry because the idempotency key prevents a second order."""
+    return _request("POST", "/order", attempts=2, json={
+        "name": name, "address": address, "contact_number": contact_number,
+        "item_id": item_id, "quantity": quantity, "idempotency_key": idempotency_key,
+    }).json()
+
+def list_products(page=1, per_page=20, query=None):
+    """(items, total) like catalog.list_products."""
+    params = {"page": page, "per_page": per_page}
+    if query:
+        params["q"] = query
+    body = _request("GET", "/products", attempts=2, params=params).json()
+    return body["items"], body["total"]
+
+def get_product(product_id):
+    try:
+        return _request("GET", f"/products/{int(product_id)}", attempts=2).json()
+    except BackendError as e:
+        if e.status == 404:
+            return None
+        raise
+
+def session_emails(limit=100):
+    return _request("GET", "/sessions", attempts=2, params={"limit": limit}).json()["sessions"]
+
+def session_history(email, limit=200):
+    return _request("GET", f"/sessions/{requests.utils.quote(email, safe='')}/history", attempts=2,
+                    params={"limit": limit}).json()["history"]
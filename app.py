@@ -1,49 +1,165 @@
 # app.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import google.generativeai as genai
-import requests, json, sqlite3, os, difflib
-from config import GEMINI_API_KEY, HF_API_KEY, KB_FILE, DB_NAME, init_db, save_lead
-from rag import extract_url, scrape_website, build_rag_for_user, retrieve_from_rag  # Import RAG helpers
+from typing import List, Optional
+from datetime import date
+import requests, json, sqlite3, os, difflib, threading, time, hmac, asyncio
+from config import (GEMINI_API_KEY, GEMINI_API_ENDPOINT, HF_API_KEY, HF_API_URL, KB_FILE, DB_NAME, ORDER_BATCH_MAX, ADMIN_TOKEN,
+                    LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT, LLM_DEADLINE, RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST,
+                    WARMUP_ENABLED, WARMUP_TENANTS, WARMUP_TENANT_DAYS, CHAT_BATCH_MAX, CHAT_BATCH_CONCURRENCY, init_app)
+from database import save_lead, save_leads, save_order, save_orders, recent_active_emails, session_emails, session_history, search_leads
+from catalog import get_product, get_products, list_products, product_listing
+from matcher import order_reply
+from analytics import order_stats
+from limiter import ConcurrencyLimiter, TokenBuckets, Rejected
+from singleflight import SingleFlight
+import memstats
+from memory import load_memory, remember, remember_many, fingerprint, build_prompt
+from export import TABLES as EXPORT_TABLES, FORMATS as EXPORT_FORMATS, export_lines
+from leads_archive import MAINTENANCE as LEADS_MAINTENANCE, archived_months, iter_archived, start_maintenance
+from rag import (extract_url, ingest_url, retrieve_from_rag, retrieve_batch, get_embedder, load_rag, query_key, store_stats,  # Import RAG helpers
+                 start_janitor, JANITOR as RAG_JANITOR)
 
 app = FastAPI(title="Customer Support Chatbot with Ordering")
-genai.configure(api_key=GEMINI_API_KEY)
-init_db()
+
+# Warm-up progress, reported by /readyz
+WARMUP = {"ready": False, "steps": {}}
+
+FALLBACK_REPLY = "I'm having trouble connecting right now, but our team is here to help! Call +92-300-1234567 or email support@yourbusiness.com"
+BUSY_REPLY = "We're receiving a lot of messages right now. Please try again in a moment."
+
+# Admission control for Gemini/HF calls, reported by /metrics
+LLM_LIMITER = ConcurrencyLimiter(LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE)
+TENANT_LIMITS = TokenBuckets(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+# Identical concurrent questions (same tenant RAG version) share one LLM call
+LLM_FLIGHTS = SingleFlight()
+memstats.register("llm.rate_limit_buckets", TENANT_LIMITS.memory)
+
+@app.on_event("startup")
+def startup():
+    init_app()
+    start_maintenance()  # leads archiving, checkpoints and vacuum, off the request path
+    start_janitor()  # RAG storage tiers: archive idle tenant indexes, enforce the disk budget
+    if WARMUP_ENABLED:
+        # In the background so /healthz answers while the worker warms up
+        threading.Thread(target=warmup, name="warmup", daemon=True).start()
+    else:
+        WARMUP["ready"] = True
 
 # --------------------------
 # Helper Functions
 # --------------------------
+_genai = None
+_genai_lock = threading.Lock()
+
+def get_genai():
+    """google.generativeai, imported and configured on first use (it is slow to import)."""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                if GEMINI_API_ENDPOINT:
+                    # REST transport lets us point Gemini at a local (stub) server
+                    genai.configure(api_key=GEMINI_API_KEY, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+                else:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                _genai = genai
+    return _genai
+
+# List of models to try in order
+GEMINI_MODELS = [
+    "gemini-2.5-flash",
+    "gemini-flash-latest",
+    "gemini-pro-latest",
+    "gemini-2.0-flash-exp",
+]
+_gemini_models = {}
+
+def get_gemini_model(model_name):
+    """Cached GenerativeModel per model name."""
+    model = _gemini_models.get(model_name)
+    if model is None:
+        model = _gemini_models[model_name] = get_genai().GenerativeModel(model_name)
+    return model
+
+_kb = None  # (mtime, questions, {question: answer})
+_kb_lock = threading.Lock()
+memstats.register("knowledge_base", lambda: {"entries": len(_kb[1]) if _kb else 0, "bytes": memstats.approx_size(_kb)})
+
+def load_knowledge_base():
+    """KB questions and answers, parsed once and re-read only when the file changes."""
+    global _kb
+    mtime = os.stat(KB_FILE).st_mtime_ns
+    if _kb is None or _kb[0] != mtime:
+        with _kb_lock:
+            if _kb is None or _kb[0] != mtime:
+                with open(KB_FILE, "r", encoding="utf-8") as f:
+                    kb = json.load(f)
+                answers = {}
+                for item in kb:
+                    answers.setdefault(item["question"], item["answer"])  # first entry wins, as before
+                _kb = (mtime, list(answers), answers)
+    return _kb[1], _kb[2]
+
 def search_knowledge_base(query):
     try:
-        with open(KB_FILE, "r", encoding="utf-8") as f:
-            kb = json.load(f)
-        questions = [item["question"] for item in kb]
+        questions, answers = load_knowledge_base()
         match = difflib.get_close_matches(query, questions, n=1, cutoff=0.6)
         if match:
-            for item in kb:
-                if item["question"] == match[0]:
-                    return item["answer"]
+            return answers[match[0]]
     except Exception as e:
         print("KB Error:", e)
     return None
 
-def get_gemini_response(query, email=None):
+def warmup():
+    """Load everything the first requests would otherwise pay for, then mark the worker ready."""
+    def step(name, fn):
+        started = time.perf_counter()
+        try:
+            detail = fn()
+            WARMUP["steps"][name] = {"ok": True, "seconds": round(time.perf_counter() - started, 3), "detail": detail}
+        except Exception as e:
+            print(f"Warm-up step {name} failed: {e}")
+            WARMUP["steps"][name] = {"ok": False, "seconds": round(time.perf_counter() - started, 3), "error": str(e)}
+
+    def preload_tenants():
+        emails = recent_active_emails(WARMUP_TENANTS, WARMUP_TENANT_DAYS)
+        return {"loaded": sum(load_rag(email) is not None for email in emails), "candidates": len(emails)}
+
+    def gemini_client():
+        for model_name in GEMINI_MODELS:
+            get_gemini_model(model_name)
+        try:
+            # Builds the underlying API client (transport, auth) that the first call would create
+            from google.generativeai.client import get_default_generative_client
+            get_default_generative_client()
+        except ImportError:
+            pass
+
+    step("embedder", lambda: get_embedder().encode(["warm up"]).shape[1])
+    step("knowledge_base", lambda: len(load_knowledge_base()[0]))
+    step("catalog", lambda: len(product_listing()))
+    step("tenant_indexes", preload_tenants)
+    step("gemini", gemini_client)
+    # Ready even if a step failed: those paths degrade exactly as on a cold worker
+    WARMUP["ready"] = True
+
+def build_llm_prompt(query, email=None, memory=None):
+    """Website context (if the user has a RAG index) plus conversation memory, within the prompt budget."""
     context = retrieve_from_rag(email, query) if email else None
-    if context:
-        prompt = f"Answer only based on this website context: {context}. Query: {query}. Do not use general knowledge."
-    else:
-        prompt = query
-    # List of models to try in order
-    GEMINI_MODELS = [
-        "gemini-2.5-flash",
-        "gemini-flash-latest",
-        "gemini-pro-latest",
-        "gemini-2.0-flash-exp",
-    ]
-    
+    return build_prompt(query, context, memory)
+
+def get_gemini_response(query, email=None, deadline=None, prompt=None):
+    if prompt is None:
+        prompt = build_llm_prompt(query, email)
     for model_name in GEMINI_MODELS:
+        if deadline and time.monotonic() >= deadline:
+            print("Gemini: deadline reached, skipping remaining models")
+            break
         try:
-            model = genai.GenerativeModel(model_name)
+            model = get_gemini_model(model_name)
             response = model.generate_content(prompt)
             if response and response.text:
                 return response.text
@@ -53,45 +169,77 @@ def get_gemini_response(query, email=None):
             
     return None
 
-def get_huggingface_response(query, email=None):
-    context = retrieve_from_rag(email, query) if email else None
-    if context:
-        prompt = f"Answer only based on this website context: {context}. Query: {query}. Do not use general knowledge."
-    else:
-        prompt = query
+def stream_gemini_response(prompt, deadline=None):
+    """Yield the answer in chunks as Gemini produces them. The next model is only tried if one
+    fails before sending any text (a half-streamed answer cannot be retracted)."""
+    for model_name in GEMINI_MODELS:
+        if deadline and time.monotonic() >= deadline:
+            print("Gemini: deadline reached, skipping remaining models")
+            break
+        produced = False
+        try:
+            for chunk in get_gemini_model(model_name).generate_content(prompt, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:  # chunk without text parts (e.g. only a finish reason)
+                    continue
+                if text:
+                    produced = True
+                    yield text
+        except Exception as e:
+            print(f"Gemini model {model_name} stream failed: {e}")
+        if produced:
+            return
+
+def get_huggingface_response(query, email=None, deadline=None, prompt=None):
+    if prompt is None:
+        prompt = build_llm_prompt(query, email)
     try:
-        url = "https://api-inference.huggingface.co/models/MiniMaxAI/MiniMax-M2"
         headers = {"Authorization": f"Bearer {HF_API_KEY}"}
         payload = {"inputs": prompt}
-        response = requests.post(url, headers=headers, json=payload, timeout=10)
+        timeout = min(10, deadline - time.monotonic()) if deadline else 10
+        if timeout <= 0:
+            return None
+        response = requests.post(HF_API_URL, headers=headers, json=payload, timeout=timeout)
         if response.status_code == 200:
             return response.json()[0]["generated_text"]
     except Exception as e:
         print("HF Error:", e)
     return None
 
+def llm_answer(query, email):
+    """Gemini, then Hugging Face, behind the per-email rate limit and the global concurrency limit.
+
+    Concurrent identical queries are coalesced: only the first takes a slot and calls the LLM.
+    The conversation memory is part of the prompt, so its fingerprint is part of the key.
+    Raises limiter.Rejected when the tenant is over its rate or no slot frees up in time.
+    """
+    TENANT_LIMITS.take(email)
+    deadline = time.monotonic() + LLM_DEADLINE
+    memory = load_memory(email)
+
+    def compute():
+        with LLM_LIMITER.slot(min(deadline, time.monotonic() + LLM_QUEUE_TIMEOUT)):
+            prompt = build_llm_prompt(query, email, memory)
+            return get_gemini_response(query, email, deadline, prompt) or get_huggingface_response(query, email, deadline, prompt)
+
+    return LLM_FLIGHTS.do(query_key(email, query) + (fingerprint(memory),), compute)[0]
+
 # --------------------------
 # Products & Orders
 # --------------------------
-PRODUCTS = [
-    {"id": 1, "name": "Wireless Headphones", "price": 4500},
-    {"id": 2, "name": "Smartwatch", "price": 7500},
-    {"id": 3, "name": "Bluetooth Speaker", "price": 3800},
-    {"id": 4, "name": "USB-C Charger", "price": 1200},
-    {"id": 5, "name": "Gaming Mouse", "price": 3100},
-]
-
-ORDERS_FILE = "orders.json"
-
-def save_order(order_details):
-    orders = []
-    if os.path.exists(ORDERS_FILE):
-        with open(ORDERS_FILE, "r", encoding="utf-8") as f:
-            try: orders = json.load(f)
-            except: orders = []
-    orders.append(order_details)
-    with open(ORDERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(orders, f, indent=4)
+def order_record(req, product):
+    """Row for database.save_order(s) from a validated OrderRequest."""
+    return {
+        "customer_name": req.name,
+        "address": req.address,
+        "contact_number": req.contact_number,
+        "item_id": product["id"],
+        "item": product["name"],
+        "price": product["price"],
+        "quantity": req.quantity,
+        "idempotency_key": req.idempotency_key,
+    }
 
 def is_order_related(query: str) -> bool:
     keywords = ["order", "buy", "purchase", "delivery", "book", "cart", "item", "product", "place order"]
@@ -110,62 +258,401 @@ class OrderRequest(BaseModel):
     address: str
     contact_number: str
     item_id: int
+    quantity: int = 1
+    idempotency_key: Optional[str] = None  # retries with the same key never create a second order
+
+class BatchOrderRequest(BaseModel):
+    orders: List[OrderRequest]
+
+class BatchChatRequest(BaseModel):
+    messages: List[ChatRequest]
 
 # --------------------------
 # Endpoints
 # --------------------------
-@app.post("/chat")
-def chat(req: ChatRequest):
+def quick_answer(req):
+    """(response, action, order_draft) for messages answered without an LLM call, else None."""
     query = req.message.lower()
-    email = req.email  # Use for RAG key
     # Check for URL to trigger customization
     url = extract_url(req.message)
     if url:
-        scraped = scrape_website(url)
-        if scraped and build_rag_for_user(email, scraped):
-            response = "I've scraped and customized to your website! Now ask me anything specific to it."
-        else:
-            response = "Couldn't access or process that website—please try a valid URL."
-        action = None
+        status = ingest_url(req.email, url)
+        if status == "unchanged":
+            return "Your website hasn't changed since I last read it, so I'm already up to date. Ask me anything about it!", None, None
+        if status:
+            return "I've scraped and customized to your website! Now ask me anything specific to it.", None, None
+        return "Couldn't access or process that website—please try a valid URL.", None, None
+    if is_order_related(query):
+        # Order intent replaces any KB/LLM answer, so resolve it first and skip those calls
+        return order_reply(req.message)
+    kb_answer = search_knowledge_base(query)  # Keep for non-custom users
+    if kb_answer:
+        return kb_answer, None, None
+    return None
+
+def quick_answers(reqs):
+    """quick_answer for a batch: the KB is loaded once and each distinct message matched once."""
+    try:
+        questions, answers = load_knowledge_base()
+    except Exception as e:
+        print("KB Error:", e)
+        questions, answers = [], {}
+    matched, results = {}, []
+    for req in reqs:
+        query = req.message.lower()
+        if extract_url(req.message) or is_order_related(query):
+            results.append(quick_answer(req))
+            continue
+        if query not in matched:
+            match = difflib.get_close_matches(query, questions, n=1, cutoff=0.6)
+            matched[query] = answers[match[0]] if match else None
+        results.append((matched[query], None, None) if matched[query] else None)
+    return results
+
+def busy_response(e):
+    """429 for a request refused by the LLM limiters."""
+    return JSONResponse(
+        status_code=429, headers={"Retry-After": str(e.retry_after)},
+        content={"response": BUSY_REPLY, "action": None, "order_draft": None, "error": e.reason, "retry_after": e.retry_after}
+    )
+
+@app.post("/chat")
+def chat(req: ChatRequest):
+    quick = quick_answer(req)
+    if quick:
+        response, action, order_draft = quick
     else:
         # Normal flow, but with RAG if exists
-        kb_answer = search_knowledge_base(query)  # Keep for non-custom users
-        if kb_answer:
-            response = kb_answer
-        else:
-            response = get_gemini_response(query, email)
-            if not response:
-                response = get_huggingface_response(query, email)
-            if not response:
-                response = "I'm having trouble connecting right now, but our team is here to help! Call +92-300-1234567 or email support@yourbusiness.com"
-        # Existing order logic...
+        try:
+            response = llm_answer(req.message.lower(), req.email) or FALLBACK_REPLY
+        except Rejected as e:
+            return busy_response(e)
         action = None
-        if is_order_related(query):
-            product_list = "\n".join([f"{p['id']}. {p['name']} - Rs {p['price']}" for p in PRODUCTS])
-            response = (
-                "Here's our product list:\n\n"
-                f"{product_list}\n\n"
-                "Please reply with the Product ID to place your order!"
-            )
-            action = "show_products"
+        order_draft = None
     save_lead(req.name, req.email, req.message, response)
-    return {"response": response, "action": action}
+    remember(req.email, req.message, response)
+    return {"response": response, "action": action, "order_draft": order_draft}
+
+def ndjson(event):
+    return json.dumps(event) + "\n"
+
+@app.post("/chat/stream")
+def chat_stream(req: ChatRequest):
+    """/chat streamed as NDJSON: {"delta": text} lines while the LLM answers, then one
+    {"done": true, "response", "action", "order_draft"} line with the complete reply.
+
+    Website ingest, orders and KB answers come as the final line alone. Streams are per
+    client, so they are not coalesced. An over-rate tenant gets a 429 as from /chat; when no
+    LLM slot frees up in time the stream is a single done line with "error" and "retry_after".
+    """
+    quick = quick_answer(req)
+    if quick:
+        response, action, order_draft = quick
+        save_lead(req.name, req.email, req.message, response)
+        remember(req.email, req.message, response)
+        done = {"done": True, "response": response, "action": action, "order_draft": order_draft}
+        return StreamingResponse(iter([ndjson(done)]), media_type="application/x-ndjson")
+    query, email = req.message.lower(), req.email
+    deadline = time.monotonic() + LLM_DEADLINE
+    # The rate limit is checked before the stream starts, so an over-rate tenant gets a plain 429
+    try:
+        TENANT_LIMITS.take(email)
+    except Rejected as e:
+        return busy_response(e)
+
+    def events():
+        # The LLM slot is taken inside the generator: a stream that never starts (client gone,
+        # response dropped) never runs its finally, so it must not hold a slot either
+        try:
+            acquired_at = LLM_LIMITER.acquire(min(deadline, time.monotonic() + LLM_QUEUE_TIMEOUT))
+        except Rejected as e:
+            yield ndjson({"done": True, "response": BUSY_REPLY, "action": None, "order_draft": None,
+                          "error": e.reason, "retry_after": e.retry_after})
+            return
+        parts = []
+        try:
+            prompt = build_llm_prompt(query, email, load_memory(email))
+            for text in stream_gemini_response(prompt, deadline):
+                parts.append(text)
+                yield ndjson({"delta": text})
+            if not parts:
+                fallback = get_huggingface_response(query, email, deadline, prompt)
+                if fallback:
+                    parts.append(fallback)
+                    yield ndjson({"delta": fallback})
+        finally:
+            LLM_LIMITER.release(acquired_at)  # also runs if the client disconnects mid-stream
+        response = "".join(parts) or FALLBACK_REPLY
+        save_lead(req.name, req.email, req.message, response)
+        remember(req.email, req.message, response)
+        yield ndjson({"done": True, "response": response, "action": None, "order_draft": None})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/chat/batch")
+async def chat_batch(req: BatchChatRequest, x_admin_token: Optional[str] = Header(None)):
+    """Answer a backlog of messages, streamed as NDJSON in completion order.
+
+    One {"index", "response", "action", "order_draft"} line per message ({"index", "error",
+    "retry_after"} if the LLM limiter refused it; retry those), then {"done": true, ...}.
+    KB and order answers come first. The rest are retrieved with one encode for the batch and
+    one search per tenant index, and answered by at most CHAT_BATCH_CONCURRENCY concurrent
+    LLM calls (coalesced like /chat). Every message is answered with its session memory as
+    it was when the batch started; leads and memory are written in one transaction at the end.
+    """
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    if len(req.messages) > CHAT_BATCH_MAX:
+        return JSONResponse(status_code=413, content={"error": f"At most {CHAT_BATCH_MAX} messages per batch."})
+    messages = req.messages
+    slots = asyncio.Semaphore(CHAT_BATCH_CONCURRENCY)
+
+    async def answer(i, context, memory):
+        query, email = messages[i].message.lower(), messages[i].email
+
+        def compute():
+            deadline = time.monotonic() + LLM_DEADLINE
+            with LLM_LIMITER.slot(min(deadline, time.monotonic() + LLM_QUEUE_TIMEOUT)):
+                prompt = build_prompt(query, context, memory)
+                return get_gemini_response(query, email, deadline, prompt) or get_huggingface_response(query, email, deadline, prompt)
+
+        async with slots:
+            try:
+                response, _ = await LLM_FLIGHTS.do_async(query_key(email, query) + (fingerprint(memory),), compute)
+            except Rejected as e:
+                return i, None, e
+        return i, response or FALLBACK_REPLY, None
+
+    async def events():
+        answered, busy, tasks = {}, 0, []
+        try:
+            quick = await asyncio.to_thread(quick_answers, messages)
+            for i, result in enumerate(quick):
+                if result:
+                    response, action, order_draft = result
+                    answered[i] = response
+                    yield ndjson({"index": i, "response": response, "action": action, "order_draft": order_draft})
+            pending = [i for i, result in enumerate(quick) if not result]
+            if pending:
+                contexts = await asyncio.to_thread(retrieve_batch, [(messages[i].email, messages[i].message.lower()) for i in pending])
+                memories = await asyncio.to_thread(lambda: {email: load_memory(email) for email in {messages[i].email for i in pending}})
+                tasks = [asyncio.create_task(answer(i, context, memories[messages[i].email])) for i, context in zip(pending, contexts)]
+            for next_done in asyncio.as_completed(tasks):
+                i, response, rejected = await next_done
+                if rejected:
+                    busy += 1
+                    yield ndjson({"index": i, "error": rejected.reason, "retry_after": rejected.retry_after})
+                else:
+                    answered[i] = response
+                    yield ndjson({"index": i, "response": response, "action": None, "order_draft": None})
+        finally:
+            for task in tasks:
+                task.cancel()  # client went away: no new LLM calls
+            if answered:
+                turns = [(messages[i], answered[i]) for i in sorted(answered)]
+
+                def write():
+                    save_leads([(m.name, m.email, m.message, response) for m, response in turns])
+                    remember_many([(m.email, m.message, response) for m, response in turns])
+                # Off the event loop; the thread finishes the writes even if this await is cancelled
+                await asyncio.to_thread(write)
+        yield ndjson({"done": True, "answered": len(answered), "busy": busy})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
 
 @app.post("/order")
 def place_order(req: OrderRequest):
-    product = next((p for p in PRODUCTS if p["id"] == req.item_id), None)
+    product = get_product(req.item_id)
     if not product:
         return {"response": "Invalid product ID. Please try again."}
+    if req.quantity < 1:
+        return {"response": "Quantity must be at least 1."}
     
-    save_order({
-        "customer_name": req.name,
-        "address": req.address,
-        "contact_number": req.contact_number,
-        "item": product["name"],
-        "price": product["price"],
-        "timestamp": __import__("datetime").datetime.now().isoformat()
-    })
-    return {"response": f"Order confirmed for {product['name']}! We'll contact you soon on {req.contact_number}."}
+    order_id, status = save_order(order_record(req, product))
+    if status == "conflict":
+        return {"response": "This idempotency key was already used for a different order."}
+    return {"response": f"Order confirmed for {req.quantity} x {product['name']}! We'll contact you soon on {req.contact_number}.",
+            "order_id": order_id}
+
+@app.post("/orders/batch")
+def place_orders(req: BatchOrderRequest):
+    """Validate a batch against the catalog in one pass and save the valid orders in one transaction.
+
+    Each order gets its own result; invalid orders are reported without blocking the rest.
+    """
+    if len(req.orders) > ORDER_BATCH_MAX:
+        return JSONResponse(status_code=413, content={"error": f"At most {ORDER_BATCH_MAX} orders per batch."})
+    products = get_products([o.item_id for o in req.orders])
+    results, valid = [], []
+    for i, o in enumerate(req.orders):
+        result = {"index": i, "idempotency_key": o.idempotency_key}
+        results.append(result)
+        product = products.get(o.item_id)
+        if not product:
+            result.update(status="invalid", error="Invalid product ID.")
+        elif o.quantity < 1:
+            result.update(status="invalid", error="Quantity must be at least 1.")
+        else:
+            valid.append((result, order_record(o, product)))
+    saved = save_orders([record for _, record in valid]) if valid else []
+    for (result, _), (order_id, status) in zip(valid, saved):
+        result["status"] = status
+        if status == "conflict":
+            result["error"] = "Idempotency key already used for a different order."
+        else:
+            result["order_id"] = order_id
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {"results": results, "summary": summary}
+
+@app.get("/products/{product_id}")
+def product(product_id: int):
+    found = get_product(product_id)
+    if not found:
+        return JSONResponse(status_code=404, content={"error": "Product not found."})
+    return found
+
+@app.get("/products")
+def products(page: int = 1, per_page: int = 20, q: str = None):
+    """Paginated catalog, optionally filtered by product name."""
+    per_page = max(1, min(per_page, 100))
+    items, total = list_products(page, per_page, q)
+    return {"items": items, "total": total, "page": page, "per_page": per_page}
+
+def admin_denied(token):
+    """503 response while ADMIN_TOKEN is not configured (admin endpoints serve customer data or
+    spend LLM calls), 401 when the X-Admin-Token header does not match it."""
+    if not ADMIN_TOKEN:
+        return JSONResponse(status_code=503, content={"error": "ADMIN_TOKEN is not configured."})
+    if not hmac.compare_digest(token or "", ADMIN_TOKEN):
+        return JSONResponse(status_code=401, content={"error": "Admin token required."})
+    return None
+
+@app.get("/admin/orders/stats")
+def orders_stats(start: Optional[date] = None, end: Optional[date] = None, top: int = 10,
+                 x_admin_token: Optional[str] = Header(None)):
+    """Order counts, units and revenue for [start, end], summed from the per-day aggregates."""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    return order_stats(start and start.isoformat(), end and end.isoformat(), max(1, min(top, 100)))
+
+@app.get("/admin/leads/search")
+def leads_search(q: str, email: Optional[str] = None, order: str = "recent", limit: int = 20,
+                 cursor: Optional[str] = None, x_admin_token: Optional[str] = Header(None)):
+    """Full-text search of the conversation log with snippets; pass next_cursor back for the next page."""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    if order not in ("recent", "rank"):
+        return JSONResponse(status_code=400, content={"error": "order must be 'recent' or 'rank'."})
+    found = search_leads(q, email, max(1, min(limit, 100)), cursor, order)
+    if found is None:
+        return JSONResponse(status_code=400, content={"error": "Invalid search query or cursor."})
+    return found
+
+@app.get("/admin/export/{table}")
+def export_table(table: str, format: str = "ndjson", since_id: Optional[int] = None, since: Optional[str] = None,
+                 limit: Optional[int] = None, x_admin_token: Optional[str] = Header(None)):
+    """Stream leads or orders as NDJSON or CSV in id order; since_id / since for incremental syncs."""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    if table not in EXPORT_TABLES or format not in EXPORT_FORMATS:
+        return JSONResponse(status_code=404, content={"error": f"Unknown export {table}.{format}."})
+    lines = export_lines(table, format, since_id=since_id, since=since, limit=limit)
+    return StreamingResponse((line.encode("utf-8") for line in lines), media_type=EXPORT_FORMATS[format],
+                             headers={"Content-Disposition": f'attachment; filename="{table}.{format}"'})
+
+@app.get("/admin/leads/archive")
+def leads_archive_months(x_admin_token: Optional[str] = Header(None)):
+    """Archived months of the conversation log and their compressed sizes."""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    return {"months": archived_months()}
+
+@app.get("/admin/leads/archive/{month}")
+def leads_archive_month(month: str, email: Optional[str] = None, limit: Optional[int] = None,
+                        x_admin_token: Optional[str] = Header(None)):
+    """Stream one archived month (YYYY-MM) as NDJSON, optionally for one email."""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    try:
+        rows = iter_archived(month, email, limit)
+        first = next(rows, None)  # decompresses now, so a missing month is still a 404
+    except KeyError:
+        return JSONResponse(status_code=404, content={"error": f"No archive for {month}."})
+
+    def lines():
+        row = first
+        while row is not None:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+            row = next(rows, None)
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/sessions")
+def sessions(limit: int = 100, x_admin_token: Optional[str] = Header(None)):
+    """Emails with chat history, most recently active first."""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    return {"sessions": session_emails(max(1, min(limit, 1000)))}
+
+@app.get("/sessions/{email}/history")
+def history(email: str, limit: int = 200, x_admin_token: Optional[str] = Header(None)):
+    """(user_message, bot_response) pairs for one email, oldest first."""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    return {"email": email, "history": session_history(email, max(1, min(limit, 1000)))}
+
+@app.get("/metrics")
+def metrics():
+    """LLM limiter counters (active calls, queue depth, admissions, rejections), coalesced calls and RAG store sizes."""
+    return {"llm": LLM_LIMITER.metrics(), "rate_limit": TENANT_LIMITS.metrics(), "coalescing": LLM_FLIGHTS.metrics(),
+            "rag_store": store_stats(), "rag_janitor": RAG_JANITOR, "leads_maintenance": LEADS_MAINTENANCE}
+
+@app.get("/admin/memory")
+def memory_report(trace: Optional[str] = None, limit: int = 20, x_admin_token: Optional[str] = Header(None)):
+    """Process RSS plus entries and approximate bytes of every registered cache.
+
+    trace=start takes a tracemalloc baseline, trace=diff adds the allocation sites that grew
+    since then (trace=reset does the same and moves the baseline), trace=stop ends tracing.
+    """
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    if trace not in (None, "start", "diff", "reset", "stop"):
+        return JSONResponse(status_code=400, content={"error": "trace must be start, diff, reset or stop."})
+    traced = None
+    if trace == "start":
+        traced = memstats.trace_start()
+    elif trace == "stop":
+        traced = memstats.trace_stop()
+    elif trace:
+        traced = memstats.trace_diff(max(1, min(limit, 200)), reset=trace == "reset")
+        if traced is None:
+            return JSONResponse(status_code=409, content={"error": "No baseline; call with trace=start first."})
+    report = memstats.report()
+    if traced is not None:
+        report["trace"] = traced
+    return report
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 503 until the startup warm-up has finished."""
+    if not WARMUP["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming", "steps": WARMUP["steps"]})
+    return {"status": "ready", "steps": WARMUP["steps"]}
 
 @app.get("/")
 def root():
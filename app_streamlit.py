@@ -1,3 +1,8 @@
+# app_streamlit.py
+# LEGACY, unsupported: the old merged single-file app. Its scrape/RAG/LLM path keeps the per-email
+# RAG folder layout and bypasses the shared corpus store in rag.py. Use streamlit_app.py instead
+# (in-process without BACKEND_URL, thin client with it).
+
 import streamlit as st
 import sqlite3
 import json
@@ -6,10 +11,14 @@ import re
 import difflib
 import numpy as np
 from datetime import datetime
-from bs4 import BeautifulSoup
-from sentence_transformers import SentenceTransformer
-import google.generativeai as genai
 import requests
+from catalog import init_catalog, get_product, list_products, search_products
+from matcher import order_reply
+from chat_view import render_chat, append_bubble, update_bubble, reset_window, memory_panel
+from order_form import render_order_form
+from database import init_orders, save_order
+from singleflight import SingleFlight
+from memory import init_memory, load_memory, remember, fingerprint, build_prompt
 
 # -------------------------------------------------
 # CACHED RESOURCES (heavy models) – loaded once
@@ -18,6 +27,7 @@ st.set_page_config(page_title="AI Business Support Care Bot", layout="wide")
 @st.cache_resource(show_spinner=False)
 def load_embedder():
     """Load the SentenceTransformer model once and cache it."""
+    from sentence_transformers import SentenceTransformer
     return SentenceTransformer('all-MiniLM-L6-v2')
 
 # removed load_gemini_model caching as we need to switch models dynamically on failure
@@ -28,14 +38,8 @@ def load_embedder():
 # CONFIGURATION
 # ============================================
 
-# Show a quick status indicator so the user knows the app has loaded
-st.success("✅ Application loaded – ready to chat!")
-
-# Initialise heavy models early (cached) – show spinner so user sees progress
-with st.spinner('Initializing AI models...'):
-    _ = load_embedder()
-    # Gemini model is now loaded on demand with fallback, so no pre-loading needed here
-    pass
+# Heavy models (embedder, Gemini client) are loaded on first use, so the page renders
+# without waiting for sentence_transformers / google.generativeai to import.
 
 
 # Use Streamlit secrets in production, fallback to env vars locally
@@ -78,10 +82,13 @@ HF_API_KEY = get_api_key("HF_API_KEY")
 DB_NAME = "dataBase.db"
 KB_FILE = "knowledgeBase.json"
 RAG_DIR = "rags"
-ORDERS_FILE = "orders.json"
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
+@st.cache_resource(show_spinner=False)
+def load_genai():
+    """Import and configure Gemini once per process."""
+    import google.generativeai as genai
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai
 
 # ============================================
 # DATABASE INITIALIZATION
@@ -118,9 +125,16 @@ def save_lead(name, email, user_message, bot_response):
 def init_rag_dir():
     os.makedirs(RAG_DIR, exist_ok=True)
 
-# Initialize on startup
-init_db()
-init_rag_dir()
+@st.cache_resource(show_spinner=False)
+def startup():
+    """Create tables and folders once per process, not on every rerun."""
+    init_db()
+    init_orders()
+    init_memory()
+    init_catalog()
+    init_rag_dir()
+
+startup()
 
 # ============================================
 # RAG FUNCTIONS
@@ -133,16 +147,14 @@ def extract_url(message: str) -> str:
     return match.group(0) if match else None
 
 def scrape_with_requests(url: str) -> str:
-    """Fallback scraping using requests and BeautifulSoup."""
+    """Fallback scraping using the pooled, cached fetcher and the lxml extractor."""
     try:
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=15)
-        if response.status_code != 200:
+        from fetch import fetch
+        from extractor import extract_text
+        page = fetch(url)
+        if page.status != 200:
             return None
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for script in soup(["script", "style"]):
-            script.extract()
-        text = soup.get_text(separator=' ')
-        return " ".join(text.split())
+        return extract_text(page.content) or None  # bytes, so lxml honours the page's charset
     except Exception as e:
         print(f"Requests scraping failed: {e}")
         return None
@@ -163,9 +175,8 @@ def scrape_website(url: str) -> str:
             html = page.content()
             browser.close()
             
-            soup = BeautifulSoup(html, 'html.parser')
-            texts = [elem.get_text(strip=True) for elem in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'div', 'span', 'li', 'td', 'th'])]
-            cleaned_text = ' '.join(filter(None, texts))
+            from extractor import extract_text
+            cleaned_text = extract_text(html)
             return cleaned_text if cleaned_text else None
     except Exception as e:
         print(f"Playwright failed ({e}). Falling back to requests...")
@@ -178,6 +189,7 @@ def build_rag_for_user(email: str, scraped_text: str) -> bool:
     if not scraped_text:
         return False
     try:
+        import faiss
         # Split into chunks
         chunks = [scraped_text[i:i+500] for i in range(0, len(scraped_text), 500)]
         # Embed using cached model
@@ -198,12 +210,19 @@ def build_rag_for_user(email: str, scraped_text: str) -> bool:
         st.error(f"Error building RAG: {e}")
         return False
 
+def query_key(email: str, query: str):
+    """Coalescing key for a chat query: (tenant, RAG index version, normalized query)."""
+    index_path = os.path.join(RAG_DIR, email.replace('@', '_'), 'faiss_index') if email else None
+    version = os.stat(index_path).st_mtime_ns if index_path and os.path.exists(index_path) else None
+    return (email if version else None, version, " ".join(query.lower().split()).strip(" ?!."))
+
 def retrieve_from_rag(email: str, query: str, top_k=3) -> str:
     """Retrieve relevant chunks from the user's RAG index."""
     user_dir = os.path.join(RAG_DIR, email.replace('@', '_'))
     if not os.path.exists(os.path.join(user_dir, 'faiss_index')):
         return None
     try:
+        import faiss
         # Load index and chunks
         index = faiss.read_index(os.path.join(user_dir, 'faiss_index'))
         with open(os.path.join(user_dir, 'chunks.json'), 'r') as f:
@@ -237,12 +256,9 @@ def search_knowledge_base(query):
         print("KB Error:", e)
     return None
 
-def get_gemini_response(query, email=None):
+def get_gemini_response(query, email=None, memory=None):
     context = retrieve_from_rag(email, query) if email else None
-    if context:
-        prompt = f"Answer only based on this website context: {context}. Query: {query}. Do not use general knowledge."
-    else:
-        prompt = query
+    prompt = build_prompt(query, context, memory)  # context + conversation memory within the token budget
     
     # List of models to try in order
     GEMINI_MODELS = [
@@ -254,7 +270,7 @@ def get_gemini_response(query, email=None):
     
     for model_name in GEMINI_MODELS:
         try:
-            model = genai.GenerativeModel(model_name)
+            model = load_genai().GenerativeModel(model_name)
             response = model.generate_content(prompt)
             if response and response.text:
                 return response.text
@@ -264,12 +280,9 @@ def get_gemini_response(query, email=None):
             
     return None # All attempts failed
 
-def get_huggingface_response(query, email=None):
+def get_huggingface_response(query, email=None, memory=None):
     context = retrieve_from_rag(email, query) if email else None
-    if context:
-        prompt = f"Answer only based on this website context: {context}. Query: {query}. Do not use general knowledge."
-    else:
-        prompt = query
+    prompt = build_prompt(query, context, memory)  # context + conversation memory within the token budget
     try:
         url = "https://api-inference.huggingface.co/models/MiniMaxAI/MiniMax-M2"
         headers = {"Authorization": f"Bearer {HF_API_KEY}"}
@@ -285,26 +298,6 @@ def get_huggingface_response(query, email=None):
 # PRODUCTS & ORDERS
 # ============================================
 
-PRODUCTS = [
-    {"id": 1, "name": "Wireless Headphones", "price": 4500},
-    {"id": 2, "name": "Smartwatch", "price": 7500},
-    {"id": 3, "name": "Bluetooth Speaker", "price": 3800},
-    {"id": 4, "name": "USB-C Charger", "price": 1200},
-    {"id": 5, "name": "Gaming Mouse", "price": 3100},
-]
-
-def save_order(order_details):
-    orders = []
-    if os.path.exists(ORDERS_FILE):
-        with open(ORDERS_FILE, "r", encoding="utf-8") as f:
-            try:
-                orders = json.load(f)
-            except:
-                orders = []
-    orders.append(order_details)
-    with open(ORDERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(orders, f, indent=4)
-
 def is_order_related(query: str) -> bool:
     keywords = ["order", "buy", "purchase", "delivery", "book", "cart", "item", "product", "place order"]
     return any(word in query.lower() for word in keywords)
@@ -313,6 +306,11 @@ def is_order_related(query: str) -> bool:
 # CHAT LOGIC
 # ============================================
 
+@st.cache_resource(show_spinner=False)
+def llm_flights():
+    """In-flight LLM calls shared by all sessions in this process."""
+    return SingleFlight()
+
 def process_chat(name, email, message):
     """Process chat message and return response."""
     query = message.lower()
@@ -327,31 +325,28 @@ def process_chat(name, email, message):
             else:
                 response = "Couldn't access or process that website—please try a valid URL."
         action = None
+    elif is_order_related(query):
+        # Resolve the product before spending an LLM call on the message
+        response, action, st.session_state.order_draft = order_reply(message)
     else:
         # Normal flow with RAG if exists
         kb_answer = search_knowledge_base(query)
         if kb_answer:
             response = kb_answer
         else:
-            response = get_gemini_response(query, email)
-            if not response:
-                response = get_huggingface_response(query, email)
+            # Identical concurrent questions (with the same conversation memory) share one LLM call
+            memory = load_memory(email)
+            response, _ = llm_flights().do(
+                query_key(email, query) + (fingerprint(memory),),
+                lambda: get_gemini_response(query, email, memory) or get_huggingface_response(query, email, memory)
+            )
             if not response:
                 response = "I'm having trouble connecting right now, but our team is here to help! Call +92-300-1234567 or email support@yourbusiness.com"
-        
-        # Check for order intent
         action = None
-        if is_order_related(query):
-            product_list = "\n".join([f"{p['id']}. {p['name']} - Rs {p['price']}" for p in PRODUCTS])
-            response = (
-                "Here's our product list:\n\n"
-                f"{product_list}\n\n"
-                "Please reply with the Product ID to place your order!"
-            )
-            action = "show_products"
     
     # Save to database
     save_lead(name, email, message, response)
+    remember(email, message, response)
     
     return response, action
 
@@ -408,6 +403,11 @@ st.markdown("""
     font-size: 15px;
     animation: fadeIn 0.3s ease-in-out;
 }
+.chat-row {
+    display: flex;
+    flex-direction: column;
+    padding: 8px 15px 0;
+}
 @keyframes fadeIn {
     from { opacity: 0; transform: translateY(10px); }
     to { opacity: 1; transform: translateY(0); }
@@ -442,6 +442,8 @@ st.markdown("""
 st.title("RAS InnovaTech Support Bot")
 st.subheader("AI-powered Bot with Personalization")
 
+memory_panel()
+
 # Sidebar for Previous Chat Sessions
 with st.sidebar:
     st.header("Previous Chat Sessions")
@@ -453,6 +455,9 @@ with st.sidebar:
     
     if sessions:
         selected_session = st.selectbox("Select a Session to View", ["New Session"] + sessions)
+        if selected_session != st.session_state.get("viewed_session"):
+            st.session_state.viewed_session = selected_session
+            reset_window()
         if selected_session != "New Session":
             conn = sqlite3.connect(DB_NAME)
             c = conn.cursor()
@@ -480,51 +485,35 @@ if "order_mode" not in st.session_state:
     st.session_state.order_mode = False
 if "link_provided" not in st.session_state:
     st.session_state.link_provided = False
+if "order_draft" not in st.session_state:
+    st.session_state.order_draft = None
 
 # Chat Display Function
-def render_chat():
-    chat_html = "<div class='chat-container'>"
-    for role, msg in st.session_state.history:
-        if role == "user":
-            chat_html += f"<div class='chat-bubble-user'>{msg}</div>"
-        else:
-            chat_html += f"<div class='chat-bubble-bot'>{msg}</div>"
-    chat_html += "</div>"
-    return chat_html
 
-chat_placeholder = st.empty()
-chat_placeholder.markdown(render_chat(), unsafe_allow_html=True)
+# Latest messages only (cached bubble HTML); new bubbles this run are appended to live_chat
+live_chat = render_chat(st.session_state.history)
 
 # Order Form
+def find_products(query):
+    return search_products(query, 50) if query else list_products(1, 50)[0]
+
+def submit_order(name, address, contact_number, product, quantity, idempotency_key):
+    save_order({
+        "customer_name": name,
+        "address": address,
+        "contact_number": contact_number,
+        "item_id": product["id"],
+        "item": product["name"],
+        "price": product["price"],
+        "quantity": quantity,
+        "timestamp": datetime.now().isoformat(),
+        "idempotency_key": idempotency_key,
+    })
+    return f"Order confirmed for {quantity} x {product['name']}! We'll contact you soon on {contact_number}."
+
 if st.session_state.order_mode:
-    st.subheader("Place Your Order")
-    with st.form(key="order_form"):
-        item_id = st.selectbox(
-            "Select Product",
-            options=[p["id"] for p in PRODUCTS],
-            format_func=lambda x: f"ID {x}: {next(p['name'] for p in PRODUCTS if p['id'] == x)} - Rs {next(p['price'] for p in PRODUCTS if p['id'] == x)}"
-        )
-        address = st.text_input("Delivery Address", placeholder="House #, Street, City")
-        contact_number = st.text_input("Contact Number", placeholder="+92xxxxxxxxxx")
-        submit = st.form_submit_button("Submit Order")
-        if submit:
-            if not address or not contact_number:
-                st.error("Please fill all fields!")
-            else:
-                product = next((p for p in PRODUCTS if p["id"] == item_id), None)
-                save_order({
-                    "customer_name": name or "Guest",
-                    "address": address,
-                    "contact_number": contact_number,
-                    "item": product["name"],
-                    "price": product["price"],
-                    "timestamp": datetime.now().isoformat()
-                })
-                reply = f"Order confirmed for {product['name']}! We'll contact you soon on {contact_number}."
-                st.session_state.history.append(("bot", reply))
-                st.success("Order placed successfully!")
-                st.session_state.order_mode = False
-                st.rerun()
+    if render_order_form(name, find_products, get_product, submit_order):
+        st.rerun()
 
 # Normal Chat Input
 if not st.session_state.order_mode:
@@ -545,11 +534,11 @@ if not st.session_state.order_mode:
             if proceed:
                 # Add user message
                 st.session_state.history.append(("user", user_input))
-                chat_placeholder.markdown(render_chat(), unsafe_allow_html=True)
+                append_bubble(live_chat, "user", user_input)
                 
                 # Show typing animation
                 st.session_state.history.append(("bot", "Thinking..."))
-                chat_placeholder.markdown(render_chat(), unsafe_allow_html=True)
+                reply_slot = append_bubble(live_chat, "bot", "Thinking...")
                 
                 # Process message
                 message = f"{user_input} (Purpose: {purpose})" if purpose else user_input
@@ -557,8 +546,8 @@ if not st.session_state.order_mode:
                 
                 # Update with real reply
                 st.session_state.history[-1] = ("bot", bot_reply)
-                if action == "show_products":
+                if action in ("show_products", "confirm_order"):
                     st.session_state.order_mode = True
                 
-                chat_placeholder.markdown(render_chat(), unsafe_allow_html=True)
+                update_bubble(reply_slot, "bot", st.session_state.history[-1][1])
                 st.rerun()
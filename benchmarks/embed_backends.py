@@ -0,0 +1,129 @@
+# Latency, throughput and drift of the embedding backends in embedders.py.
+#
+#   python -m benchmarks.embed_backends --backends torch,torch-int8,onnx,onnx-int8 --out benchmarks/results/embed_backends.json
+#
+# Each backend runs in a fresh process (so load time and RSS are its own) on the synthetic
+# corpus from retrieval_bench: single-query latency (the chat path), bulk throughput (the
+# ingest path), and recall@3 of the labeled questions with a flat index. Drift is measured
+# against the first backend: row-wise cosine of query and chunk vectors, and how often the
+# top-1 chunk is the same. Exits with status 1 if any backend's minimum cosine is below
+# --min-cosine, so it can gate a backend switch. Models must be in the local HF cache.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.load_test import percentile
+from benchmarks.retrieval_bench import build_corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(backend, args):
+    """Run one backend in this (fresh) process; returns (stats, query_vectors, chunk_vectors)."""
+    import rag
+    from embedders import load_embedder
+    text, questions = build_corpus(args.products, args.seed)
+    chunks = rag.chunk_text(text)
+    queries = [q["question"] for q in questions][:args.queries]
+
+    before = rss_kb()
+    started = time.perf_counter()
+    embedder = load_embedder(backend, args.model)
+    embedder.encode(["warm up"])
+    load_s = time.perf_counter() - started
+
+    latencies, query_vectors = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        query_vectors.append(np.asarray(embedder.encode([query]), dtype=np.float32)[0])
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+
+    started = time.perf_counter()
+    chunk_vectors = np.asarray(embedder.encode(chunks, batch_size=args.batch_size), dtype=np.float32)
+    bulk_s = time.perf_counter() - started
+
+    query_vectors = np.vstack(query_vectors)
+    top = np.argsort(-normalize(query_vectors) @ normalize(chunk_vectors).T, axis=1)[:, :3]
+    hits = sum(1 for q, row in zip(questions, top) if any(q["answer"] in chunks[i] for i in row))
+    stats = {
+        "load_s": round(load_s, 2),
+        "rss_mb": round((rss_kb() - before) / 1024, 1),
+        "query_p50_ms": round(percentile(latencies, 50), 3),
+        "query_p95_ms": round(percentile(latencies, 95), 3),
+        "bulk_texts_per_s": round(len(chunks) / bulk_s, 1),
+        "recall@3": round(hits / len(queries), 4),
+    }
+    return stats, query_vectors, chunk_vectors
+
+
+def normalize(vectors):
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend latency/throughput/drift benchmark")
+    parser.add_argument("--backends", default="torch,torch-int8,onnx,onnx-int8")
+    parser.add_argument("--model", default=None, help="default EMBED_MODEL")
+    parser.add_argument("--products", type=int, default=80)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results", "embed_backends.json"))
+    args = parser.parse_args()
+
+    from embedders import drift
+    ctx = multiprocessing.get_context("spawn")
+    report = {"config": vars(args), "backends": {}}
+    reference = None
+    failed = []
+    for backend in args.backends.split(","):
+        with ctx.Pool(1) as pool:
+            try:
+                stats, query_vectors, chunk_vectors = pool.apply(measure, (backend, args))
+            except Exception as e:
+                print(f"{backend}: skipped ({type(e).__name__}: {e})")
+                report["backends"][backend] = {"error": str(e)}
+                continue
+        if reference is None:
+            reference = (backend, query_vectors, chunk_vectors)
+        else:
+            ref_name, ref_queries, ref_chunks = reference
+            query_drift = drift(ref_queries, query_vectors)
+            chunk_drift = drift(ref_chunks, chunk_vectors)
+            same_top1 = np.mean(np.argmax(normalize(ref_queries) @ normalize(ref_chunks).T, axis=1)
+                                == np.argmax(normalize(query_vectors) @ normalize(chunk_vectors).T, axis=1))
+            stats["drift_vs"] = ref_name
+            stats["min_cosine"] = round(min(query_drift["min"], chunk_drift["min"]), 5)
+            stats["mean_cosine"] = round((query_drift["mean"] + chunk_drift["mean"]) / 2, 5)
+            stats["top1_agreement"] = round(float(same_top1), 4)
+            if stats["min_cosine"] < args.min_cosine:
+                failed.append(backend)
+        report["backends"][backend] = stats
+        print(backend, json.dumps(stats))
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    if failed:
+        print(f"Drift above threshold (min cosine < {args.min_cosine}): {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
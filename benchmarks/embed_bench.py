@@ -0,0 +1,159 @@
+# Query-embedding throughput: one model per API worker vs. the shared embed_server.py.
+#
+#   python -m benchmarks.embed_bench --workers 4 --threads 4 --duration 15 --out benchmarks/results/embed.json
+#
+# "local" starts --workers processes that each load their own model and encode one query per
+# call (what retrieve_from_rag does today); "server" starts the same processes with a
+# RemoteEmbedder against a micro-batching EmbedServer hosted by this process. Reports
+# throughput, latency, total RSS of the process tree and the server's average batch size.
+# The model must be in the local Hugging Face cache; --hash uses benchmarks.hash_embedder
+# instead (checks the plumbing, but shows no batching gain since it has no batched kernels).
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.load_test import summarize, process_tree_rss_kb
+from benchmarks.retrieval_bench import BRANDS, KINDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATES = [
+    "How much does the {} cost?",
+    "Is the {} in stock in Lahore?",
+    "What warranty comes with the {}?",
+    "Can I pay cash on delivery for the {}?",
+]
+
+
+def queries(n=500, seed=7):
+    rng = random.Random(seed)
+    return [rng.choice(TEMPLATES).format(f"{rng.choice(BRANDS)} {rng.choice(KINDS)} {rng.randint(1, 99)}")
+            for _ in range(n)]
+
+
+def make_embedder(args):
+    if args.hash:
+        from benchmarks.hash_embedder import HashEmbedder
+        return HashEmbedder()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(args.model)
+
+
+def worker(mode, args, socket_path, start, results):
+    """One simulated API worker: --threads closed-loop clients encoding single queries."""
+    if mode == "local":
+        embedder = make_embedder(args)
+    else:
+        from embed_server import RemoteEmbedder
+        embedder = RemoteEmbedder(socket_path)
+    texts = queries()
+    embedder.encode(["warm up"])
+    start.wait()
+    deadline = time.perf_counter() + args.duration
+    latencies, errors = [], []
+
+    def client(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                embedder.encode([rng.choice(texts)])
+                latencies.append(round((time.perf_counter() - t0) * 1000, 2))
+            except Exception:
+                errors.append(1)
+
+    threads = [threading.Thread(target=client, args=(os.getpid() * 100 + i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put((latencies, len(errors)))
+
+
+def start_server(embedder, args, socket_path):
+    from embed_server import EmbedServer
+    server = EmbedServer(embedder, args.batch_max, args.max_wait_ms)
+    ready = threading.Event()
+    threading.Thread(target=lambda: asyncio.run(server.serve(socket_path, ready)), daemon=True).start()
+    if not ready.wait(30):
+        raise RuntimeError("embed server did not start")
+    return server
+
+
+def run(mode, args, socket_path):
+    ctx = multiprocessing.get_context("spawn")  # no forked torch thread pools
+    start = ctx.Barrier(args.workers + 1)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, args, socket_path, start, results)) for _ in range(args.workers)]
+    for p in procs:
+        p.start()
+    start.wait(timeout=600)  # all models loaded and warmed up
+    started = time.perf_counter()
+    time.sleep(args.duration / 2)
+    rss_kb = process_tree_rss_kb(os.getpid())
+    latencies, errors = [], 0
+    for _ in procs:
+        worker_latencies, worker_errors = results.get(timeout=args.duration + 120)
+        latencies += worker_latencies
+        errors += worker_errors
+    elapsed = time.perf_counter() - started
+    for p in procs:
+        p.join()
+    report = summarize(latencies, errors, elapsed)
+    report["rss_mb"] = round(rss_kb / 1024, 1) if rss_kb else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker models vs. the shared micro-batching embed server")
+    parser.add_argument("--workers", type=int, default=4, help="simulated API worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent requests per worker")
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--hash", action="store_true", help="use the hash embedder (no model download)")
+    parser.add_argument("--batch-max", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--modes", default="local,server")
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results", "embed.json"))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="embed-bench-")
+    socket_path = os.path.join(workdir, "embed.sock")
+    report = {"config": vars(args), "modes": {}}
+    try:
+        for mode in args.modes.split(","):
+            if mode == "server":
+                embedder = make_embedder(args)
+                server = start_server(embedder, args, socket_path)
+                from embed_server import RemoteEmbedder
+                sample = queries(32, seed=1)
+                remote = RemoteEmbedder(socket_path)
+                report["parity_max_abs_diff"] = float(np.abs(remote.encode(sample) - np.asarray(embedder.encode(sample))).max())
+                remote.close()
+            report["modes"][mode] = run(mode, args, socket_path)
+            if mode == "server":
+                report["modes"][mode]["server"] = server.metrics()
+            print(mode, json.dumps(report["modes"][mode]))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if {"local", "server"} <= set(report["modes"]):
+        local, shared = report["modes"]["local"], report["modes"]["server"]
+        report["speedup"] = round(shared["throughput_rps"] / local["throughput_rps"], 2) if local["throughput_rps"] else None
+        print(f"throughput x{report['speedup']}, RSS {local['rss_mb']} MB -> {shared['rss_mb']} MB")
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
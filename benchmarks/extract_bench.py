@@ -0,0 +1,103 @@
+# HTML text extraction: extractor.extract_text vs. the BeautifulSoup extractors it replaced.
+#
+#   python -m benchmarks.extract_bench --repeat 50 --out benchmarks/results/extract.json
+#
+# For every saved page in benchmarks/fixtures/site and benchmarks/fixtures/pages, reports
+# bytes of text produced, median extraction time, the number of RAG chunks that text becomes
+# (rag.chunk_text with the configured defaults), and coverage: the share of the page's main
+# content blocks (p/li/td/h1-h6 inside <main>) that appear in the output.
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+import lxml.html
+
+import rag
+from extractor import extract_text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = [os.path.join(ROOT, "benchmarks", "fixtures", "site"), os.path.join(ROOT, "benchmarks", "fixtures", "pages")]
+
+
+def legacy_find_all(html):
+    """The old Playwright-path extractor: get_text() of every block/inline element, joined."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    texts = [elem.get_text(strip=True) for elem in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'div', 'span', 'li', 'td', 'th'])]
+    return ' '.join(filter(None, texts))
+
+
+def legacy_get_text(html):
+    """The old requests-fallback extractor: all text minus script/style."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    for script in soup(["script", "style"]):
+        script.extract()
+    return " ".join(soup.get_text(separator=' ').split())
+
+
+EXTRACTORS = {"lxml": extract_text, "legacy_find_all": legacy_find_all, "legacy_get_text": legacy_get_text}
+
+
+def main_blocks(html):
+    root = lxml.html.document_fromstring(html)
+    scope = root.xpath("//main") or [root]
+    blocks = []
+    for el in scope[0].iter("p", "li", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6"):
+        text = " ".join(el.text_content().split())
+        if text:
+            blocks.append(text)
+    return blocks
+
+
+def measure(fn, html, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = fn(html)
+        timings.append((time.perf_counter() - started) * 1000)
+    return text, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML extraction size/speed/chunk-count benchmark")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results", "extract.json"))
+    args = parser.parse_args()
+
+    pages = sorted(p for directory in FIXTURES for p in glob.glob(os.path.join(directory, "*.html")))
+    report = {"config": vars(args), "pages": {}, "totals": {name: {"bytes_out": 0, "ms": 0.0, "chunks": 0} for name in EXTRACTORS}}
+    for path in pages:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        blocks = main_blocks(html)
+        page = {"bytes_in": len(html.encode("utf-8"))}
+        for name, fn in EXTRACTORS.items():
+            text, ms = measure(fn, html, args.repeat)
+            flat = " ".join(text.split())
+            stats = {
+                "bytes_out": len(text.encode("utf-8")),
+                "ms": round(ms, 3),
+                "chunks": len(rag.chunk_text(text)),
+                "coverage": round(sum(1 for b in blocks if b in flat) / len(blocks), 4) if blocks else None,
+            }
+            page[name] = stats
+            totals = report["totals"][name]
+            totals["bytes_out"] += stats["bytes_out"]
+            totals["ms"] = round(totals["ms"] + stats["ms"], 3)
+            totals["chunks"] += stats["chunks"]
+        report["pages"][os.path.relpath(path, ROOT)] = page
+        print(os.path.basename(path), json.dumps({name: page[name] for name in EXTRACTORS}))
+
+    print("totals", json.dumps(report["totals"]))
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
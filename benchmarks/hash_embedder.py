@@ -0,0 +1,42 @@
+# Small deterministic embedder for offline benchmarks: hashed word unigrams/bigrams and
+# character trigrams projected into a fixed-size, L2-normalised vector. No model download,
+# same output on every machine.
+
+import re
+import zlib
+
+import numpy as np
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class HashEmbedder:
+    """Drop-in for SentenceTransformer.encode() in benchmarks."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _features(self, text: str):
+        words = TOKEN.findall(text.lower())
+        for word in words:
+            yield word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i:i+3], 0.3
+        for first, second in zip(words, words[1:]):
+            yield f"b:{first} {second}", 0.7
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        out = np.zeros((len(sentences), self.dim), dtype="float32")
+        for row, text in enumerate(sentences):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                out[row, h % self.dim] += weight if (h >> 31) & 1 else -weight
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
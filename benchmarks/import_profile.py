@@ -0,0 +1,106 @@
+# Cold-start profile: `python -X importtime` summary for a module plus uvicorn worker boot time.
+#
+#   python -m benchmarks.import_profile --module app --target-boot-seconds 1.5 --check
+#
+# The same summary is embedded in the load_test.py report under "import_profile".
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGET_BOOT_SECONDS = 1.5
+
+
+def parse_importtime(stderr: str):
+    """Rows of (self_us, cumulative_us, depth, module) from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def import_profile(module="app", env=None, top=15):
+    """Import `module` in a fresh interpreter and summarise where the time went."""
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    rows = parse_importtime(proc.stderr)
+    # Rows are printed children-first, so the module's subtree is the run of deeper rows before it
+    end = next((i for i, r in enumerate(rows) if r[3] == module and r[2] == 0), None)
+    start = end
+    while start and rows[start - 1][2] > 0:
+        start -= 1
+    subtree = rows[start:end] if end is not None else []
+    total = rows[end][1] if end is not None else None
+    by_package = {}
+    for self_us, _, _, name in subtree + rows[end:end + 1]:
+        root = name.split(".")[0]
+        by_package[root] = by_package.get(root, 0) + self_us
+    direct = sorted((r for r in subtree if r[2] == 1), key=lambda r: r[1], reverse=True)
+    return {
+        "module": module,
+        "ok": proc.returncode == 0,
+        "wall_seconds": round(wall, 3),
+        "import_seconds": round(total / 1e6, 3) if total else None,
+        "modules_imported": len(subtree) + (end is not None),
+        "top_direct_imports_ms": {name: round(cum / 1000, 1) for _, cum, _, name in direct[:top]},
+        "top_packages_self_ms": {
+            name: round(us / 1000, 1)
+            for name, us in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]
+        },
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+    }
+
+
+def worker_boot_seconds(env=None, timeout=120):
+    """Seconds from spawning `uvicorn app:app` until GET /healthz answers."""
+    from benchmarks.load_test import free_port, start_app, stop, wait_for
+    port = free_port()
+    log_path = os.devnull
+    started = time.perf_counter()
+    proc = start_app(port, 1, env or dict(os.environ), log_path)
+    try:
+        if not wait_for(f"http://127.0.0.1:{port}/healthz", timeout):
+            return None
+        return round(time.perf_counter() - started, 3)
+    finally:
+        stop(proc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and worker boot profile")
+    parser.add_argument("--module", action="append", help="module(s) to profile, default: app, rag, config")
+    parser.add_argument("--target-boot-seconds", type=float, default=TARGET_BOOT_SECONDS)
+    parser.add_argument("--skip-boot", action="store_true", help="only profile imports")
+    parser.add_argument("--check", action="store_true", help="exit 1 if boot time misses the target")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    report = {"imports": [import_profile(m) for m in (args.module or ["app", "rag", "config"])]}
+    if not args.skip_boot:
+        boot = worker_boot_seconds()
+        report["worker_boot"] = {
+            "seconds": boot,
+            "target_seconds": args.target_boot_seconds,
+            "met": boot is not None and boot <= args.target_boot_seconds,
+        }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    if args.check and not report.get("worker_boot", {}).get("met", True):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
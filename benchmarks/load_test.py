@@ -0,0 +1,368 @@
+# End-to-end load test: runs app.py under uvicorn against a stub LLM and a local fixture site,
+# drives /chat, /order and URL-ingest traffic, and writes latency/throughput/RSS results as JSON.
+#
+#   python -m benchmarks.load_test --concurrency 8 --qps 20 --duration 30 --out benchmarks/results/latest.json
+#
+# Everything runs on 127.0.0.1. The embedding model must already be in the local
+# Hugging Face cache because the app is started with HF_HUB_OFFLINE=1.
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks import stub_llm
+from benchmarks.import_profile import TARGET_BOOT_SECONDS, import_profile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_SITE = os.path.join(ROOT, "benchmarks", "fixtures", "site")
+
+KB_QUESTIONS = [
+    "What are your business hours?",
+    "Do you offer delivery services?",
+    "What payment methods do you accept?",
+    "How can I track my order?",
+]
+FREE_QUESTIONS = [
+    "What is the warranty on headphones?",
+    "Is cash on delivery available?",
+    "Where is your warehouse?",
+    "How long does shipping take to Quetta?",
+    "Do you give corporate discounts?",
+]
+ORDER_MESSAGES = [
+    "I want to buy a smartwatch",
+    "Can I place order for headphones",
+]
+FIXTURE_PAGES = ["index.html", "products.html", "shipping.html", "faq.html"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies_ms, errors, elapsed, rejected=0):
+    values = sorted(latencies_ms)
+    return {
+        "requests": len(values) + errors + rejected,
+        "errors": errors,
+        "rejected": rejected,  # 429 from the app's admission control
+        "throughput_rps": round((len(values) + errors + rejected) / elapsed, 2) if elapsed else None,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "mean_ms": round(sum(values) / len(values), 2) if values else None,
+        "max_ms": values[-1] if values else None,
+    }
+
+
+def process_tree_rss_kb(pid):
+    """Resident memory of a process and its children in kB (Linux /proc only)."""
+    try:
+        children = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+                    children.setdefault(ppid, []).append(int(entry))
+                except (OSError, ValueError, IndexError):
+                    continue
+        total, stack = 0, [pid]
+        while stack:
+            current = stack.pop()
+            try:
+                with open(f"/proc/{current}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1])
+                            break
+            except OSError:
+                pass
+            stack.extend(children.get(current, []))
+        return total
+    except OSError:
+        return None
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            rss = process_tree_rss_kb(self.pid)
+            if rss:
+                self.samples.append(rss)
+            self.stopped.wait(self.interval)
+
+    def result(self):
+        if not self.samples:
+            return {"rss_peak_mb": None, "rss_final_mb": None}
+        return {
+            "rss_start_mb": round(self.samples[0] / 1024, 1),
+            "rss_peak_mb": round(max(self.samples) / 1024, 1),
+            "rss_final_mb": round(self.samples[-1] / 1024, 1),
+        }
+
+
+def wait_for(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    return False
+
+
+def start_app(port, workers, env, log_path):
+    cmd = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+           "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    log = open(log_path, "w")
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def stop(proc):
+    if proc and proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+class Workload:
+    """Weighted request mix; each call returns (kind, path, json_body)."""
+
+    def __init__(self, mix, site_url, tenants, seed):
+        self.kinds = list(mix)
+        self.weights = [mix[k] for k in self.kinds]
+        self.site_url = site_url
+        self.tenants = tenants
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            kind = self.rng.choices(self.kinds, self.weights)[0]
+            email = self.rng.choice(self.tenants)
+            if kind == "order":
+                return kind, "/order", {
+                    "name": "Bench User",
+                    "address": "1 Benchmark Road, Karachi",
+                    "contact_number": "+920000000000",
+                    "item_id": self.rng.randint(1, 5),
+                }
+            if kind == "ingest":
+                page = self.rng.choice(FIXTURE_PAGES)
+                message = f"Please learn from {self.site_url}/{page}"
+            elif kind == "chat_kb":
+                message = self.rng.choice(KB_QUESTIONS)
+            elif kind == "chat_order":
+                message = self.rng.choice(ORDER_MESSAGES)
+            else:
+                message = self.rng.choice(FREE_QUESTIONS)
+        return kind, "/chat", {"name": "Bench User", "email": email, "message": message}
+
+
+def drive(base_url, workload, concurrency, qps, duration, timeout):
+    """Open-loop at `qps` (or closed-loop when qps == 0) for `duration` seconds."""
+    local = threading.local()
+    results = []
+    results_lock = threading.Lock()
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def one():
+        kind, path, body = workload.next()
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = session().post(base_url + path, json=body, timeout=timeout)
+            outcome = {200: "ok", 429: "rejected"}.get(response.status_code, "error")
+        except requests.RequestException:
+            pass
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        with results_lock:
+            results.append((kind, outcome, elapsed_ms))
+
+    started = time.perf_counter()
+    end = started + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if qps > 0:
+            interval, sent = 1.0 / qps, 0
+            while True:
+                target = started + sent * interval
+                if target >= end:
+                    break
+                time.sleep(max(0.0, target - time.perf_counter()))
+                pool.submit(one)
+                sent += 1
+        else:
+            def loop():
+                while time.perf_counter() < end:
+                    one()
+            for _ in range(concurrency):
+                pool.submit(loop)
+    return results, time.perf_counter() - started
+
+
+def build_report(results, elapsed):
+    by_kind = {}
+    for kind, outcome, ms in results:
+        bucket = by_kind.setdefault(kind, {"latencies": [], "error": 0, "rejected": 0})
+        if outcome == "ok":
+            bucket["latencies"].append(ms)
+        else:
+            bucket[outcome] += 1
+    report = {kind: summarize(b["latencies"], b["error"], elapsed, b["rejected"]) for kind, b in sorted(by_kind.items())}
+    report["overall"] = summarize([ms for _, outcome, ms in results if outcome == "ok"],
+                                  sum(1 for _, outcome, _ in results if outcome == "error"), elapsed,
+                                  sum(1 for _, outcome, _ in results if outcome == "rejected"))
+    return report
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, weight = part.split("=")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end load test for app.py")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--qps", type=float, default=20, help="0 = closed loop, as fast as possible")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5, help="seconds of unrecorded traffic first")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--mix", default="chat_kb=0.3,chat_llm=0.35,chat_order=0.1,order=0.2,ingest=0.05")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-error-rate", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results", "load_test.json"))
+    parser.add_argument("--target-boot-seconds", type=float, default=TARGET_BOOT_SECONDS)
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    stub = stub_llm.serve(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms,
+                          error_rate=args.llm_error_rate, seed=args.seed)
+    site_port = free_port()
+    site = subprocess.Popen([sys.executable, "-m", "http.server", str(site_port), "--bind", "127.0.0.1",
+                             "--directory", FIXTURE_SITE], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    stub_url = f"http://127.0.0.1:{stub.server_port}"
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_API_KEY": "bench-key",
+        "GEMINI_API_ENDPOINT": stub_url,
+        "HF_API_KEY": "bench-key",
+        "HF_API_URL": f"{stub_url}/hf/models/stub",
+        "DB_NAME": os.path.join(workdir, "dataBase.db"),
+        "RAG_DIR": os.path.join(workdir, "rags"),
+        "ORDERS_FILE": os.path.join(workdir, "orders.json"),
+        "FETCH_CACHE_DIR": os.path.join(workdir, "http_cache"),  # cold cache every run, nothing in the repo
+        "LEADS_ARCHIVE_DIR": os.path.join(workdir, "leads_archive"),
+        "KB_FILE": os.path.join(ROOT, "knowledgeBase.json"),
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+        "NO_PROXY": "127.0.0.1,localhost",
+    })
+    app_port = free_port()
+    base_url = f"http://127.0.0.1:{app_port}"
+    app = None
+    try:
+        boot_started = time.perf_counter()
+        app = start_app(app_port, args.workers, env, os.path.join(workdir, "app.log"))
+        if not wait_for(base_url + "/healthz", timeout=120):
+            raise SystemExit(f"app did not start, see {os.path.join(workdir, 'app.log')}")
+        boot_seconds = time.perf_counter() - boot_started
+        # /readyz answers 503 (which wait_for ignores) until the warm-up has finished
+        wait_for(base_url + "/readyz", timeout=300)
+        ready_seconds = time.perf_counter() - boot_started
+        wait_for(f"http://127.0.0.1:{site_port}/index.html", timeout=10)
+
+        sampler = RssSampler(app.pid)
+        sampler.start()
+        workload = Workload(parse_mix(args.mix), f"http://127.0.0.1:{site_port}",
+                            [f"tenant{i}@bench.local" for i in range(args.tenants)], args.seed)
+        if args.warmup > 0:
+            drive(base_url, workload, args.concurrency, args.qps, args.warmup, args.timeout)
+        results, elapsed = drive(base_url, workload, args.concurrency, args.qps, args.duration, args.timeout)
+        sampler.stopped.set()
+        sampler.join()
+
+        report = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "config": vars(args),
+            "boot_seconds": round(boot_seconds, 3),
+            "boot_target_seconds": args.target_boot_seconds,
+            "boot_target_met": boot_seconds <= args.target_boot_seconds,
+            "ready_seconds": round(ready_seconds, 3),
+            "warmup": requests.get(base_url + "/readyz", timeout=5).json(),
+            "import_profile": import_profile("app", env=env),
+            "elapsed_seconds": round(elapsed, 3),
+            "memory": sampler.result(),
+            "latency": build_report(results, elapsed),
+            "stub_llm": requests.get(stub_url + "/stats", timeout=5).json(),
+            "limiter": requests.get(base_url + "/metrics", timeout=5).json(),
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(json.dumps(report["latency"]["overall"], indent=2))
+        print(f"Results written to {args.out}")
+    finally:
+        stop(app)
+        stop(site)
+        stub.shutdown()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# Production traffic replay: reads a time window of the leads table and sends the recorded
+# (name, email, user_message) turns to app.py with their original inter-arrival timing, then
+# writes latency and a response diff as JSON.
+#
+#   python -m benchmarks.replay --db dataBase.db --since "2024-06-01" --until "2024-06-02" \
+#       --speed 10 --out benchmarks/results/replay.json
+#   python -m benchmarks.replay --db dataBase.db --since "2024-06-01" --baseline benchmarks/results/replay.json
+#
+# Without --target, app.py is started under uvicorn in a temporary directory (fresh database,
+# --rag-dir copied in if given) against the stub LLM, as in load_test. With --target, requests go
+# to that instance as is (point it at benchmarks/stub_llm.py yourself). Every answer is compared
+# with the recorded bot_response and, with --baseline (an earlier replay's output), with that
+# run's answer to the same lead: a caching or routing change should keep the baseline diff at
+# zero while lowering latency. Messages containing URLs are skipped unless --include-urls,
+# since they make the app fetch external sites.
+
+import argparse
+import difflib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from benchmarks import stub_llm
+from benchmarks.load_test import ROOT, free_port, git_commit, percentile, start_app, stop, summarize, wait_for
+
+URL = re.compile(r"https?://\S+")
+
+
+def read_leads(db, since=None, until=None, email=None, limit=None, include_urls=False):
+    """Leads in the window as dicts, oldest first (read-only; keyset batches)."""
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    where, args = ["timestamp IS NOT NULL"], []
+    if since:
+        where.append("timestamp >= ?")
+        args.append(since.replace("T", " "))
+    if until:
+        where.append("timestamp < ?")
+        args.append(until.replace("T", " "))
+    if email:
+        where.append("email = ?")
+        args.append(email)
+    leads, last = [], ("", 0)
+    try:
+        while limit is None or len(leads) < limit:
+            rows = conn.execute(
+                f"""SELECT id, name, email, user_message, bot_response, timestamp FROM leads
+                    WHERE {' AND '.join(where)} AND (timestamp > ? OR (timestamp = ? AND id > ?))
+                    ORDER BY timestamp, id LIMIT 1000""",
+                args + [last[0], last[0], last[1]]
+            ).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                lead = dict(zip(("id", "name", "email", "message", "recorded", "timestamp"), row))
+                if lead["message"] and (include_urls or not URL.search(lead["message"])):
+                    leads.append(lead)
+            last = (rows[-1][5], rows[-1][0])
+    finally:
+        conn.close()
+    return leads[:limit] if limit else leads
+
+
+def schedule(leads, speed, max_gap):
+    """Send offsets in seconds: original gaps divided by `speed`, each capped at `max_gap` (speed 0 = all at once)."""
+    offsets, offset, previous = [], 0.0, None
+    for lead in leads:
+        at = datetime.fromisoformat(lead["timestamp"].replace(" ", "T"))
+        if previous is not None and speed > 0:
+            gap = (at - previous).total_seconds() / speed
+            offset += min(max(gap, 0.0), max_gap) if max_gap > 0 else max(gap, 0.0)
+        offsets.append(offset)
+        previous = at
+    return offsets
+
+
+def replay(base_url, endpoint, leads, offsets, concurrency, timeout):
+    """Send every lead at its offset; returns one result dict per lead (lead order).
+
+    An email's turns go one at a time in recorded order (a user waits for the answer), so
+    conversation memory sees the same history as in production.
+    """
+    local = threading.local()
+    results = [None] * len(leads)
+    previous = {}
+
+    def send(i, before):
+        if before is not None:
+            before.result()  # submitted earlier, so already running or done: no deadlock
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        lead = leads[i]
+        lag = time.perf_counter() - started - offsets[i]
+        body = {"name": lead["name"] or "", "email": lead["email"] or "", "message": lead["message"]}
+        sent = time.perf_counter()
+        try:
+            response = session.post(base_url + endpoint, json=body, timeout=timeout)
+            status = "ok" if response.status_code == 200 else ("rejected" if response.status_code == 429 else "error")
+            answer = response.json().get("response") if status == "ok" else None
+        except (requests.RequestException, ValueError):
+            status, answer = "error", None
+        results[i] = {"id": lead["id"], "email": lead["email"], "status": status, "response": answer,
+                      "latency_ms": round((time.perf_counter() - sent) * 1000, 2), "lag_ms": round(lag * 1000, 2)}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, offset in enumerate(offsets):
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            email = leads[i]["email"]
+            previous[email] = pool.submit(send, i, previous.get(email))
+    return results, time.perf_counter() - started
+
+
+def diff(pairs, show):
+    """Compare (lead id, message, expected, actual) answers: exact matches, similarity, worst examples."""
+    compared, same, ratios, examples = 0, 0, [], []
+    for lead_id, message, expected, actual in pairs:
+        if expected is None or actual is None:
+            continue
+        compared += 1
+        if expected == actual:
+            same += 1
+            continue
+        ratio = difflib.SequenceMatcher(None, expected, actual, autojunk=False).ratio()
+        ratios.append(ratio)
+        examples.append({"id": lead_id, "message": message, "similarity": round(ratio, 4),
+                         "expected": expected[:300], "actual": actual[:300]})
+    examples.sort(key=lambda example: example["similarity"])
+    return {
+        "compared": compared,
+        "identical": same,
+        "different": compared - same,
+        "identical_rate": round(same / compared, 4) if compared else None,
+        "mean_similarity_of_different": round(sum(ratios) / len(ratios), 4) if ratios else None,
+        "examples": examples[:show],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded leads against app.py and diff the answers")
+    parser.add_argument("--db", default=os.path.join(ROOT, "dataBase.db"), help="database to read leads from")
+    parser.add_argument("--since", help="first timestamp (YYYY-MM-DD[ HH:MM:SS], UTC as stored)")
+    parser.add_argument("--until", help="end timestamp, exclusive")
+    parser.add_argument("--email", help="only this email's turns")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--include-urls", action="store_true", help="also replay website-ingest messages")
+    parser.add_argument("--speed", type=float, default=1.0, help="time compression; 0 = send as fast as possible")
+    parser.add_argument("--max-gap", type=float, default=5.0, help="longest wait between two sends in seconds (0 = no cap)")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight at most")
+    parser.add_argument("--endpoint", default="/chat")
+    parser.add_argument("--target", help="base URL of a running app.py; default: start one with the stub LLM")
+    parser.add_argument("--rag-dir", help="RAG folder copied into the started app (tenant indexes)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started app")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--baseline", help="an earlier replay output to diff the answers against")
+    parser.add_argument("--show", type=int, default=20, help="differing answers included per diff")
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results", "replay.json"))
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+
+    leads = read_leads(args.db, args.since, args.until, args.email, args.limit, args.include_urls)
+    if not leads:
+        raise SystemExit("No leads in that window.")
+    offsets = schedule(leads, args.speed, args.max_gap)
+    print(f"Replaying {len(leads)} leads from {leads[0]['timestamp']} to {leads[-1]['timestamp']} "
+          f"over {offsets[-1]:.1f}s")
+
+    workdir = stub = app = None
+    base_url = args.target.rstrip("/") if args.target else None
+    try:
+        if base_url is None:
+            workdir = tempfile.mkdtemp(prefix="replay-")
+            stub = stub_llm.serve(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms, error_rate=0.0, seed=0)
+            stub_url = f"http://127.0.0.1:{stub.server_port}"
+            if args.rag_dir:
+                shutil.copytree(args.rag_dir, os.path.join(workdir, "rags"))
+            env = dict(os.environ)
+            env.update({
+                "GEMINI_API_KEY": "replay-key",
+                "GEMINI_API_ENDPOINT": stub_url,
+                "HF_API_KEY": "replay-key",
+                "HF_API_URL": f"{stub_url}/hf/models/stub",
+                "DB_NAME": os.path.join(workdir, "dataBase.db"),
+                "RAG_DIR": os.path.join(workdir, "rags"),
+                "ORDERS_FILE": os.path.join(workdir, "orders.json"),
+                "FETCH_CACHE_DIR": os.path.join(workdir, "http_cache"),  # cold cache every run, nothing in the repo
+                "LEADS_ARCHIVE_DIR": os.path.join(workdir, "leads_archive"),
+                "KB_FILE": os.path.join(ROOT, "knowledgeBase.json"),
+                "RATE_LIMIT_PER_MINUTE": "0",  # production traffic was already within its limits
+                "HF_HUB_OFFLINE": "1",
+                "TRANSFORMERS_OFFLINE": "1",
+                "NO_PROXY": "127.0.0.1,localhost",
+            })
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            app = start_app(port, args.workers, env, os.path.join(workdir, "app.log"))
+            if not wait_for(base_url + "/healthz", timeout=120):
+                raise SystemExit(f"app did not start, see {os.path.join(workdir, 'app.log')}")
+            wait_for(base_url + "/readyz", timeout=300)
+
+        results, elapsed = replay(base_url, args.endpoint, leads, offsets, args.concurrency, args.timeout)
+        ok = [r["latency_ms"] for r in results if r["status"] == "ok"]
+        lags = sorted(r["lag_ms"] for r in results)
+        report = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": vars(args),
+            "window": {"first": leads[0]["timestamp"], "last": leads[-1]["timestamp"], "leads": len(leads)},
+            "elapsed_seconds": round(elapsed, 3),
+            "latency": summarize(ok, sum(r["status"] == "error" for r in results), elapsed,
+                                 sum(r["status"] == "rejected" for r in results)),
+            "schedule_lag_ms": {"p50": percentile(lags, 50), "p95": percentile(lags, 95), "max": lags[-1]},
+            "diff_recorded": diff([(lead["id"], lead["message"], lead["recorded"], r["response"])
+                                   for lead, r in zip(leads, results)], args.show),
+        }
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            previous = {r["id"]: r for r in baseline.get("results", [])}
+            report["diff_baseline"] = diff([(lead["id"], lead["message"], previous.get(lead["id"], {}).get("response"),
+                                             r["response"]) for lead, r in zip(leads, results)], args.show)
+            if baseline.get("latency"):
+                report["baseline_latency"] = baseline["latency"]
+        if stub:
+            report["llm_stub"] = requests.get(f"http://127.0.0.1:{stub.server_port}/stats", timeout=5).json()
+        report["results"] = results
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        summary = {key: report[key] for key in ("latency", "schedule_lag_ms", "llm_stub") if key in report}
+        summary["diff_recorded"] = {k: v for k, v in report["diff_recorded"].items() if k != "examples"}
+        if "diff_baseline" in report:
+            summary["diff_baseline"] = {k: v for k, v in report["diff_baseline"].items() if k != "examples"}
+        print(json.dumps(summary, indent=2))
+        print(f"Results written to {args.out}")
+    finally:
+        stop(app)
+        if stub:
+            stub.shutdown()
+        if workdir and not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
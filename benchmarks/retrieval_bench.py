@@ -0,0 +1,146 @@
+# Retrieval quality vs. latency for build_rag_for_user / search_rag.
+#
+#   python -m benchmarks.retrieval_bench --products 80 --out benchmarks/results/retrieval.json
+#
+# Builds a synthetic product corpus with a labeled question set (every answer is a unique
+# string in the corpus), then sweeps chunking strategies, FAISS index types and top_k.
+# Uses benchmarks.hash_embedder so it runs on CPU with no model download.
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import rag
+from benchmarks.hash_embedder import HashEmbedder
+
+BRANDS = ["Aero", "Pulse", "Boom", "Volt", "Nimbus", "Orbit", "Zen", "Echo", "Nova", "Flux"]
+KINDS = ["Headphones", "Smartwatch", "Speaker", "Charger", "Mouse", "Keyboard", "Webcam", "Router"]
+CITIES = ["Lahore", "Karachi", "Islamabad", "Multan", "Quetta", "Peshawar", "Faisalabad"]
+FILLER = [
+    "All orders are packed in recyclable boxes and checked twice before dispatch.",
+    "Our support team answers most messages within one working day.",
+    "Prices include sales tax and may change during seasonal promotions.",
+    "Customers can pay by card, bank transfer, JazzCash, Easypaisa or cash on delivery.",
+    "Gift wrapping is available at checkout for a small fee.",
+    "Delivery partners will call before arriving at the address provided.",
+]
+
+
+def build_corpus(n_products: int, seed: int):
+    """Return (text, questions) where each question is {"question", "answer"}."""
+    rng = random.Random(seed)
+    prices = rng.sample(range(1000, 99999), n_products)
+    codes = rng.sample(range(1000, 9999), n_products)
+    days = rng.sample(range(1, 28 * 12), n_products)
+    paragraphs, questions = [], []
+    for i in range(n_products):
+        name = f"{BRANDS[i % len(BRANDS)]} {KINDS[(i // len(BRANDS)) % len(KINDS)]} {i + 1}"
+        price = f"Rs {prices[i]:,}"
+        code = f"NW-{codes[i]}"
+        month, day = divmod(days[i], 28)
+        launch = f"{day + 1} {['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December'][month]}"
+        city = rng.choice(CITIES)
+        paragraphs.append(
+            f"The {name} is priced at {price}. Its model code is {code} and it ships from our {city} warehouse. "
+            f"It first went on sale on {launch} and carries a {rng.choice([6, 12, 24])} month warranty. "
+            + " ".join(rng.sample(FILLER, 2))
+        )
+        questions += [
+            {"question": f"How much does the {name} cost?", "answer": price},
+            {"question": f"What is the model code of the {name}?", "answer": code},
+            {"question": f"When did the {name} go on sale?", "answer": launch},
+        ]
+    return " ".join(paragraphs), questions
+
+
+def parse_strategy(spec: str):
+    """"fixed:500", "overlap:500:100" or "sentence:500" -> build_rag_for_user kwargs."""
+    parts = spec.split(":")
+    if parts[0] == "overlap":
+        return {"strategy": "fixed", "chunk_size": int(parts[1]), "overlap": int(parts[2])}
+    return {"strategy": parts[0], "chunk_size": int(parts[1]), "overlap": 0}
+
+
+def evaluate(email, questions, top_k, embedder):
+    latencies, hits, reciprocal = [], 0, 0.0
+    for q in questions:
+        started = time.perf_counter()
+        results = rag.search_rag(email, q["question"], top_k=top_k, embedder=embedder)
+        latencies.append((time.perf_counter() - started) * 1000)
+        rank = next((r for r, (_, chunk, _) in enumerate(results, 1) if q["answer"] in chunk), None)
+        if rank:
+            hits += 1
+            reciprocal += 1.0 / rank
+    latencies.sort()
+    return {
+        f"recall@{top_k}": round(hits / len(questions), 4),
+        f"mrr@{top_k}": round(reciprocal / len(questions), 4),
+        "query_p50_ms": round(latencies[len(latencies) // 2], 3),
+        "query_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "query_mean_ms": round(sum(latencies) / len(latencies), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval quality/latency benchmark")
+    parser.add_argument("--products", type=int, default=80)
+    parser.add_argument("--strategies", default="fixed:500,fixed:250,overlap:500:100,sentence:500,sentence:300")
+    parser.add_argument("--index-types", default="flat,flat_ip,hnsw,ivf")
+    parser.add_argument("--top-k", default="1,3,5,10")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default=os.path.join("benchmarks", "results", "retrieval.json"))
+    args = parser.parse_args()
+
+    text, questions = build_corpus(args.products, args.seed)
+    embedder = HashEmbedder(args.dim)
+    top_ks = [int(k) for k in args.top_k.split(",")]
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    original_dir, rag.RAG_DIR = rag.RAG_DIR, workdir
+    runs = []
+    try:
+        for spec in args.strategies.split(","):
+            for index_type in args.index_types.split(","):
+                email = f"{spec.replace(':', '-')}-{index_type}@bench.local"
+                started = time.perf_counter()
+                rag.build_rag_for_user(email, text, embedder=embedder, index_type=index_type, **parse_strategy(spec))
+                build_seconds = time.perf_counter() - started
+                _, folder = rag.index_files(email)
+                with open(os.path.join(folder, 'chunks.json')) as f:
+                    n_chunks = len(json.load(f))
+                run = {
+                    "chunking": spec,
+                    "index_type": index_type,
+                    "chunks": n_chunks,
+                    "build_seconds": round(build_seconds, 4),
+                    "index_bytes": os.path.getsize(os.path.join(folder, 'faiss_index')),
+                    "chunks_bytes": os.path.getsize(os.path.join(folder, 'chunks.json')),
+                    "by_top_k": {str(k): evaluate(email, questions, k, embedder) for k in top_ks},
+                }
+                runs.append(run)
+                best = run["by_top_k"][str(top_ks[-1])]
+                print(f"{spec:<18} {index_type:<8} chunks={n_chunks:<5} build={build_seconds:.3f}s "
+                      f"recall@{top_ks[-1]}={best[f'recall@{top_ks[-1]}']:.3f} "
+                      f"mrr={best[f'mrr@{top_ks[-1]}']:.3f} p50={best['query_p50_ms']:.2f}ms")
+    finally:
+        rag.RAG_DIR = original_dir
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "corpus": {"products": args.products, "characters": len(text), "questions": len(questions), "seed": args.seed},
+        "embedder": f"HashEmbedder(dim={args.dim})",
+        "runs": runs,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# Local stand-in for the Gemini REST API and the Hugging Face inference API.
+# Answers are deterministic (derived from the prompt) so benchmark runs can be diffed.
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GEMINI_PATH = re.compile(r"^/v1beta/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)")
+
+
+def stub_answer(prompt: str) -> str:
+    """Deterministic fake completion for a prompt."""
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+    return f"[stub {digest}] You asked: {prompt[:80]}"
+
+
+class StubState:
+    def __init__(self, latency_ms=200, jitter_ms=50, error_rate=0.0, error_status=503, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"gemini": 0, "hf": 0, "errors": 0}
+
+    def delay(self):
+        with self.lock:
+            jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self.rng.random() < self.error_rate
+        time.sleep(max(0.0, self.latency_ms + jitter) / 1000.0)
+        return failed
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b"{}"
+            try:
+                return json.loads(raw)
+            except ValueError:
+                return {}
+
+        def do_GET(self):
+            if self.path == "/stats":
+                with state.lock:
+                    return self._send_json(200, dict(state.counts))
+            self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            path = self.path.split("?", 1)[0]
+            body = self._read_json()
+            match = GEMINI_PATH.match(path)
+            if match:
+                stream = match.group("method") == "streamGenerateContent"
+                return self._gemini(body, stream=stream and ("sse" if "alt=sse" in self.path else "json"))
+            if path.startswith("/hf/"):
+                return self._huggingface(body)
+            self._send_json(404, {"error": "not found"})
+
+        def _gemini(self, body, stream=False):
+            failed = state.delay()
+            with state.lock:
+                state.counts["gemini"] += 1
+                state.counts["errors"] += int(failed)
+            if failed:
+                return self._send_json(state.error_status, {"error": {
+                    "code": state.error_status, "message": "stub upstream error", "status": "UNAVAILABLE"}})
+            prompt = " ".join(
+                part.get("text", "")
+                for content in body.get("contents", [])
+                for part in content.get("parts", [])
+            )
+            answer = stub_answer(prompt)
+            if stream:
+                return self._send_stream(answer, stream)
+            self._send_json(200, {
+                "candidates": [{
+                    "content": {"parts": [{"text": answer}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }],
+                "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": 24},
+            })
+
+        def _send_stream(self, answer, fmt):
+            """streamGenerateContent: the answer in a few chunks, as server-sent events (alt=sse)
+            or as one JSON array written piece by piece (the REST client's default)."""
+            words = answer.split(" ")
+            pieces = [" ".join(words[i:i + 8]) + (" " if i + 8 < len(words) else "") for i in range(0, len(words), 8)]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream" if fmt == "sse" else "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def write(text):
+                data = text.encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            if fmt != "sse":
+                write("[")
+            for i, piece in enumerate(pieces):
+                chunk = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0,
+                                         **({"finishReason": "STOP"} if i == len(pieces) - 1 else {})}]}
+                if fmt == "sse":
+                    write(f"data: {json.dumps(chunk)}\r\n\r\n")
+                else:
+                    write((",\r\n" if i else "") + json.dumps(chunk))
+            if fmt != "sse":
+                write("]")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _huggingface(self, body):
+            failed = state.delay()
+            with state.lock:
+                state.counts["hf"] += 1
+                state.counts["errors"] += int(failed)
+            if failed:
+                return self._send_json(state.error_status, {"error": "stub upstream error"})
+            self._send_json(200, [{"generated_text": stub_answer(body.get("inputs", ""))}])
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=0, **kwargs) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread and return the server (see server.server_port)."""
+    server = ThreadingHTTPServer((host, port), make_handler(StubState(**kwargs)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Gemini / Hugging Face server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(StubState(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        error_status=args.error_status, seed=args.seed)))
+    server.daemon_threads = True
+    print(f"Stub LLM listening on http://{args.host}:{server.server_port}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
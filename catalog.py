@@ -0,0 +1,222 @@
+# catalog.py
+# Product catalog stored in SQLite (products table + FTS5 name/alias index), with an id-indexed
+# LRU cache and pre-rendered product listings, so order flows stay fast with 100k SKUs.
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import DB_NAME, CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL, CATALOG_PAGE_SIZE
+from memstats import register, approx_size
+
+# Seeded into an empty catalog (the list that used to be hard-coded in the apps).
+# Aliases are extra comma-separated names customers use; matcher.py searches them too.
+DEFAULT_PRODUCTS = [
+    {"id": 1, "name": "Wireless Headphones", "price": 4500, "aliases": "headphones, headset, earphones"},
+    {"id": 2, "name": "Smartwatch", "price": 7500, "aliases": "smart watch, watch"},
+    {"id": 3, "name": "Bluetooth Speaker", "price": 3800, "aliases": "speaker, wireless speaker"},
+    {"id": 4, "name": "USB-C Charger", "price": 1200, "aliases": "charger, usb c charger, type c charger"},
+    {"id": 5, "name": "Gaming Mouse", "price": 3100, "aliases": "mouse"},
+    {"id": 6, "name": "HP laptop elitebook prox", "price": 150000, "aliases": "laptop, hp elitebook, elitebook"},
+]
+
+_lock = threading.Lock()
+_products = OrderedDict()  # id -> product dict, least recently used first
+_listings = {}             # (page, per_page) -> rendered text
+_version = None            # catalog version the caches were built from
+_version_checked = 0.0
+
+def _memory():
+    with _lock:
+        return {"entries": len(_products), "capacity": CATALOG_CACHE_SIZE, "listings": len(_listings),
+                "bytes": approx_size(_products) + approx_size(_listings)}
+
+register("catalog.products", _memory)
+
+FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, aliases, content='products', content_rowid='id'
+    );
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_vocab USING fts5vocab(products_fts, 'row');
+    CREATE TRIGGER IF NOT EXISTS products_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (rowid, name, aliases) VALUES (new.id, new.name, new.aliases);
+        UPDATE catalog_meta SET value = value + 1 WHERE key = 'version';
+    END;
+    CREATE TRIGGER IF NOT EXISTS products_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, aliases) VALUES ('delete', old.id, old.name, old.aliases);
+        UPDATE catalog_meta SET value = value + 1 WHERE key = 'version';
+    END;
+    CREATE TRIGGER IF NOT EXISTS products_au AFTER UPDATE ON products BEGIN
+        INSERT INTO products_fts (products_fts, rowid, name, aliases) VALUES ('delete', old.id, old.name, old.aliases);
+        INSERT INTO products_fts (rowid, name, aliases) VALUES (new.id, new.name, new.aliases);
+        UPDATE catalog_meta SET value = value + 1 WHERE key = 'version';
+    END;
+"""
+
+def init_catalog():
+    """Create the products table, its FTS index and change counter; seed if empty."""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.executescript("""
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            aliases TEXT NOT NULL DEFAULT ''
+        );
+        CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('version', 0);
+    """)
+    if "aliases" not in [row[1] for row in c.execute("PRAGMA table_info(products)")]:
+        # Catalogs created before aliases existed: add the column and re-create the name-only FTS index
+        c.executescript("""
+            ALTER TABLE products ADD COLUMN aliases TEXT NOT NULL DEFAULT '';
+            DROP TRIGGER IF EXISTS products_ai;
+            DROP TRIGGER IF EXISTS products_ad;
+            DROP TRIGGER IF EXISTS products_au;
+            DROP TABLE IF EXISTS products_fts;
+        """)
+        c.executemany("UPDATE products SET aliases = :aliases WHERE id = :id AND name = :name", DEFAULT_PRODUCTS)
+        c.executescript(FTS_SCHEMA)
+        c.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+    c.executescript(FTS_SCHEMA)
+    if c.execute("SELECT COUNT(*) FROM products").fetchone()[0] == 0:
+        c.executemany("INSERT INTO products (id, name, price, aliases) VALUES (:id, :name, :price, :aliases)", DEFAULT_PRODUCTS)
+    conn.commit()
+    conn.close()
+
+def add_products(products):
+    """Insert or replace many products ({"id", "name", "price"}, optional "aliases") in one transaction."""
+    conn = sqlite3.connect(DB_NAME)
+    with conn:
+        conn.executemany(
+            """INSERT INTO products (id, name, price, aliases) VALUES (:id, :name, :price, :aliases)
+               ON CONFLICT(id) DO UPDATE SET name = excluded.name, price = excluded.price, aliases = excluded.aliases""",
+            ({"aliases": "", **p} for p in products)
+        )
+    conn.close()
+    _refresh(force=True)
+
+def catalog_version():
+    """Counter bumped on every catalog change; lets other modules key their own caches on it."""
+    _refresh()
+    return _version
+
+def _refresh(force=False):
+    """Drop the caches if the catalog changed (checked at most every CATALOG_CACHE_TTL seconds)."""
+    global _version, _version_checked
+    now = time.monotonic()
+    if not force and now - _version_checked < CATALOG_CACHE_TTL:
+        return
+    conn = sqlite3.connect(DB_NAME)
+    version = conn.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()[0]
+    conn.close()
+    with _lock:
+        if version != _version:
+            _products.clear()
+            _listings.clear()
+            _version = version
+        _version_checked = now
+
+def _remember(product):
+    with _lock:
+        _products[product["id"]] = product
+        _products.move_to_end(product["id"])
+        while len(_products) > CATALOG_CACHE_SIZE:
+            _products.popitem(last=False)
+
+def get_product(product_id):
+    """Product dict by id, or None."""
+    _refresh()
+    with _lock:
+        product = _products.get(product_id)
+        if product is not None:
+            _products.move_to_end(product_id)
+            return product
+    conn = sqlite3.connect(DB_NAME)
+    row = conn.execute("SELECT id, name, price FROM products WHERE id = ?", (product_id,)).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    product = {"id": row[0], "name": row[1], "price": row[2]}
+    _remember(product)
+    return product
+
+def get_products(product_ids):
+    """{id: product} for many ids at once (cache first, then one query per 500 misses); unknown ids are left out."""
+    _refresh()
+    found, missing = {}, []
+    with _lock:
+        for product_id in dict.fromkeys(product_ids):
+            product = _products.get(product_id)
+            if product is not None:
+                _products.move_to_end(product_id)
+                found[product_id] = product
+            else:
+                missing.append(product_id)
+    if missing:
+        conn = sqlite3.connect(DB_NAME)
+        for start in range(0, len(missing), 500):
+            batch = missing[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, name, price FROM products WHERE id IN ({','.join('?' * len(batch))})", batch
+            ).fetchall()
+            for row in rows:
+                found[row[0]] = {"id": row[0], "name": row[1], "price": row[2]}
+                _remember(found[row[0]])
+        conn.close()
+    return found
+
+def _match_expression(query):
+    """FTS5 prefix query matching every word of `query` (name or aliases), e.g. '"smart"* AND "watch"*'."""
+    words = ["".join(ch for ch in word if ch.isalnum()) for word in query.split()]
+    return " AND ".join(f'"{word}"*' for word in words if word)
+
+def list_products(page=1, per_page=None, query=None):
+    """One page of products ordered by id (or by name match when `query` is given) and the total count."""
+    per_page = per_page or CATALOG_PAGE_SIZE
+    offset = (max(page, 1) - 1) * per_page
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    expression = _match_expression(query) if query else None
+    if expression:
+        total = c.execute("SELECT COUNT(*) FROM products_fts WHERE products_fts MATCH ?", (expression,)).fetchone()[0]
+        rows = c.execute(
+            """SELECT p.id, p.name, p.price FROM products_fts f JOIN products p ON p.id = f.rowid
+               WHERE products_fts MATCH ? ORDER BY f.rank LIMIT ? OFFSET ?""",
+            (expression, per_page, offset)
+        ).fetchall()
+    elif query:
+        total, rows = 0, []
+    else:
+        total = c.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        rows = c.execute("SELECT id, name, price FROM products ORDER BY id LIMIT ? OFFSET ?", (per_page, offset)).fetchall()
+    conn.close()
+    products = [{"id": r[0], "name": r[1], "price": r[2]} for r in rows]
+    for product in products:
+        _remember(product)
+    return products, total
+
+def search_products(query, limit=20):
+    """Products whose name or aliases match every word of `query` (prefix match), best first."""
+    return list_products(1, limit, query)[0]
+
+def format_product(product):
+    return f"{product['id']}. {product['name']} - Rs {product['price']}"
+
+def product_listing(page=1, per_page=None):
+    """Rendered product list for chat replies, cached until the catalog changes."""
+    per_page = per_page or CATALOG_PAGE_SIZE
+    _refresh()
+    key = (page, per_page)
+    with _lock:
+        text = _listings.get(key)
+    if text is None:
+        products, total = list_products(page, per_page)
+        text = "\n".join(format_product(p) for p in products)
+        shown = (page - 1) * per_page + len(products)
+        if total > shown:
+            text += f"\n... and {total - shown} more. Search by name to find other products."
+        with _lock:
+            _listings[key] = text
+    return text
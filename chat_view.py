@@ -0,0 +1,87 @@
+# chat_view.py
+# Chat rendering for the Streamlit front-ends. Each message's bubble HTML is escaped once and
+# cached in the session; only the newest CHAT_WINDOW messages are sent to the browser ("Show
+# earlier" pages back); bubbles added while a message is being answered are appended as their
+# own elements instead of re-sending the whole conversation each time.
+
+import html
+import weakref
+from collections import OrderedDict
+import streamlit as st
+from config import CHAT_WINDOW, STREAMLIT_MEMORY_PANEL
+from memstats import register, approx_size, report
+
+BUBBLE_CACHE_SIZE = 2000  # rendered bubbles kept per session
+
+
+class _Footprint:
+    """Kept in a session's state so memstats can size that session; gone when the session is."""
+    __slots__ = ("history", "bubbles", "__weakref__")
+
+_footprints = weakref.WeakSet()
+
+def _sessions_memory():
+    sessions = list(_footprints)
+    messages = sum(len(fp.history or ()) for fp in sessions)
+    size = sum(approx_size(fp.history) + approx_size(fp.bubbles) for fp in sessions)
+    return {"entries": len(sessions), "messages": messages, "bytes": size}
+
+register("streamlit.sessions", _sessions_memory)
+
+def bubble_html(role, msg, cache=True):
+    """Escaped bubble markup for one message, memoized per session (unless cache=False)."""
+    if not cache:
+        return _render(role, msg)
+    bubbles = st.session_state.setdefault("_bubble_cache", OrderedDict())
+    key = (role, msg)
+    rendered = bubbles.get(key)
+    if rendered is None:
+        rendered = bubbles[key] = _render(role, msg)
+        while len(bubbles) > BUBBLE_CACHE_SIZE:
+            bubbles.popitem(last=False)
+    else:
+        bubbles.move_to_end(key)
+    return rendered
+
+def _render(role, msg):
+    css = "chat-bubble-user" if role == "user" else "chat-bubble-bot"
+    text = html.escape(str(msg)).replace("\n", "<br>")
+    return f"<div class='{css}'>{text}</div>"
+
+def reset_window():
+    """Back to showing only the latest messages (e.g. after switching conversations)."""
+    st.session_state.chat_window = CHAT_WINDOW
+
+def render_chat(history):
+    """Draw the visible window of `history` and return a container for bubbles added this run."""
+    footprint = st.session_state.get("_footprint")
+    if footprint is None:
+        footprint = st.session_state["_footprint"] = _Footprint()
+        _footprints.add(footprint)
+    footprint.history, footprint.bubbles = history, st.session_state.get("_bubble_cache")
+    shown = st.session_state.setdefault("chat_window", CHAT_WINDOW)
+    start = max(0, len(history) - shown)
+    if start and st.button(f"Show earlier messages ({start} hidden)", key="show_earlier"):
+        st.session_state.chat_window = shown + CHAT_WINDOW
+        st.rerun()
+    body = "".join(bubble_html(role, msg) for role, msg in history[start:])
+    st.markdown(f"<div class='chat-container'>{body}</div>", unsafe_allow_html=True)
+    return st.container()
+
+def append_bubble(live, role, msg):
+    """Draw one new bubble below the window; returns its slot for update_bubble."""
+    slot = live.empty()
+    update_bubble(slot, role, msg)
+    return slot
+
+def update_bubble(slot, role, msg, cache=True):
+    """Redraw a bubble in place; pass cache=False for partial (streaming) text."""
+    slot.markdown(f"<div class='chat-row'>{bubble_html(role, msg, cache)}</div>", unsafe_allow_html=True)
+
+def memory_panel():
+    """Sidebar expander with this process's memory report (live sessions' histories and bubble
+    caches included); only shown with STREAMLIT_MEMORY_PANEL=1, since every visitor would see it."""
+    if not STREAMLIT_MEMORY_PANEL:
+        return
+    with st.sidebar.expander("Memory (this Streamlit process)"):
+        st.json(report())
@@ -6,10 +6,107 @@ load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 HF_API_KEY = os.getenv("HF_API_KEY")
-DB_NAME = "dataBase.db"
-KB_FILE = "knowledgeBase.json"
-RAG_DIR = "rags"  # New: Folder for per-user RAG stores
-ORDERS_FILE = "orders.json"
+# Optional upstream overrides (e.g. the local stub server used by benchmarks/)
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+HF_API_URL = os.getenv("HF_API_URL", "https://api-inference.huggingface.co/models/MiniMaxAI/MiniMax-M2")
+DB_NAME = os.getenv("DB_NAME", "dataBase.db")
+KB_FILE = os.getenv("KB_FILE", "knowledgeBase.json")
+RAG_DIR = os.getenv("RAG_DIR", "rags")  # New: Folder for per-user RAG stores
+ORDERS_FILE = os.getenv("ORDERS_FILE", "orders.json")
+
+# RAG tuning (see benchmarks/retrieval_bench.py)
+CHUNK_STRATEGY = os.getenv("RAG_CHUNK_STRATEGY", "fixed")  # fixed | sentence
+CHUNK_SIZE = int(os.getenv("RAG_CHUNK_SIZE", "500"))
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "0"))
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")  # flat | flat_ip | hnsw | ivf
+RAG_CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "64"))  # tenant indexes kept in memory
+
+# RAG storage tiers (rag.run_janitor): idle corpora are gzip'd into RAG_DIR/_archive, rehydrated on their next query
+RAG_TENANT_QUOTA_MB = float(os.getenv("RAG_TENANT_QUOTA_MB", "50"))  # max index size per tenant; 0 = unlimited
+RAG_COLD_AFTER_DAYS = float(os.getenv("RAG_COLD_AFTER_DAYS", "30"))  # archive corpora unused this long; 0 = never
+RAG_DISK_BUDGET_MB = float(os.getenv("RAG_DISK_BUDGET_MB", "0"))  # hot tier size limit, LRU archived beyond it; 0 = none
+RAG_JANITOR_INTERVAL = float(os.getenv("RAG_JANITOR_INTERVAL", "3600"))  # seconds; 0 = no app.py janitor thread
+RAG_ACCESS_RESOLUTION = float(os.getenv("RAG_ACCESS_RESOLUTION", "300"))  # seconds between last-access writes
+
+# Embeddings (embedders.py): backend is torch | torch-int8 | onnx | onnx-int8 | remote
+# EMBED_SOCKET set = use the shared embed_server.py process instead of a model per worker
+EMBED_MODEL = os.getenv("EMBED_MODEL", "all-MiniLM-L6-v2")
+EMBED_SOCKET = os.getenv("EMBED_SOCKET")
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "remote" if EMBED_SOCKET else "torch")
+EMBED_ONNX_INT8_FILE = os.getenv("EMBED_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")  # file in the model repo
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "64"))  # texts per micro-batch
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))  # wait for more requests after the first
+
+# Website fetching (fetch.py): pooled session + conditional-request disk cache
+FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR", "http_cache")
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "15"))
+FETCH_POOL_SIZE = int(os.getenv("FETCH_POOL_SIZE", "10"))
+SCRAPE_MIN_CHARS = int(os.getenv("SCRAPE_MIN_CHARS", "200"))  # less static text = render with Playwright
+
+# Product catalog (catalog.py)
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", "10"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "10000"))  # products kept in the id cache
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "5"))  # seconds between change checks
+
+# Leads search (database.search_leads): bm25 ranking considers this many newest matches
+LEADS_SEARCH_RANK_WINDOW = int(os.getenv("LEADS_SEARCH_RANK_WINDOW", "5000"))
+
+# Leads retention (leads_archive.py): older months move to gzip'd monthly SQLite files; 0 keeps everything live
+LEADS_RETENTION_MONTHS = int(os.getenv("LEADS_RETENTION_MONTHS", "12"))
+LEADS_ARCHIVE_DIR = os.getenv("LEADS_ARCHIVE_DIR", "leads_archive")
+LEADS_ARCHIVE_BATCH = int(os.getenv("LEADS_ARCHIVE_BATCH", "2000"))  # rows copied/deleted per transaction
+LEADS_ARCHIVE_CACHE = int(os.getenv("LEADS_ARCHIVE_CACHE", "4"))  # archived months kept decompressed for queries
+LEADS_MAINTENANCE_INTERVAL = float(os.getenv("LEADS_MAINTENANCE_INTERVAL", "3600"))  # seconds; 0 = no app.py thread
+LEADS_VACUUM_FREE_RATIO = float(os.getenv("LEADS_VACUUM_FREE_RATIO", "0.2"))  # reclaim when this share of pages is free
+LEADS_VACUUM_STEP = int(os.getenv("LEADS_VACUUM_STEP", "1000"))  # pages per incremental_vacuum step (one short write lock)
+
+# Exports (export.py, /admin/export/...): rows read per query
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Batch chat (POST /chat/batch)
+CHAT_BATCH_MAX = int(os.getenv("CHAT_BATCH_MAX", "5000"))
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "4"))  # LLM calls in flight per batch; below LLM_MAX_CONCURRENCY leaves slots for live chats
+
+# Bulk orders (POST /orders/batch)
+ORDER_BATCH_MAX = int(os.getenv("ORDER_BATCH_MAX", "500"))
+
+# LLM admission control (limiter.py): global concurrency with a bounded queue, per-email token buckets
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))  # max seconds waiting for a slot
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "30"))  # no further model fallbacks after this many seconds
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))  # LLM answers per email; 0 disables
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+
+# Conversation memory (memory.py): verbatim recent turns + rolling summary, prompt token budget
+MEMORY_TURNS = int(os.getenv("MEMORY_TURNS", "6"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "200"))
+MEMORY_PROMPT_TOKENS = int(os.getenv("MEMORY_PROMPT_TOKENS", "1500"))
+
+# Thin-client mode: when set, streamlit_app.py calls this app.py backend instead of running models itself
+BACKEND_URL = os.getenv("BACKEND_URL")
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "3"))
+BACKEND_READ_TIMEOUT = float(os.getenv("BACKEND_READ_TIMEOUT", "60"))  # max silence between streamed chunks
+BACKEND_POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "20"))  # keep-alive connections per Streamlit process
+
+# Streamlit chat view (chat_view.py): messages rendered before "Show earlier messages"
+CHAT_WINDOW = int(os.getenv("CHAT_WINDOW", "40"))
+# Sidebar panel with this Streamlit process's memstats report (sessions, caches); for operators only
+STREAMLIT_MEMORY_PANEL = os.getenv("STREAMLIT_MEMORY_PANEL", "0") == "1"
+
+# Admin endpoints (/admin/..., /sessions, /chat/batch): requests must send it in the X-Admin-Token
+# header; they are refused (503) until it is set. The thin client sends it.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Order matching (matcher.py)
+MATCH_THRESHOLD = float(os.getenv("MATCH_THRESHOLD", "0.6"))  # share of a product name found in the message
+MATCH_EMBED_THRESHOLD = float(os.getenv("MATCH_EMBED_THRESHOLD", "0.55"))  # cosine similarity
+MATCH_EMBED_MAX_PRODUCTS = int(os.getenv("MATCH_EMBED_MAX_PRODUCTS", "2000"))  # embedding fallback only below this
+
+# Startup warm-up (app.py): gate /readyz until models and hot indexes are loaded
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+WARMUP_TENANTS = int(os.getenv("WARMUP_TENANTS", "20"))
+WARMUP_TENANT_DAYS = int(os.getenv("WARMUP_TENANT_DAYS", "7"))
 
 def init_db():
     """Create leads table with correct columns."""
@@ -38,11 +135,20 @@ def save_lead(name, email, user_message, bot_response):
     )
     conn.commit()
     conn.close()
-# ... existing code ...
 
 def init_rag_dir():
     os.makedirs(RAG_DIR, exist_ok=True)
 
-# Call this in init_db() or at app start
-init_db()
-init_rag_dir()  # Add this line after init_db()
\ No newline at end of file
+def init_app():
+    """Startup hook: create the DB tables and the RAG folder.
+
+    Nothing runs at import time any more; call this once per process
+    (FastAPI startup event / cached Streamlit resource).
+    """
+    from database import init_db as init_database  # database.py owns the schema (tables + indexes)
+    from catalog import init_catalog
+    from memory import init_memory
+    init_database()
+    init_catalog()
+    init_memory()
+    init_rag_dir()
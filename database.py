@@ -2,7 +2,35 @@
 import sqlite3
 import json
 import os
-from config import DB_NAME, ORDERS_FILE
+import re
+import hashlib
+from datetime import datetime
+from config import DB_NAME, ORDERS_FILE, LEADS_SEARCH_RANK_WINDOW
+from analytics import init_analytics, record_orders
+
+# Full-text index over the conversation log, kept in sync by triggers (so every writer of
+# leads, including config.save_lead, is covered). External content: the text is stored once,
+# in leads. email is indexed too, so a per-customer search is an FTS intersection, not a scan.
+LEADS_FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(
+        user_message, bot_response, email, content='leads', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    CREATE TRIGGER IF NOT EXISTS leads_ai AFTER INSERT ON leads BEGIN
+        INSERT INTO leads_fts (rowid, user_message, bot_response, email)
+        VALUES (new.id, new.user_message, new.bot_response, new.email);
+    END;
+    CREATE TRIGGER IF NOT EXISTS leads_ad AFTER DELETE ON leads BEGIN
+        INSERT INTO leads_fts (leads_fts, rowid, user_message, bot_response, email)
+        VALUES ('delete', old.id, old.user_message, old.bot_response, old.email);
+    END;
+    CREATE TRIGGER IF NOT EXISTS leads_au AFTER UPDATE ON leads BEGIN
+        INSERT INTO leads_fts (leads_fts, rowid, user_message, bot_response, email)
+        VALUES ('delete', old.id, old.user_message, old.bot_response, old.email);
+        INSERT INTO leads_fts (rowid, user_message, bot_response, email)
+        VALUES (new.id, new.user_message, new.bot_response, new.email);
+    END;
+"""
 
 def init_db():
     """Create leads table with correct columns name ."""
@@ -18,8 +46,15 @@ def init_db():
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_leads_timestamp ON leads (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_leads_email ON leads (email, timestamp)")
+    new_index = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'leads_fts'").fetchone() is None
+    c.executescript(LEADS_FTS_SCHEMA)
+    if new_index:
+        c.execute("INSERT INTO leads_fts (leads_fts) VALUES ('rebuild')")  # index the existing log once
     conn.commit()
     conn.close()
+    init_orders()
 
 def save_lead(name, email, user_message, bot_response):
     """Insert a new customer lead into the DB."""
@@ -32,15 +67,212 @@ def save_lead(name, email, user_message, bot_response):
     conn.commit()
     conn.close()
 
+def save_leads(leads):
+    """Insert many (name, email, user_message, bot_response) leads in one transaction."""
+    conn = sqlite3.connect(DB_NAME, timeout=30)
+    with conn:
+        conn.executemany("INSERT INTO leads (name, email, user_message, bot_response) VALUES (?, ?, ?, ?)", leads)
+    conn.close()
+
+def recent_active_emails(limit=20, days=7):
+    """Emails with the most chat turns in the last `days` days, busiest first."""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute(
+        """SELECT email FROM leads
+           WHERE timestamp >= datetime('now', ?) AND email IS NOT NULL AND email != ''
+           GROUP BY email ORDER BY COUNT(*) DESC LIMIT ?""",
+        (f"-{int(days)} days", limit)
+    )
+    emails = [row[0] for row in c.fetchall()]
+    conn.close()
+    return emails
+
+def session_emails(limit=100):
+    """Emails that have chatted, most recently active first."""
+    conn = sqlite3.connect(DB_NAME)
+    rows = conn.execute(
+        """SELECT email FROM leads WHERE email IS NOT NULL AND email != ''
+           GROUP BY email ORDER BY MAX(timestamp) DESC LIMIT ?""",
+        (limit,)
+    ).fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+def session_history(email, limit=200):
+    """The latest `limit` (user_message, bot_response) pairs for an email, oldest first."""
+    conn = sqlite3.connect(DB_NAME)
+    rows = conn.execute(
+        "SELECT user_message, bot_response FROM leads WHERE email = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+        (email, limit)
+    ).fetchall()
+    conn.close()
+    return [list(row) for row in reversed(rows)]
+
+def _fts_phrases(text):
+    """User search text -> FTS5 phrases: "quoted phrases" and words, word* = prefix match.
+
+    Terms are reduced to their word characters, the way the tokenizer sees them, so phone
+    numbers like +92-300-1234567 become the phrase "92 300 1234567".
+    """
+    phrases = []
+    for quoted, word in re.findall(r'"([^"]*)"|(\S+)', text):
+        prefix = not quoted and word.endswith("*")
+        tokens = re.findall(r"\w+", quoted or word)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"' + ("*" if prefix else ""))
+    return phrases
+
+def search_leads(query, email=None, limit=20, cursor=None, order="recent"):
+    """Conversation turns matching every term of `query`, with highlighted snippets.
+
+    order="recent" returns newest first; order="rank" returns best bm25 match first (user
+    messages weigh more than bot replies) among the newest LEADS_SEARCH_RANK_WINDOW matches,
+    so common terms cost the same as rare ones. Pages are keyset-paginated: pass the returned
+    next_cursor to get the following page. Returns {"results": [...], "next_cursor": str|None},
+    or None if the query or cursor cannot be parsed.
+    """
+    phrases = _fts_phrases(query or "")
+    if not phrases:
+        return None
+    expression = "{user_message bot_response} : (" + " AND ".join(phrases) + ")"
+    if email:
+        email_phrases = _fts_phrases(email)
+        if email_phrases:
+            expression += " AND email : " + email_phrases[0]
+    try:
+        after = [float(part) for part in cursor.split(":")] if cursor else None
+        if after and len(after) != (2 if order == "rank" else 1):
+            return None
+    except ValueError:
+        return None
+    conn = sqlite3.connect(DB_NAME)
+    # Exact email check on top of the FTS filter (tokenized emails can also match longer ones)
+    email_sql, email_args = ("AND l.email = ?", [email]) if email else ("", [])
+    if order == "rank":
+        keyset, keyset_args = ("AND (score > ? OR (score = ? AND id > ?))", [after[0], after[0], int(after[1])]) if after else ("", [])
+        hits = conn.execute(
+            f"""SELECT id, score FROM (
+                    SELECT f.rowid AS id, bm25(leads_fts, 1.0, 0.5, 0.0) AS score
+                    FROM leads_fts f CROSS JOIN leads l ON l.id = f.rowid
+                    WHERE leads_fts MATCH ? {email_sql} ORDER BY f.rowid DESC LIMIT ?
+                ) WHERE 1 {keyset} ORDER BY score, id LIMIT ?""",
+            [expression] + email_args + [LEADS_SEARCH_RANK_WINDOW] + keyset_args + [limit]
+        ).fetchall()
+    else:
+        keyset, keyset_args = ("AND f.rowid < ?", [int(after[0])]) if after else ("", [])
+        hits = conn.execute(
+            f"""SELECT f.rowid, NULL FROM leads_fts f CROSS JOIN leads l ON l.id = f.rowid
+                WHERE leads_fts MATCH ? {email_sql} {keyset} ORDER BY f.rowid DESC LIMIT ?""",
+            [expression] + email_args + keyset_args + [limit]
+        ).fetchall()
+    results = []
+    if hits:
+        # Snippets only for the page being returned
+        ids = [hit[0] for hit in hits]
+        rows = conn.execute(
+            f"""SELECT l.id, l.name, l.email, l.timestamp,
+                       snippet(leads_fts, 0, '**', '**', '...', 16), snippet(leads_fts, 1, '**', '**', '...', 16)
+                FROM leads_fts f CROSS JOIN leads l ON l.id = f.rowid
+                WHERE leads_fts MATCH ? AND f.rowid IN ({','.join('?' * len(ids))})""",
+            [expression] + ids
+        ).fetchall()
+        by_id = {row[0]: row for row in rows}
+        for lead_id, score in hits:
+            row = by_id.get(lead_id)
+            if row:
+                results.append({"id": row[0], "name": row[1], "email": row[2], "timestamp": row[3],
+                                "user_snippet": row[4], "bot_snippet": row[5],
+                                **({"score": round(score, 4)} if score is not None else {})})
+    conn.close()
+    next_cursor = None
+    if len(hits) == limit:
+        last_id, last_score = hits[-1]
+        next_cursor = f"{last_score!r}:{last_id}" if order == "rank" else str(last_id)
+    return {"results": results, "next_cursor": next_cursor}
+
+def init_orders():
+    """Create the orders table; on first run, import the legacy orders.json."""
+    conn = sqlite3.connect(DB_NAME, timeout=30)
+    c = conn.cursor()
+    # Write lock up front: workers starting together serialize here, so only the first one
+    # finds the table empty and imports the legacy file
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_name TEXT,
+                address TEXT,
+                contact_number TEXT,
+                item_id INTEGER,
+                item TEXT,
+                price INTEGER,
+                quantity INTEGER NOT NULL DEFAULT 1,
+                timestamp TEXT,
+                idempotency_key TEXT UNIQUE,
+                request_hash TEXT
+            )
+        """)
+        c.execute("CREATE INDEX IF NOT EXISTS idx_orders_timestamp ON orders (timestamp)")  # export.py --since
+        if c.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 0 and os.path.exists(ORDERS_FILE):
+            with open(ORDERS_FILE, "r", encoding="utf-8") as f:
+                try:
+                    legacy = json.load(f)
+                except ValueError:
+                    legacy = []
+            c.executemany(
+                """INSERT INTO orders (customer_name, address, contact_number, item, price, quantity, timestamp)
+                   VALUES (:customer_name, :address, :contact_number, :item, :price, :quantity, :timestamp)""",
+                ({"customer_name": None, "address": None, "contact_number": None, "item": None,
+                  "price": None, "quantity": 1, "timestamp": None, **o} for o in legacy if isinstance(o, dict))
+            )
+        conn.commit()
+    finally:
+        conn.close()  # without the commit, this rolls back and releases the lock
+    init_analytics()  # after the legacy import, so a first start backfills it
+
+def _request_hash(order):
+    fields = ("customer_name", "address", "contact_number", "item_id", "item", "quantity")
+    return hashlib.sha256(json.dumps([order.get(k) for k in fields]).encode()).hexdigest()
+
+def save_orders(orders):
+    """Insert many orders in a single transaction.
+
+    Returns one (order_id, status) per order, in input order. status is "created", or for an
+    order whose idempotency_key was already used: "duplicate" (same details, the existing id is
+    returned, nothing is written) or "conflict" (the key was used for a different order).
+    """
+    results, created = [], []
+    conn = sqlite3.connect(DB_NAME, timeout=30)
+    try:
+        with conn:
+            # Take the write lock up front so concurrent retries of the same key serialize
+            conn.execute("BEGIN IMMEDIATE")
+            for order in orders:
+                key = order.get("idempotency_key")
+                request_hash = _request_hash(order)
+                if key:
+                    row = conn.execute("SELECT id, request_hash FROM orders WHERE idempotency_key = ?", (key,)).fetchone()
+                    if row:
+                        results.append((row[0], "duplicate" if row[1] == request_hash else "conflict"))
+                        continue
+                order = {**order, "timestamp": order.get("timestamp") or datetime.now().isoformat()}
+                cur = conn.execute(
+                    """INSERT INTO orders (customer_name, address, contact_number, item_id, item, price, quantity,
+                                           timestamp, idempotency_key, request_hash)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (order.get("customer_name"), order.get("address"), order.get("contact_number"),
+                     order.get("item_id"), order.get("item"), order.get("price"), order.get("quantity", 1),
+                     order["timestamp"], key, request_hash)
+                )
+                results.append((cur.lastrowid, "created"))
+                created.append(order)
+            record_orders(conn, created)
+    finally:
+        conn.close()
+    return results
+
 def save_order(order_details):
-    """Save order to JSON file."""
-    orders = []
-    if os.path.exists(ORDERS_FILE):
-        with open(ORDERS_FILE, "r", encoding="utf-8") as f:
-            try:
-                orders = json.load(f)
-            except:
-                orders = []
-    orders.append(order_details)
-    with open(ORDERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(orders, f, indent=4)
+    """Save one order; returns (order_id, status) as in save_orders."""
+    return save_orders([order_details])[0]
@@ -0,0 +1,223 @@
+# embed_server.py
+# One embedding model shared by all API workers. Run it next to uvicorn:
+#
+#   python embed_server.py                  # listens on EMBED_SOCKET (default /tmp/chatbot-embed.sock)
+#   EMBED_SOCKET=/tmp/chatbot-embed.sock uvicorn app:app --workers 4
+#
+# Workers send texts over a Unix socket; concurrent requests are grouped into micro-batches
+# (up to EMBED_BATCH_MAX texts, waiting at most EMBED_MAX_WAIT_MS for more after the first)
+# and encoded in one model call. Vectors come back as raw float32 bytes that the client wraps
+# with np.frombuffer, so there is no per-value (de)serialisation on either side.
+#
+# Wire format: request = 4-byte big-endian length + JSON list of strings;
+# response = (rows: int32, size: uint32) + `size` bytes of float32 rows, or rows = -1 and a
+# UTF-8 error message.
+
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+import numpy as np
+from config import EMBED_SOCKET, EMBED_BATCH_MAX, EMBED_MAX_WAIT_MS, EMBED_MODEL, EMBED_BACKEND
+
+REQUEST = struct.Struct("!I")
+RESPONSE = struct.Struct("!iI")
+MAX_REQUEST_BYTES = 64 * 1024 * 1024
+
+
+class EmbedServer:
+    """Micro-batching front for any object with a SentenceTransformer-style encode()."""
+
+    def __init__(self, embedder, max_batch=None, max_wait_ms=None):
+        self.embedder = embedder
+        self.max_batch = max_batch or EMBED_BATCH_MAX
+        self.max_wait = (EMBED_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.encode_seconds = 0.0
+
+    async def _collect(self, queue):
+        """First queued request plus whatever else arrives within max_wait (up to max_batch texts)."""
+        batch = [await queue.get()]
+        count = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while count < self.max_batch:
+            if queue.empty():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = queue.get_nowait()
+            batch.append(item)
+            count += len(item[0])
+        return batch
+
+    def _encode(self, texts):
+        started = time.perf_counter()
+        vectors = np.ascontiguousarray(self.embedder.encode(texts, batch_size=self.max_batch), dtype=np.float32)
+        self.encode_seconds += time.perf_counter() - started
+        return vectors
+
+    async def _batcher(self, queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(queue)
+            texts = [text for item, _ in batch for text in item]
+            try:
+                vectors = await loop.run_in_executor(None, self._encode, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            start = 0
+            for item, future in batch:
+                if not future.done():
+                    future.set_result(vectors[start:start + len(item)])
+                start += len(item)
+
+    async def _handle(self, queue, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    (length,) = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                    if length > MAX_REQUEST_BYTES:
+                        break
+                    texts = json.loads(await reader.readexactly(length))
+                except asyncio.IncompleteReadError:
+                    break
+                self.requests += 1
+                try:
+                    if not texts:
+                        vectors = np.zeros((0, 0), dtype=np.float32)
+                    else:
+                        future = loop.create_future()
+                        await queue.put(([str(text) for text in texts], future))
+                        vectors = await future
+                except Exception as e:
+                    message = str(e).encode("utf-8")
+                    writer.write(RESPONSE.pack(-1, len(message)) + message)
+                else:
+                    writer.write(RESPONSE.pack(len(vectors), vectors.nbytes))
+                    if vectors.nbytes:
+                        writer.write(memoryview(vectors).cast("B"))
+                await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            print(f"Embed server: dropping client: {e}")
+        finally:
+            writer.close()
+
+    async def serve(self, path, ready=None):
+        """Listen on the Unix socket at `path` until cancelled."""
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous run
+        queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batcher(queue))
+        server = await asyncio.start_unix_server(lambda r, w: self._handle(queue, r, w), path=path)
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def metrics(self):
+        return {
+            "requests": self.requests, "texts": self.texts, "batches": self.batches,
+            "avg_batch": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "encode_seconds": round(self.encode_seconds, 3),
+        }
+
+
+def _recv_exactly(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while view:
+        n = sock.recv_into(view)
+        if not n:
+            raise ConnectionError("embed server closed the connection")
+        view = view[n:]
+    return buf
+
+
+class RemoteEmbedder:
+    """Drop-in for SentenceTransformer.encode() that asks embed_server.py (one connection per thread)."""
+
+    def __init__(self, path=None, timeout=30):
+        self.path = path or EMBED_SOCKET
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        payload = json.dumps(list(sentences)).encode("utf-8")
+        # Encoding is idempotent, so one retry on a fresh connection covers a restarted server
+        for attempt in range(2):
+            try:
+                sock = self._connect()
+                sock.sendall(REQUEST.pack(len(payload)) + payload)
+                rows, size = RESPONSE.unpack(_recv_exactly(sock, RESPONSE.size))
+                body = _recv_exactly(sock, size)
+                break
+            except OSError:
+                self.close()
+                if attempt:
+                    raise
+        if rows < 0:
+            raise RuntimeError(f"Embed server error: {body.decode('utf-8', 'replace')}")
+        if not rows:
+            return np.zeros((0, 0), dtype=np.float32)
+        vectors = np.frombuffer(body, dtype=np.float32).reshape(rows, -1)
+        return vectors[0] if single else vectors
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Shared micro-batching embedding server")
+    parser.add_argument("--socket", default=EMBED_SOCKET or "/tmp/chatbot-embed.sock")
+    parser.add_argument("--model", default=EMBED_MODEL)
+    parser.add_argument("--backend", default=EMBED_BACKEND if EMBED_BACKEND != "remote" else "torch")
+    args = parser.parse_args()
+
+    from embedders import load_embedder
+    server = EmbedServer(load_embedder(args.backend, args.model))
+    print(f"Embedding server ({args.model}, {args.backend}) listening on {args.socket}")
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        print(f"Embedding server stopped: {server.metrics()}")
@@ -0,0 +1,49 @@
+# embedders.py
+# Embedding backends behind one interface: encode(sentences, batch_size=32) -> float32 vectors,
+# exactly like SentenceTransformer.encode(). EMBED_BACKEND picks the backend:
+#
+#   torch       SentenceTransformer on PyTorch (default)
+#   torch-int8  the same model with its Linear layers dynamically quantized to int8
+#   onnx        ONNX Runtime export of the model (pip install "sentence-transformers[onnx]")
+#   onnx-int8   an int8-quantized ONNX file from the model repo (EMBED_ONNX_INT8_FILE)
+#   remote      the shared embed_server.py process at EMBED_SOCKET
+#
+# Quantized backends drift slightly from torch; check them with
+# `python -m benchmarks.embed_backends`, which reports latency, throughput and drift per backend.
+# tests/test_embedder_parity.py holds every backend to a minimum cosine against torch on a tiny model.
+
+import numpy as np
+from config import EMBED_BACKEND, EMBED_MODEL, EMBED_SOCKET, EMBED_ONNX_INT8_FILE
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8", "remote")
+
+def load_embedder(backend=None, model=None):
+    """Load `model` (default EMBED_MODEL) on `backend` (default EMBED_BACKEND)."""
+    backend = backend or EMBED_BACKEND
+    model = model or EMBED_MODEL
+    if backend == "remote":
+        if not EMBED_SOCKET:
+            raise ValueError("The remote embedding backend needs EMBED_SOCKET (see embed_server.py)")
+        from embed_server import RemoteEmbedder
+        return RemoteEmbedder(EMBED_SOCKET)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    from sentence_transformers import SentenceTransformer
+    if backend == "torch":
+        return SentenceTransformer(model)
+    if backend == "torch-int8":
+        import torch
+        embedder = SentenceTransformer(model, device="cpu")
+        # Weights become int8, activations are quantized on the fly; CPU only
+        return torch.ao.quantization.quantize_dynamic(embedder, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if backend == "onnx":
+        return SentenceTransformer(model, backend="onnx")
+    return SentenceTransformer(model, backend="onnx", model_kwargs={"file_name": EMBED_ONNX_INT8_FILE})
+
+def drift(reference, candidate):
+    """Row-wise cosine similarity between two embeddings of the same texts: {"min", "mean"}."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cosine = (reference * candidate).sum(axis=1) / np.maximum(norms, 1e-12)
+    return {"min": float(cosine.min()), "mean": float(cosine.mean())}
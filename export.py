@@ -0,0 +1,128 @@
+# export.py
+# Streaming export of leads and orders as NDJSON or CSV, in constant memory. Rows are read in
+# id order in batches of EXPORT_BATCH_SIZE (short queries, so an export never holds a read
+# transaction open for minutes), up to the highest id at the start of the export, so rows
+# written meanwhile are left whole for the next run. since_id / since make nightly syncs
+# incremental; the CLI remembers the last exported id per table in a state file:
+#
+#   python export.py leads --format csv --out leads.csv --state export_state.json
+#   python export.py orders --since 2024-06-01 > orders.ndjson
+
+import csv
+import io
+import json
+import sqlite3
+import sys
+from config import DB_NAME, EXPORT_BATCH_SIZE
+
+# Exported columns per table; the first one is the id used for keyset pagination
+TABLES = {
+    "leads": ("id", "name", "email", "user_message", "bot_response", "timestamp"),
+    "orders": ("id", "customer_name", "address", "contact_number", "item_id", "item", "price", "quantity", "timestamp"),
+}
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _since_value(table, since):
+    # leads use SQLite's CURRENT_TIMESTAMP ("2024-06-01 12:00:00"), orders isoformat() ("2024-06-01T12:00:00")
+    return since.replace("T", " ") if table == "leads" else since.replace(" ", "T")
+
+def iter_rows(table, since_id=None, since=None, limit=None, batch_size=None):
+    """Yield rows of `table` as dicts in id order: id > since_id, timestamp >= since, at most `limit`."""
+    columns = TABLES[table]
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        last_id = int(since_id or 0)
+        max_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+        where, args = "", []
+        if since:
+            since = _since_value(table, since)
+            # Start at the first row of the period (timestamp index) instead of scanning from id 0
+            first = conn.execute(f"SELECT MIN(id) FROM {table} WHERE timestamp >= ?", (since,)).fetchone()[0]
+            if first is None:
+                return
+            last_id = max(last_id, first - 1)
+            where, args = "AND timestamp >= ?", [since]
+        sent = 0
+        while last_id < max_id and (limit is None or sent < limit):
+            size = batch_size if limit is None else min(batch_size, limit - sent)
+            rows = conn.execute(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE id > ? AND id <= ? {where} ORDER BY id LIMIT ?",
+                [last_id, max_id] + args + [size]
+            ).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(columns, row))
+            sent += len(rows)
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+def csv_lines(table, rows, header=True):
+    """CSV text for `rows`, a header line first; yields a chunk per row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(TABLES[table])
+    for row in rows:
+        writer.writerow([row[column] for column in TABLES[table]])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()  # header of an empty export
+
+def export_lines(table, fmt="ndjson", **filters):
+    """Text chunks of the export of `table` in `fmt` (see iter_rows for the filters)."""
+    rows = iter_rows(table, **filters)
+    return csv_lines(table, rows) if fmt == "csv" else ndjson_lines(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Stream leads or orders out of the database")
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("--since-id", type=int, help="only rows with a larger id")
+    parser.add_argument("--since", help="only rows with timestamp >= this (YYYY-MM-DD[ HH:MM:SS])")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--out", help="output file (default stdout)")
+    parser.add_argument("--state", help="JSON file with the last exported id per table; read and updated")
+    args = parser.parse_args()
+
+    state = {}
+    if args.state:
+        try:
+            with open(args.state) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+    since_id = args.since_id if args.since_id is not None else state.get(args.table)
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    progress = {"count": 0, "last_id": since_id}
+
+    def tracked(rows):
+        for row in rows:
+            progress["count"] += 1
+            progress["last_id"] = row["id"]
+            yield row
+
+    try:
+        rows = tracked(iter_rows(args.table, since_id=since_id, since=args.since, limit=args.limit))
+        for line in (csv_lines(args.table, rows) if args.format == "csv" else ndjson_lines(rows)):
+            out.write(line)
+    finally:
+        if args.out:
+            out.close()
+    if args.state and progress["last_id"] is not None:
+        import os
+        state[args.table] = progress["last_id"]
+        with open(args.state + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(args.state + ".tmp", args.state)
+    print(f"Exported {progress['count']} {args.table} rows (last id {progress['last_id']})", file=sys.stderr)
@@ -0,0 +1,115 @@
+# extractor.py
+# Readable text from an HTML page in one pass over an lxml tree. Each text node is emitted
+# exactly once (collecting get_text() of every div/span/p repeated nested text several times),
+# scripts, styles and boilerplate (nav, footer, cookie banners, sidebars, forms) are skipped,
+# every block element starts a new line and headings keep their level as "#" prefixes.
+
+import re
+import lxml.html
+from lxml import etree
+
+SKIP_TAGS = {
+    "head", "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object", "embed",
+    "nav", "footer", "aside", "form", "button", "select", "textarea", "dialog",
+}
+SKIP_ROLES = {"navigation", "banner", "contentinfo", "complementary", "dialog", "alertdialog", "search"}
+BOILERPLATE_WORDS = {
+    "cookie", "cookies", "consent", "gdpr", "nav", "navbar", "navigation", "footer", "breadcrumb",
+    "breadcrumbs", "sidebar", "share", "social", "newsletter", "popup", "modal", "skip",
+}
+NEVER_SKIP = {"html", "body", "main", "article"}
+BLOCK_TAGS = {
+    "address", "article", "blockquote", "body", "br", "dd", "details", "div", "dl", "dt", "fieldset",
+    "figcaption", "figure", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "ol",
+    "p", "pre", "section", "summary", "table", "tbody", "thead", "tfoot", "tr", "ul",
+}
+CELL_TAGS = {"td", "th"}
+HEADINGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+WORD_SPLIT = re.compile(r"[\s_\-]+")
+HIDDEN_STYLE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.I)
+
+
+def _is_boilerplate(el):
+    tag = el.tag
+    if tag in NEVER_SKIP:
+        return False
+    if tag in SKIP_TAGS:
+        return True
+    attrib = el.attrib
+    if "hidden" in attrib or attrib.get("aria-hidden") == "true":
+        return True
+    if attrib.get("role") in SKIP_ROLES:
+        return True
+    if HIDDEN_STYLE.search(attrib.get("style", "")):
+        return True
+    names = f"{attrib.get('id', '')} {attrib.get('class', '')}".lower()
+    return bool(names.strip()) and not BOILERPLATE_WORDS.isdisjoint(WORD_SPLIT.split(names))
+
+
+def _lines(root, drop_boilerplate):
+    lines, parts = [], []
+    prefix = ""
+
+    def flush():
+        nonlocal prefix
+        text = " ".join("".join(parts).split())
+        if text:
+            lines.append(prefix + text)
+        parts.clear()
+        prefix = ""
+
+    # Iterative walk (deeply nested markup would hit the recursion limit); a None marker
+    # closes the element below it on the stack.
+    stack = [root]
+    while stack:
+        el = stack.pop()
+        if el is None:
+            el = stack.pop()
+            if el.tag in BLOCK_TAGS:
+                flush()
+            if el.tail:
+                parts.append(el.tail)
+            continue
+        tag = el.tag
+        if not isinstance(tag, str) or (tag in SKIP_TAGS if not drop_boilerplate else _is_boilerplate(el)):
+            # Comments, processing instructions and skipped subtrees still own their tail text
+            if el.tail:
+                parts.append(el.tail)
+            continue
+        if tag in BLOCK_TAGS:
+            flush()
+            if tag in HEADINGS:
+                prefix = "#" * HEADINGS[tag] + " "
+        elif tag in CELL_TAGS:
+            parts.append(" ")
+        if el.text:
+            parts.append(el.text)
+        stack.append(el)
+        stack.append(None)
+        stack.extend(reversed(el))
+    flush()
+    return lines
+
+
+def extract_text(html):
+    """Text of an HTML page (str or bytes), one line per block; "" if there is none."""
+    if not html:
+        return ""
+    try:
+        root = lxml.html.document_fromstring(html)
+    except ValueError:
+        # lxml refuses str input with an XML encoding declaration
+        root = lxml.html.document_fromstring(html.encode("utf-8") if isinstance(html, str) else html)
+    except etree.ParserError:
+        return ""
+    lines = _lines(root, drop_boilerplate=True)
+    if not lines:
+        # Over-eager boilerplate rules (e.g. a wrapper with class "has-sidebar") removed everything
+        lines = _lines(root, drop_boilerplate=False)
+    seen, out = set(), []
+    for line in lines:
+        # Repeated blocks ("Read more", the same disclaimer per card) only once; headings always
+        if line.startswith("#") or line not in seen:
+            seen.add(line)
+            out.append(line)
+    return "\n".join(out)
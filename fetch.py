@@ -0,0 +1,90 @@
+# fetch.py
+# HTTP GETs for scraping. One pooled keep-alive session per process (compressed transfer
+# negotiated), and an on-disk cache keyed by URL: bodies are stored gzip-compressed together
+# with their ETag / Last-Modified, and later fetches revalidate with If-None-Match /
+# If-Modified-Since, so an unchanged page costs one 304 instead of a download.
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import namedtuple
+import requests
+from requests.adapters import HTTPAdapter
+from config import FETCH_CACHE_DIR, FETCH_TIMEOUT, FETCH_POOL_SIZE
+
+USER_AGENT = 'Mozilla/5.0'
+
+# status is the origin's status (200 for a revalidated cache hit); not_modified is True when
+# the body came from the cache after a 304; sha256 is the hex digest of the body.
+Page = namedtuple("Page", "url status content etag last_modified not_modified sha256")
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Shared requests.Session with keep-alive connection pools."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=FETCH_POOL_SIZE, pool_maxsize=FETCH_POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+                _session = session
+    return _session
+
+def _paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    folder = os.path.join(FETCH_CACHE_DIR, key[:2])
+    return os.path.join(folder, key + ".json"), os.path.join(folder, key + ".html.gz")
+
+def _load(url):
+    """(meta, body) from the cache, or (None, None)."""
+    meta_path, body_path = _paths(url)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with gzip.open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError, EOFError):
+        return None, None
+    if meta.get("url") != url or hashlib.sha256(body).hexdigest() != meta.get("sha256"):
+        return None, None
+    return meta, body
+
+def _store(url, page):
+    meta_path, body_path = _paths(url)
+    os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+    # Body first, then metadata; each is swapped in atomically
+    with gzip.open(body_path + ".tmp", "wb", compresslevel=6) as f:
+        f.write(page.content)
+    os.replace(body_path + ".tmp", body_path)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump({"url": url, "etag": page.etag, "last_modified": page.last_modified, "sha256": page.sha256}, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+def fetch(url, timeout=None):
+    """GET `url` through the cache; returns a Page (raises requests.RequestException on network errors)."""
+    meta, cached = _load(url)
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    response = get_session().get(url, headers=headers, timeout=timeout or FETCH_TIMEOUT)
+    if response.status_code == 304 and meta:
+        return Page(url, 200, cached, meta.get("etag"), meta.get("last_modified"), True, meta["sha256"])
+    content = response.content
+    page = Page(url, response.status_code, content, response.headers.get("ETag"),
+                response.headers.get("Last-Modified"), False, hashlib.sha256(content).hexdigest())
+    if response.status_code == 200 and (page.etag or page.last_modified):
+        try:
+            _store(url, page)
+        except OSError as e:
+            print(f"Fetch cache write failed for {url}: {e}")
+    return page
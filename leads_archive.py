@@ -0,0 +1,316 @@
+# leads_archive.py
+# Monthly partitions for the conversation log. The leads table keeps the last
+# LEADS_RETENTION_MONTHS months (the hot partition the sidebar, history and search queries
+# use); older months are moved, one month per file, into gzip-compressed SQLite databases in
+# LEADS_ARCHIVE_DIR. An archived month stays queryable: it is decompressed on demand into a
+# small cache and read directly, or ATTACHed next to the live table behind an all_leads view.
+#
+# Maintenance (archiving, PRAGMA optimize, reclaiming free pages) runs from a background thread
+# started by app.py every LEADS_MAINTENANCE_INTERVAL seconds, or from cron. The background
+# thread only reclaims pages in short incremental_vacuum steps; the one-time VACUUM that switches
+# an existing file to incremental auto-vacuum locks the database for the whole rebuild, so it
+# only runs from the CLI (--vacuum), in a quiet window:
+#
+#   python leads_archive.py run [--vacuum]
+#   python leads_archive.py list
+#   python leads_archive.py query 2024-05 --email customer@example.com
+
+import gzip
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import date
+from config import (DB_NAME, LEADS_RETENTION_MONTHS, LEADS_ARCHIVE_DIR, LEADS_ARCHIVE_BATCH, LEADS_ARCHIVE_CACHE,
+                    LEADS_MAINTENANCE_INTERVAL, LEADS_VACUUM_FREE_RATIO, LEADS_VACUUM_STEP)
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run a single worker
+    fcntl = None
+
+COLUMNS = ("id", "name", "email", "user_message", "bot_response", "timestamp")
+MONTH = re.compile(r"^\d{4}-\d{2}$")
+ARCHIVE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS leads (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        email TEXT,
+        user_message TEXT,
+        bot_response TEXT,
+        timestamp DATETIME
+    );
+    CREATE INDEX IF NOT EXISTS idx_leads_email ON leads (email, timestamp);
+"""
+
+# Outcome of the last maintenance run, reported by /metrics
+MAINTENANCE = {"last_run": None, "last_result": None, "last_error": None}
+
+_cache_lock = threading.Lock()
+
+def _month_bounds(month):
+    """'2024-05' -> ('2024-05-01 00:00:00', '2024-06-01 00:00:00'), leads' timestamp format."""
+    year, mon = int(month[:4]), int(month[5:7])
+    end = f"{year + 1}-01" if mon == 12 else f"{year}-{mon + 1:02d}"
+    return f"{month}-01 00:00:00", f"{end}-01 00:00:00"
+
+def cutoff(retention=None, today=None):
+    """First timestamp kept in the live table: the 1st of the month `retention` months ago."""
+    retention = LEADS_RETENTION_MONTHS if retention is None else retention
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - retention
+    return f"{months // 12}-{months % 12 + 1:02d}-01 00:00:00"
+
+def archive_path(month):
+    return os.path.join(LEADS_ARCHIVE_DIR, f"leads-{month}.db.gz")
+
+def archived_months():
+    """[{"month", "bytes"}] of the archive files, oldest first."""
+    try:
+        names = os.listdir(LEADS_ARCHIVE_DIR)
+    except FileNotFoundError:
+        return []
+    months = sorted(name[6:13] for name in names if name.startswith("leads-") and name.endswith(".db.gz"))
+    return [{"month": month, "bytes": os.path.getsize(archive_path(month))} for month in months if MONTH.match(month)]
+
+def _decompress(src, dst):
+    with gzip.open(src, "rb") as f_in, open(dst + ".tmp", "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+    os.replace(dst + ".tmp", dst)
+
+def archive_month(month):
+    """Move the rows of `month` from leads into its archive file; returns the number moved.
+
+    The archive is written (merged with an existing one) and swapped in before any row is
+    deleted, so an interrupted run loses nothing and is simply repeated. Rows are copied and
+    deleted in short transactions of LEADS_ARCHIVE_BATCH rows, so chat writes are never
+    blocked for long; the FTS triggers drop the deleted rows from leads search.
+    """
+    start, end = _month_bounds(month)
+    conn = sqlite3.connect(DB_NAME, timeout=30)
+    try:
+        first, last = conn.execute("SELECT MIN(id), MAX(id) FROM leads WHERE timestamp >= ? AND timestamp < ?",
+                                   (start, end)).fetchone()
+        if first is None:
+            return 0
+        os.makedirs(LEADS_ARCHIVE_DIR, exist_ok=True)
+        work = archive_path(month)[:-3] + ".work"
+        if os.path.exists(archive_path(month)):
+            _decompress(archive_path(month), work)
+        elif os.path.exists(work):
+            os.remove(work)
+        archive = sqlite3.connect(work)
+        archive.executescript(ARCHIVE_SCHEMA)
+        moved, after = 0, first - 1
+        while True:
+            rows = conn.execute(
+                f"""SELECT {', '.join(COLUMNS)} FROM leads WHERE id > ? AND id <= ? AND timestamp >= ? AND timestamp < ?
+                    ORDER BY id LIMIT ?""",
+                (after, last, start, end, LEADS_ARCHIVE_BATCH)
+            ).fetchall()
+            if not rows:
+                break
+            with archive:
+                archive.executemany(f"INSERT OR IGNORE INTO leads VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+            moved += len(rows)
+            after = rows[-1][0]
+        archive.close()
+        with open(work, "rb") as f_in, gzip.open(archive_path(month) + ".tmp", "wb", compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        os.replace(archive_path(month) + ".tmp", archive_path(month))
+        os.remove(work)
+        _drop_cached(month)
+        while True:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                deleted = conn.execute(
+                    """DELETE FROM leads WHERE id IN (
+                           SELECT id FROM leads WHERE id >= ? AND id <= ? AND timestamp >= ? AND timestamp < ? LIMIT ?)""",
+                    (first, last, start, end, LEADS_ARCHIVE_BATCH)
+                ).rowcount
+            if not deleted:
+                break
+        return moved
+    finally:
+        conn.close()
+
+def archive_old_leads(retention=None):
+    """Archive every month older than the retention window; returns {month: rows moved}."""
+    retention = LEADS_RETENTION_MONTHS if retention is None else retention
+    if retention <= 0:
+        return {}
+    keep_from = cutoff(retention)
+    moved = {}
+    while True:
+        conn = sqlite3.connect(DB_NAME)
+        oldest = conn.execute("SELECT MIN(timestamp) FROM leads WHERE timestamp < ?", (keep_from,)).fetchone()[0]
+        conn.close()
+        if oldest is None or oldest[:7] in moved or not MONTH.match(oldest[:7]):
+            return moved
+        moved[oldest[:7]] = archive_month(oldest[:7])
+
+def _cache_path(month):
+    return os.path.join(LEADS_ARCHIVE_DIR, "cache", f"leads-{month}.db")
+
+def _drop_cached(month):
+    with _cache_lock:
+        try:
+            os.remove(_cache_path(month))
+        except FileNotFoundError:
+            pass
+
+def open_month(month):
+    """Path of the decompressed, read-only copy of an archived month (decompressed on first use).
+
+    Only the LEADS_ARCHIVE_CACHE most recently used months stay decompressed. Raises KeyError
+    if the month has no archive.
+    """
+    if not MONTH.match(month or "") or not os.path.exists(archive_path(month)):
+        raise KeyError(month)
+    path = _cache_path(month)
+    with _cache_lock:
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(archive_path(month)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _decompress(archive_path(month), path)
+        os.utime(path)
+        cached = sorted((os.path.getmtime(p), p) for p in
+                        (os.path.join(os.path.dirname(path), name) for name in os.listdir(os.path.dirname(path)))
+                        if p.endswith(".db"))
+        for _, stale in cached[:-max(1, LEADS_ARCHIVE_CACHE)]:
+            os.remove(stale)
+    return path
+
+def _connect_ro(path):
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+def iter_archived(month, email=None, limit=None):
+    """Rows of an archived month as dicts in id order, optionally for one email."""
+    conn = _connect_ro(open_month(month))
+    try:
+        where, args = ("WHERE email = ?", [email]) if email else ("", [])
+        limit_sql = "LIMIT ?" if limit else ""
+        cursor = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM leads {where} ORDER BY id {limit_sql}",
+                              args + ([limit] if limit else []))
+        for row in cursor:
+            yield dict(zip(COLUMNS, row))
+    finally:
+        conn.close()
+
+def connect_with_archive(months):
+    """Connection to the live DB with `months` attached and a temporary all_leads view over them.
+
+    all_leads has the leads columns plus `month` (NULL for live rows), e.g.
+    SELECT * FROM all_leads WHERE email = ? ORDER BY timestamp. At most the SQLite attach
+    limit (usually 10) months can be combined; ValueError above it.
+    """
+    conn = sqlite3.connect(f"file:{DB_NAME}", uri=True)  # uri=True lets ATTACH open the copies read-only
+    if len(months) > conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED):
+        conn.close()
+        raise ValueError(f"At most {conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)} archived months can be attached at once")
+    columns = ", ".join(COLUMNS)
+    selects = [f"SELECT {columns}, NULL AS month FROM main.leads"]
+    try:
+        for month in months:
+            schema = "m_" + month.replace("-", "_")
+            conn.execute("ATTACH DATABASE ? AS " + schema, (f"file:{open_month(month)}?mode=ro",))
+            selects.append(f"SELECT {columns}, '{month}' FROM {schema}.leads")
+    except Exception:
+        conn.close()
+        raise
+    conn.execute("CREATE TEMP VIEW all_leads AS " + " UNION ALL ".join(selects))
+    return conn
+
+def run_maintenance(retention=None, full_vacuum=False):
+    """Archive expired months, refresh planner stats and reclaim free pages.
+
+    Free pages are given back in incremental_vacuum steps of LEADS_VACUUM_STEP pages, each a
+    short write lock. A file not yet in incremental auto-vacuum mode needs one full VACUUM,
+    which only runs with full_vacuum=True; otherwise the result says "needs_vacuum".
+    Takes a file lock so only one worker process does it at a time; returns None when another
+    process holds it.
+    """
+    os.makedirs(LEADS_ARCHIVE_DIR, exist_ok=True)
+    with open(os.path.join(LEADS_ARCHIVE_DIR, ".maintenance.lock"), "w") as lock:
+        if fcntl:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+        started = time.time()
+        result = {"archived": archive_old_leads(retention)}
+        conn = sqlite3.connect(DB_NAME, timeout=30)
+        try:
+            conn.execute("PRAGMA optimize")
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            result["free_pages"] = free
+            if pages and free / pages >= LEADS_VACUUM_FREE_RATIO:
+                if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                    # Incremental mode: give pages back in small steps, a short write lock each
+                    while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                        conn.execute(f"PRAGMA incremental_vacuum({LEADS_VACUUM_STEP})").fetchall()
+                    result["vacuumed"] = True
+                elif full_vacuum:
+                    # One full VACUUM switches the file to incremental auto-vacuum for next time
+                    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                    conn.execute("VACUUM")
+                    result["vacuumed"] = True
+                else:
+                    result["needs_vacuum"] = True
+        finally:
+            conn.close()
+        result["seconds"] = round(time.time() - started, 3)
+        return result
+
+def start_maintenance(interval=None):
+    """Run run_maintenance() every `interval` seconds on a daemon thread (off the request path)."""
+    interval = LEADS_MAINTENANCE_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            MAINTENANCE["last_run"] = time.time()
+            try:
+                MAINTENANCE["last_result"] = run_maintenance()
+                MAINTENANCE["last_error"] = None
+            except Exception as e:
+                print(f"Leads maintenance failed: {e}")
+                MAINTENANCE["last_error"] = str(e)
+
+    thread = threading.Thread(target=loop, name="leads-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Archive, list and query monthly leads partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="archive expired months and run DB maintenance now")
+    run.add_argument("--retention", type=int, help="months kept in the live table (default LEADS_RETENTION_MONTHS)")
+    run.add_argument("--vacuum", action="store_true",
+                     help="allow the one-time full VACUUM to incremental auto-vacuum (locks the database meanwhile)")
+    commands.add_parser("list", help="archived months and their compressed sizes")
+    query = commands.add_parser("query", help="print an archived month as NDJSON")
+    query.add_argument("month", help="YYYY-MM")
+    query.add_argument("--email")
+    query.add_argument("--limit", type=int)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        print(json.dumps(run_maintenance(args.retention, full_vacuum=args.vacuum)))
+    elif args.command == "list":
+        for entry in archived_months():
+            print(json.dumps(entry))
+    else:
+        try:
+            for row in iter_archived(args.month, args.email, args.limit):
+                sys.stdout.write(json.dumps(row, ensure_ascii=False) + "\n")
+        except KeyError:
+            sys.exit(f"No archive for {args.month}")
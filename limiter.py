@@ -0,0 +1,144 @@
+# limiter.py
+# Admission control for upstream LLM calls: a global concurrency limit with a bounded wait queue
+# (every waiter has a deadline) and per-tenant token buckets. Rejections raise Rejected, which
+# carries a Retry-After hint, so the API can answer 429 at once instead of piling up requests.
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Rejected(Exception):
+    """Request refused by a limiter; retry_after is a whole number of seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class ConcurrencyLimiter:
+    """At most `limit` holders; up to `max_queue` callers wait (FIFO-ish) until their deadline."""
+
+    def __init__(self, limit, max_queue):
+        self.limit = limit
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.stats = {"admitted": 0, "rejected_queue_full": 0, "rejected_deadline": 0,
+                      "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "hold_seconds_total": 0.0}
+
+    def _retry_after(self):
+        # Expected time until the queue ahead of a new caller drains, from the mean hold time so far
+        served = self.stats["admitted"] or 1
+        mean_hold = self.stats["hold_seconds_total"] / served or 1.0
+        return mean_hold * (self.waiting + 1) / self.limit
+
+    def acquire(self, deadline):
+        """Take a slot before time.monotonic() reaches `deadline`, or raise Rejected."""
+        started = time.monotonic()
+        with self._cond:
+            if self.active >= self.limit:
+                if self.waiting >= self.max_queue:
+                    self.stats["rejected_queue_full"] += 1
+                    raise Rejected("queue_full", self._retry_after())
+                self.waiting += 1
+                try:
+                    while self.active >= self.limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.stats["rejected_deadline"] += 1
+                            raise Rejected("deadline", self._retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            waited = time.monotonic() - started
+            self.stats["admitted"] += 1
+            self.stats["wait_seconds_total"] += waited
+            self.stats["wait_seconds_max"] = max(self.stats["wait_seconds_max"], waited)
+        return time.monotonic()
+
+    def release(self, acquired_at):
+        with self._cond:
+            self.active -= 1
+            self.stats["hold_seconds_total"] += time.monotonic() - acquired_at
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self, deadline):
+        acquired_at = self.acquire(deadline)
+        try:
+            yield
+        finally:
+            self.release(acquired_at)
+
+    def metrics(self):
+        with self._cond:
+            stats = dict(self.stats)
+            admitted = stats["admitted"] or 1
+            return {
+                "limit": self.limit,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queue_depth": self.waiting,
+                "admitted": stats["admitted"],
+                "rejected_queue_full": stats["rejected_queue_full"],
+                "rejected_deadline": stats["rejected_deadline"],
+                "wait_ms_mean": round(stats["wait_seconds_total"] / admitted * 1000, 2),
+                "wait_ms_max": round(stats["wait_seconds_max"] * 1000, 2),
+                "hold_ms_mean": round(stats["hold_seconds_total"] / admitted * 1000, 2),
+            }
+
+
+class TokenBuckets:
+    """One token bucket per key: `per_minute` sustained rate, bursts up to `burst`.
+
+    Only the `max_keys` most recently seen keys are tracked; an evicted key starts again with a
+    full bucket, which is the state it would have refilled to anyway unless it was very active.
+    """
+
+    def __init__(self, per_minute, burst, max_keys=10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, last refill time)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def take(self, key):
+        """Spend one token for `key`, or raise Rejected with the time until the next token."""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self.rejected += 1
+                raise Rejected("rate_limited", (1 - tokens) / self.rate)
+            self._buckets[key] = (tokens - 1, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            self.allowed += 1
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "per_minute": round(self.rate * 60, 3),
+                "burst": self.burst,
+                "tracked_keys": len(self._buckets),
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+            }
+
+    def memory(self):
+        """Tracked buckets and their approximate size, for memstats."""
+        from memstats import approx_size
+        with self._lock:
+            return {"entries": len(self._buckets), "capacity": self.max_keys, "bytes": approx_size(self._buckets)}
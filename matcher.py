@@ -0,0 +1,195 @@
+# matcher.py
+# Resolves free-text order messages ("I want 2 smartwatches") to catalog products and a
+# quantity, so the chat can answer with a pre-filled order draft instead of the full list.
+# Candidates come from the catalog's FTS5 name/alias index (after typo correction against
+# its vocabulary); small catalogs also get an embedding fallback for paraphrases.
+
+import difflib
+import re
+import sqlite3
+import threading
+import numpy as np
+from config import DB_NAME, MATCH_THRESHOLD, MATCH_EMBED_THRESHOLD, MATCH_EMBED_MAX_PRODUCTS
+from catalog import catalog_version, format_product, get_product, product_listing
+from memstats import register, approx_size
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "i", "id", "im", "we", "me", "my", "you", "your", "want", "wanna", "would", "like", "to", "buy", "order",
+    "purchase", "place", "book", "get", "need", "please", "pls", "the", "a", "an", "some", "of", "for", "and",
+    "can", "could", "do", "is", "it", "this", "that", "send", "deliver", "delivery", "cart", "add",
+    "item", "items", "product", "products", "piece", "pieces", "pcs", "units", "unit", "qty", "quantity", "x",
+    "new", "one", "with", "in", "on", "have", "has", "them", "those", "these",
+}
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "pair": 2, "couple": 2, "dozen": 12,
+}
+MAX_QUANTITY = 100
+
+_lock = threading.Lock()
+_index = {"version": None, "vocab": set(), "by_initial": {}, "embeddings": None, "ids": [], "texts": []}
+register("matcher.index", lambda: {"entries": len(_index["vocab"]), "embedded_products": len(_index["ids"]),
+                                   "bytes": approx_size(_index)})
+
+def _tokens(text):
+    return TOKEN.findall(text.lower())
+
+def _load_index():
+    """Vocabulary (and, for small catalogs, name embeddings) for the current catalog version."""
+    version = catalog_version()
+    if _index["version"] == version:
+        return _index
+    with _lock:
+        if _index["version"] == version:
+            return _index
+        conn = sqlite3.connect(DB_NAME)
+        vocab = {row[0] for row in conn.execute("SELECT term FROM products_vocab")}
+        count = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        rows = conn.execute("SELECT id, name, aliases FROM products").fetchall() if count <= MATCH_EMBED_MAX_PRODUCTS else []
+        conn.close()
+        by_initial = {}
+        for term in vocab:
+            by_initial.setdefault(term[0], []).append(term)
+        _index.update(version=version, vocab=vocab, by_initial=by_initial, embeddings=None,
+                      ids=[r[0] for r in rows], texts=[f"{r[1]}, {r[2]}" for r in rows])
+    return _index
+
+def parse_quantity(tokens):
+    """(quantity, remaining tokens): a number before the product words ("2 mice", "two mice"),
+    or an explicit marker anywhere ("x3", "3x", "qty 3")."""
+    for i, tok in enumerate(tokens):
+        if tok in NUMBER_WORDS:
+            return NUMBER_WORDS[tok], tokens[:i] + tokens[i + 1:]
+        if tok.isdigit() and 0 < int(tok) <= MAX_QUANTITY:
+            return int(tok), tokens[:i] + tokens[i + 1:]
+        if tok not in STOPWORDS:
+            break
+    for i, tok in enumerate(tokens):
+        marked = re.fullmatch(r"x(\d+)|(\d+)x", tok)
+        if marked:
+            number, rest = int(marked.group(1) or marked.group(2)), tokens[:i] + tokens[i + 1:]
+        elif tok in ("qty", "quantity") and i + 1 < len(tokens) and tokens[i + 1].isdigit():
+            number, rest = int(tokens[i + 1]), tokens[:i] + tokens[i + 2:]
+        else:
+            continue
+        if 0 < number <= MAX_QUANTITY:
+            return number, rest
+    return 1, tokens
+
+def _normalize_terms(tokens, index):
+    """Map message words onto catalog vocabulary: exact, singular form, or closest spelling."""
+    vocab, terms = index["vocab"], []
+    for tok in tokens:
+        if tok in STOPWORDS:
+            continue
+        if tok in vocab:
+            terms.append(tok)
+            continue
+        singular = next((s for s in (tok[:-2], tok[:-1]) if tok.endswith("s") and s in vocab), None)
+        if singular:
+            terms.append(singular)
+            continue
+        close = difflib.get_close_matches(tok, index["by_initial"].get(tok[0], []), n=1, cutoff=0.8)
+        if close:
+            terms.append(close[0])
+    return terms
+
+def _score(terms, name, aliases):
+    """Best share of a product name's (or alias's) words present in the message, 0..1."""
+    wanted = set(terms)
+    best = 0.0
+    for label in [name] + [a for a in aliases.split(",") if a.strip()]:
+        words = set(_tokens(label))
+        if words:
+            best = max(best, len(words & wanted) / len(words))
+    return best
+
+def _fts_candidates(terms, limit=20):
+    expression = " OR ".join(f'"{t}"' for t in dict.fromkeys(terms))
+    conn = sqlite3.connect(DB_NAME)
+    rows = conn.execute(
+        """SELECT p.id, p.name, p.price, p.aliases FROM products_fts f JOIN products p ON p.id = f.rowid
+           WHERE products_fts MATCH ? ORDER BY f.rank LIMIT ?""",
+        (expression, limit)
+    ).fetchall()
+    conn.close()
+    return rows
+
+def _embedding_candidates(text, index, limit=3):
+    """Nearest products by embedding similarity (small catalogs only)."""
+    if not index["ids"]:
+        return []
+    try:
+        from rag import get_embedder
+        embedder = get_embedder()
+        if index["embeddings"] is None:
+            vectors = np.asarray(embedder.encode(index["texts"]), dtype="float32")
+            index["embeddings"] = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-9)
+        query = np.asarray(embedder.encode([text]), dtype="float32")[0]
+        query /= max(float(np.linalg.norm(query)), 1e-9)
+    except Exception as e:
+        print(f"Matcher embedding lookup failed: {e}")
+        return []
+    scores = index["embeddings"] @ query
+    top = np.argsort(-scores)[:limit]
+    return [(index["ids"][i], float(scores[i])) for i in top]
+
+def resolve_order(message: str):
+    """Resolve an order message to {"product", "quantity", "score", "alternatives"}.
+
+    "product" is None when nothing (or nothing unambiguous) matched; "alternatives" then
+    lists the closest candidates so the caller can show a short list instead of the catalog.
+    """
+    index = _load_index()
+    quantity, tokens = parse_quantity(_tokens(message))
+    terms = _normalize_terms(tokens, index)
+    scored = []
+    if terms:
+        for pid, name, price, aliases in _fts_candidates(terms):
+            scored.append((_score(terms, name, aliases), {"id": pid, "name": name, "price": price}))
+        scored.sort(key=lambda item: -item[0])  # stable: FTS rank breaks ties
+    if not scored or scored[0][0] < MATCH_THRESHOLD:
+        text = " ".join(t for t in tokens if t not in STOPWORDS)
+        for pid, similarity in _embedding_candidates(text, index) if text else []:
+            if similarity >= MATCH_EMBED_THRESHOLD and all(p["id"] != pid for _, p in scored):
+                scored.append((similarity, get_product(pid)))
+        scored.sort(key=lambda item: -item[0])
+    result = {"product": None, "quantity": quantity, "score": 0.0,
+              "alternatives": [p for s, p in scored[:5] if p and s > 0]}
+    if scored and scored[0][0] >= MATCH_THRESHOLD:
+        best_score, best = scored[0]
+        runner_up = scored[1][0] if len(scored) > 1 else 0.0
+        if best_score > runner_up:  # a tie means the message does not single out one product
+            result.update(product=best, score=round(best_score, 3),
+                          alternatives=[p for s, p in scored[1:4] if p and s > 0])
+    return result
+
+def order_reply(message: str):
+    """(response, action, order_draft) for an order-intent chat message.
+
+    One clear match gives a pre-filled draft ("confirm_order"), so the customer only has to
+    add delivery details; otherwise the closest candidates or the catalog page are listed.
+    """
+    match = resolve_order(message)
+    product = match["product"]
+    if product:
+        quantity = match["quantity"]
+        draft = {"item_id": product["id"], "name": product["name"], "price": product["price"],
+                 "quantity": quantity, "total": product["price"] * quantity}
+        response = (
+            f"Great choice! {quantity} x {product['name']} at Rs {product['price']} each "
+            f"(total Rs {draft['total']}).\n\n"
+            "Please share your delivery address and contact number to confirm the order."
+        )
+        return response, "confirm_order", draft
+    if match["alternatives"]:
+        listing = "\n".join(format_product(p) for p in match["alternatives"])
+        response = f"Did you mean one of these?\n\n{listing}\n\nPlease reply with the Product ID to place your order!"
+        return response, "show_products", None
+    response = (
+        "Here's our product list:\n\n"
+        f"{product_listing()}\n\n"
+        "Please reply with the Product ID to place your order!"
+    )
+    return response, "show_products", None
@@ -0,0 +1,143 @@
+# memory.py
+# Bounded per-session conversation memory: the last MEMORY_TURNS turns verbatim plus a rolling
+# summary of older turns (one short gist line per turn, oldest dropped first), stored in the
+# session_memory table. build_prompt() fits summary, recent turns, website context and the
+# query into a fixed token budget, so prompts stay small however long the conversation gets.
+
+import hashlib
+import json
+import re
+import sqlite3
+from config import DB_NAME, MEMORY_TURNS, MEMORY_SUMMARY_TOKENS, MEMORY_PROMPT_TOKENS
+
+CHARS_PER_TOKEN = 4  # rough estimate for English text; good enough for budgeting
+GIST_CHARS = 120
+
+def init_memory():
+    conn = sqlite3.connect(DB_NAME)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS session_memory (
+            session_id TEXT PRIMARY KEY,
+            summary TEXT NOT NULL DEFAULT '',
+            recent TEXT NOT NULL DEFAULT '[]',
+            turns INTEGER NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+    conn.close()
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def truncate(text, tokens):
+    """Cut `text` to about `tokens` tokens, on a word boundary where possible."""
+    limit = max(0, tokens) * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:max(0, limit - 3)]
+    return (cut.rsplit(" ", 1)[0] if " " in cut else cut) + "..."
+
+def _gist(text):
+    """First sentence of a message, whitespace-collapsed and capped at GIST_CHARS."""
+    text = " ".join(text.split())
+    first = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    return first if len(first) <= GIST_CHARS else first[:GIST_CHARS - 3].rsplit(" ", 1)[0] + "..."
+
+def load_memory(session_id):
+    """{"summary", "recent": [[user, bot], ...], "turns"} for the session (empty if new)."""
+    conn = sqlite3.connect(DB_NAME)
+    row = conn.execute("SELECT summary, recent, turns FROM session_memory WHERE session_id = ?", (session_id,)).fetchone()
+    conn.close()
+    if row is None:
+        return {"summary": "", "recent": [], "turns": 0}
+    return {"summary": row[0], "recent": json.loads(row[1]), "turns": row[2]}
+
+def fold(summary, turns):
+    """Add one gist line per turn to the summary, then drop the oldest lines beyond MEMORY_SUMMARY_TOKENS."""
+    lines = [line for line in summary.split("\n") if line]
+    lines += [f"- User: {_gist(user)} | Bot: {_gist(bot)}" for user, bot in turns]
+    while lines and estimate_tokens("\n".join(lines)) > MEMORY_SUMMARY_TOKENS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+def remember(session_id, user_message, bot_response):
+    """Append a turn; turns that fall out of the verbatim window are folded into the summary."""
+    remember_many([(session_id, user_message, bot_response)])
+
+def remember_many(turns):
+    """remember() for many (session_id, user_message, bot_response) turns, in one transaction."""
+    turns = [turn for turn in turns if turn[0]]
+    if not turns:
+        return
+    conn = sqlite3.connect(DB_NAME, timeout=30)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")  # read-modify-write of the sessions' rows
+        for session_id, user_message, bot_response in turns:
+            row = conn.execute("SELECT summary, recent, turns FROM session_memory WHERE session_id = ?", (session_id,)).fetchone()
+            summary, recent, count = (row[0], json.loads(row[1]), row[2]) if row else ("", [], 0)
+            recent.append([user_message, bot_response])
+            if len(recent) > MEMORY_TURNS:
+                summary = fold(summary, recent[:-MEMORY_TURNS])
+                recent = recent[-MEMORY_TURNS:]
+            conn.execute(
+                """INSERT INTO session_memory (session_id, summary, recent, turns, updated_at)
+                   VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                   ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, recent = excluded.recent,
+                                                         turns = excluded.turns, updated_at = CURRENT_TIMESTAMP""",
+                (session_id, summary, json.dumps(recent), count + 1)
+            )
+    conn.close()
+
+def forget(session_id):
+    conn = sqlite3.connect(DB_NAME)
+    with conn:
+        conn.execute("DELETE FROM session_memory WHERE session_id = ?", (session_id,))
+    conn.close()
+
+def fingerprint(memory):
+    """Short hash of what build_prompt would include from this memory; None when it is empty."""
+    if not memory or not (memory["summary"] or memory["recent"]):
+        return None
+    return hashlib.sha1(json.dumps([memory["summary"], memory["recent"]]).encode()).hexdigest()[:16]
+
+def build_prompt(query, context=None, memory=None, budget=None):
+    """Prompt with the query, website context and conversation memory within `budget` tokens.
+
+    The query is always kept; context gets up to half of what remains, then the newest turns
+    are added until the budget runs out, and the summary takes whatever is left.
+    """
+    budget = budget or MEMORY_PROMPT_TOKENS
+    remembered = bool(memory and (memory["summary"] or memory["recent"]))
+    query = truncate(query, budget // 2)
+    if context:
+        template = "Answer only based on this website context: {}. Query: {}. Do not use general knowledge."
+        context = truncate(context, (budget - estimate_tokens(template + query)) // 2)
+        head = template.format(context, query)
+    else:
+        head = f"Query: {query}" if remembered else query
+    if not remembered:
+        return head
+    # What is left after the query/context, less the section headings and separators
+    left = budget - estimate_tokens(head) - 16
+    turns = []
+    for user, bot in reversed(memory["recent"]):
+        line = f"User: {user}\nAssistant: {bot}"
+        cost = estimate_tokens(line) + 1
+        if cost > left:
+            # Keep at least a shortened version of the latest turn, it carries the most context
+            if not turns and left > 20:
+                turns.append(truncate(line, left - 1))
+                left = 0
+            break
+        turns.append(line)
+        left -= cost
+    summary = truncate(memory["summary"], left) if memory["summary"] and left > 20 else ""
+    parts = []
+    if summary:
+        parts.append(f"Summary of the earlier conversation:\n{summary}")
+    if turns:
+        parts.append("Recent conversation:\n" + "\n".join(reversed(turns)))
+    if not parts:
+        return head
+    return "\n\n".join(parts + [head])
@@ -0,0 +1,127 @@
+# memstats.py
+# Memory accounting. Every module that keeps a cache or registry registers a function reporting
+# {"entries": n, "bytes": approximate size}; report() collects them together with the process
+# RSS (GET /admin/memory). Sizes are estimates: deep sys.getsizeof for Python containers, nbytes
+# for arrays, stored code sizes for FAISS indexes and parameter sizes for torch models; shared
+# objects are counted once per cache that holds them. RSS minus the accounted bytes is everything
+# else (interpreter, libraries, allocator slack).
+#
+# For leaks, trace_start() takes a tracemalloc baseline and trace_diff() reports the allocation
+# sites that grew since then (tracing slows allocations down; stop it when done).
+
+import sys
+import threading
+import tracemalloc
+
+_providers = {}
+_lock = threading.Lock()
+_baseline = None
+
+def register(name, fn):
+    """Report fn() (a dict with at least "entries" and "bytes") under `name`."""
+    _providers[name] = fn
+
+def approx_size(obj, max_objects=1000000):
+    """Deep size in bytes of str/bytes/containers/arrays reachable from obj (each object once)."""
+    seen, stack, total = set(), [obj], 0
+    while stack and len(seen) < max_objects:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        nbytes = getattr(item, "nbytes", None)
+        if isinstance(nbytes, int) and not isinstance(item, (bytes, bytearray, memoryview)):
+            total += nbytes + 112  # numpy array: data plus header
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+def faiss_bytes(index):
+    """Approximate memory of a FAISS index: stored codes, plus ids and graph links where used."""
+    import faiss
+    if isinstance(index, faiss.IndexHNSW):
+        return index.hnsw.neighbors.size() * 4 + faiss_bytes(faiss.downcast_index(index.storage))
+    size = index.ntotal * getattr(index, "code_size", 4 * index.d)
+    if isinstance(index, faiss.IndexIVF):
+        size += index.ntotal * 8 + index.nlist * index.d * 4  # ids and centroids
+    return size
+
+def model_bytes(model):
+    """Parameter and buffer bytes of a torch model (SentenceTransformer); None if not a torch model."""
+    parameters = getattr(model, "parameters", None)
+    if parameters is None:
+        return None
+    try:
+        size = sum(p.numel() * p.element_size() for p in parameters())
+        return size + sum(b.numel() * b.element_size() for b in model.buffers())
+    except Exception:
+        return None
+
+def rss():
+    """(current, peak) resident set size of this process in bytes."""
+    current = peak = 0
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return current, peak
+
+def report():
+    """Process RSS and every registered cache's entries and approximate bytes."""
+    caches = {}
+    for name, fn in sorted(_providers.items()):
+        try:
+            caches[name] = fn()
+        except Exception as e:
+            caches[name] = {"error": str(e)}
+    current, peak = rss()
+    accounted = sum(cache.get("bytes") or 0 for cache in caches.values())
+    return {"rss_bytes": current, "peak_rss_bytes": peak, "accounted_bytes": accounted,
+            "unaccounted_bytes": max(0, current - accounted) if current else None,
+            "caches": caches, "tracing": tracemalloc.is_tracing()}
+
+def trace_start(frames=10):
+    """Start tracemalloc (if needed) and take the baseline snapshot for trace_diff()."""
+    global _baseline
+    with _lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        _baseline = tracemalloc.take_snapshot()
+    return {"tracing": True, "frames": tracemalloc.get_traceback_limit()}
+
+def trace_diff(limit=20, reset=False):
+    """Allocation sites that grew most since the baseline; reset=True makes now the new baseline."""
+    global _baseline
+    with _lock:
+        if _baseline is None or not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        stats = snapshot.filter_traces(filters).compare_to(_baseline.filter_traces(filters), "lineno")
+        if reset:
+            _baseline = snapshot
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "traced_bytes": current, "traced_peak_bytes": peak,
+        "growth_bytes": sum(stat.size_diff for stat in stats),
+        "top": [{"where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "size_diff": stat.size_diff,
+                 "size": stat.size, "count_diff": stat.count_diff} for stat in stats[:limit]],
+    }
+
+def trace_stop():
+    global _baseline
+    with _lock:
+        _baseline = None
+        tracemalloc.stop()
+    return {"tracing": False}
@@ -0,0 +1,62 @@
+# order_form.py
+# Order form shared by the Streamlit front-ends (streamlit_app.py, app_streamlit.py), so both
+# list, pre-select and submit products the same way. Each app passes its own data access:
+# product search and lookup (local catalog or the backend API) and how an order is placed.
+
+import uuid
+import streamlit as st
+
+def order_choices(products, draft, lookup_product):
+    """{id: product} for the product select box.
+
+    The product resolved from the chat message (the order draft) is looked up again and listed
+    first, so it is pre-selected with its current name and price; it is left out if it no
+    longer exists.
+    """
+    products_by_id = {p["id"]: p for p in products}
+    draft_product = lookup_product(draft["item_id"]) if draft else None
+    if draft_product:
+        products_by_id = {draft_product["id"]: draft_product, **products_by_id}
+    return products_by_id
+
+def render_order_form(name, find_products, lookup_product, submit_order):
+    """Show the order form; returns the confirmation reply once an order was placed, else None.
+
+    find_products(query) returns up to a page of products (query may be empty),
+    lookup_product(id) one product or None, and submit_order(name, address, contact_number,
+    product, quantity, idempotency_key) places the order and returns the confirmation message.
+    """
+    st.subheader("Place Your Order")
+    # Only one page of the catalog is loaded; the search box narrows it down by name
+    product_query = st.text_input("Search Products", placeholder="e.g. headphones", key="product_query")
+    draft = None if product_query else st.session_state.get("order_draft")
+    products_by_id = order_choices(find_products(product_query), draft, lookup_product)
+    with st.form(key="order_form"):
+        item_id = st.selectbox(
+            "Select Product",
+            options=list(products_by_id),
+            format_func=lambda x: f"ID {x}: {products_by_id[x]['name']} - Rs {products_by_id[x]['price']}"
+        )
+        quantity = st.number_input("Quantity", min_value=1, max_value=100, step=1,
+                                   value=draft["quantity"] if draft else 1)
+        address = st.text_input("Delivery Address", placeholder="House #, Street, City")
+        contact_number = st.text_input("Contact Number", placeholder="+92xxxxxxxxxx")
+        if not st.form_submit_button("Submit Order"):
+            return None
+    if not address or not contact_number or item_id is None:
+        st.error("Please fill all fields!")
+        return None
+    product = products_by_id.get(item_id) or lookup_product(item_id)
+    if not product:
+        st.error("This product is no longer available.")
+        return None
+    # One key per order form, so a double submit or a retried request cannot order twice
+    order_key = st.session_state.setdefault("order_key", uuid.uuid4().hex)
+    with st.spinner("Placing your order..."):
+        reply = submit_order(name or "Guest", address, contact_number, product, int(quantity), order_key)
+    st.session_state.pop("order_key", None)
+    st.session_state.history.append(("bot", reply))
+    st.success("Order placed successfully!")
+    st.session_state.order_mode = False
+    st.session_state.order_draft = None
+    return reply
@@ -3,13 +3,46 @@
 import re 
 import os
 import json
-import requests
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 import numpy as np
-from bs4 import BeautifulSoup
-from sentence_transformers import SentenceTransformer
-from playwright.sync_api import sync_playwright
-import faiss
-from config import RAG_DIR
+import memstats
+from config import (RAG_DIR, CHUNK_STRATEGY, CHUNK_SIZE, CHUNK_OVERLAP, RAG_INDEX_TYPE, RAG_CACHE_SIZE, SCRAPE_MIN_CHARS,
+                    EMBED_MODEL, EMBED_BACKEND, RAG_TENANT_QUOTA_MB, RAG_COLD_AFTER_DAYS, RAG_DISK_BUDGET_MB,
+                    RAG_JANITOR_INTERVAL, RAG_ACCESS_RESOLUTION)
+
+# lxml, requests, the embedding backend, playwright and faiss are imported inside the functions that
+# use them, so importing this module (every API worker / Streamlit start) stays cheap.
+_embedder = None
+_embedder_lock = threading.Lock()
+# corpus key (or email, for per-user copies) -> (faiss_index mtime, index, chunks), LRU first
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
+def _memory_indexes():
+    with _index_lock:
+        entries = list(_index_cache.values())
+    index_bytes = sum(memstats.faiss_bytes(index) for _, index, _ in entries)
+    chunk_bytes = sum(memstats.approx_size(chunks) for _, _, chunks in entries)
+    return {"entries": len(entries), "capacity": RAG_CACHE_SIZE, "index_bytes": index_bytes,
+            "chunk_bytes": chunk_bytes, "bytes": index_bytes + chunk_bytes}
+
+memstats.register("rag.embedder", lambda: {"entries": int(_embedder is not None), "backend": EMBED_BACKEND,
+                                           "bytes": memstats.model_bytes(_embedder) if _embedder is not None else 0})
+memstats.register("rag.index_cache", _memory_indexes)
+
+def get_embedder():
+    """Shared embedder for EMBED_BACKEND (see embedders.py), loaded on first use."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                from embedders import load_embedder
+                _embedder = load_embedder()
+    return _embedder
 
 def extract_url(message: str) -> str:
     """Detect and extract a URL from the message."""
@@ -18,23 +51,20 @@ def extract_url(message: str) -> str:
     return match.group(0) if match else None
 
 def scrape_with_requests(url: str) -> str:
-    """Fallback scraping using requests and BeautifulSoup."""
+    """Fallback scraping using the pooled, cached fetcher and the lxml extractor."""
     try:
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=15)
-        if response.status_code != 200:
+        from fetch import fetch
+        from extractor import extract_text
+        page = fetch(url)
+        if page.status != 200:
             return None
-        soup = BeautifulSoup(response.text, 'html.parser')
-        for script in soup(["script", "style"]):
-            script.extract()
-        text = soup.get_text(separator=' ')
-        return " ".join(text.split())
+        return extract_text(page.content) or None  # bytes, so lxml honours the page's charset
     except Exception as e:
         print(f"Requests scraping failed: {e}")
         return None
 
-def scrape_website(url: str) -> str:
-    """Scrape the website for text content handling JS-rendered pages with robust fallback."""
-    # 1. Try Playwright
+def scrape_with_playwright(url: str) -> str:
+    """Text of the page after rendering it in headless Chromium (for JS-built pages), or None."""
     try:
         from playwright.sync_api import sync_playwright
         with sync_playwright() as p:
@@ -48,52 +78,674 @@ def scrape_website(url: str) -> str:
             html = page.content()
             browser.close()
         
-        soup = BeautifulSoup(html, 'html.parser')
-        texts = [elem.get_text(strip=True) for elem in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'div', 'span', 'li', 'td', 'th'])]
-        cleaned_text = ' '.join(filter(None, texts))
+        from extractor import extract_text
+        cleaned_text = extract_text(html)
         return cleaned_text if cleaned_text else None
     except Exception as e:
-        print(f"Playwright failed ({e}). Falling back to requests...")
+        print(f"Playwright failed ({e}).")
+        return None
+
+def scrape_website(url: str) -> str:
+    """Scrape the website for text content handling JS-rendered pages with robust fallback."""
+    # 1. Try Playwright, 2. fall back to requests
+    return scrape_with_playwright(url) or scrape_with_requests(url)
+
+def read_source(email: str):
+    """What the user's index was last ingested from (source.json), or None."""
+    try:
+        with open(os.path.join(user_rag_dir(email), 'source.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def ingest_url(email: str, url: str):
+    """Scrape `url` into the user's RAG index: "updated", "unchanged" or None if it failed.
+
+    The page goes through fetch.py's conditional cache. When it is the same page body the
+    current index was built from (a 304, or an identical download), nothing is parsed or
+    embedded. Pages whose HTML has less than SCRAPE_MIN_CHARS of text are rendered with
+    Playwright instead; those are always rebuilt, since their content comes from scripts.
+    """
+    from fetch import fetch
+    from extractor import extract_text
+    try:
+        page = fetch(url)
+    except Exception as e:
+        print(f"Fetching {url} failed: {e}")
+        page = None
+    ok = page is not None and page.status == 200
+    source = read_source(email)
+    if (ok and source and source.get("url") == url and not source.get("rendered")
+            and source.get("sha256") == page.sha256 and source.get("version") == rag_version(email)):
+        return "unchanged"
+    text = extract_text(page.content) if ok else ""
+    rendered = False
+    if len(text) < SCRAPE_MIN_CHARS:
+        rendered_text = scrape_with_playwright(url)
+        if rendered_text and len(rendered_text) > len(text):
+            text, rendered = rendered_text, True
+    if not build_rag_for_user(email, text):
+        return None
+    source = {
+        "url": url, "sha256": page.sha256 if ok else None, "etag": page.etag if ok else None,
+        "last_modified": page.last_modified if ok else None, "rendered": rendered,
+        "version": rag_version(email),  # a later build from other text invalidates this record
+    }
+    _replace_json(os.path.join(user_rag_dir(email), 'source.json'), source)
+    return "updated"
+
+def chunk_text(text: str, size: int = None, overlap: int = None, strategy: str = None) -> list:
+    """Split text into chunks.
+
+    "fixed" cuts every `size` characters (stepping `size - overlap`), "sentence" packs
+    whole sentences into chunks of at most `size` characters.
+    """
+    size = size or CHUNK_SIZE
+    overlap = CHUNK_OVERLAP if overlap is None else overlap
+    strategy = strategy or CHUNK_STRATEGY
+    if strategy == "sentence":
+        chunks, current = [], ""
+        for sentence in re.split(r'(?<=[.!?])\s+', text):
+            if current and len(current) + len(sentence) + 1 > size:
+                chunks.append(current)
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+            while len(current) > size:
+                chunks.append(current[:size])
+                current = current[size:]
+        if current:
+            chunks.append(current)
+        return chunks
+    step = max(1, size - overlap)
+    return [text[i:i+size] for i in range(0, len(text), step) if text[i:i+size].strip()]
+
+def new_index(dim: int, index_type: str = None, n_vectors: int = 0):
+    """Create an empty FAISS index of the given type."""
+    import faiss
+    index_type = index_type or RAG_INDEX_TYPE
+    if index_type == "flat_ip":
+        return faiss.IndexFlatIP(dim)
+    if index_type == "hnsw":
+        return faiss.IndexHNSWFlat(dim, 32)
+    if index_type == "ivf":
+        nlist = max(1, min(int(np.sqrt(n_vectors)), n_vectors // 39))  # FAISS wants ~39 points per centroid
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        index.nprobe = min(nlist, 8)
+        return index
+    return faiss.IndexFlatL2(dim)
+
+def _prepare(index, vectors):
+    """Vectors as contiguous float32, unit-normalised for inner-product indexes."""
+    import faiss
+    vectors = np.ascontiguousarray(vectors, dtype='float32')
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        faiss.normalize_L2(vectors)
+    return vectors
+
+def user_rag_dir(email: str) -> str:
+    return os.path.join(RAG_DIR, email.replace('@', '_'))  # Safe folder name
+
+# Shared, content-addressed storage. A corpus (chunks.json + faiss_index under
+# RAG_DIR/_corpora/<hash>) is identified by the hashes of its normalized chunks plus the
+# embedder and index type, so tenants that ingest the same page point at one copy on disk and
+# in the index cache. Chunk embeddings are kept in RAG_DIR/store.db by chunk hash and reused by
+# later builds. Reference counts live in the same database: a corpus is deleted when its last
+# tenant moves away, a chunk vector when its last corpus is deleted.
+#
+# Corpora are tiered: "hot" ones are plain files under _corpora, "cold" ones (idle for
+# RAG_COLD_AFTER_DAYS, or least recently used beyond RAG_DISK_BUDGET_MB) are gzip'd under
+# RAG_DIR/_archive/<hash> by run_janitor() and rehydrated by the next query that needs them.
+# Corpora never change, so an archive stays valid until the corpus is released: evicting a
+# rehydrated corpus again only deletes its hot files.
+_store_ready = set()
+_touched = OrderedDict()  # corpus key / email -> time its last access was written (oldest first, pruned)
+JANITOR = {"last_run": None, "last_result": None, "last_error": None}  # reported by /metrics
+_rehydrate_lock = threading.Lock()
+CORPUS_FILES = ('chunks.json', 'faiss_index')
+
+def corpus_dir(corpus: str) -> str:
+    return os.path.join(RAG_DIR, '_corpora', corpus)
+
+def archive_dir(corpus: str) -> str:
+    return os.path.join(RAG_DIR, '_archive', corpus)
+
+def _store():
+    path = os.path.join(RAG_DIR, 'store.db')
+    if path not in _store_ready:
+        os.makedirs(RAG_DIR, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    if path not in _store_ready:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunk_vectors (
+                chunk_key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                refs INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS corpora (
+                corpus_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                chunks INTEGER NOT NULL,
+                refs INTEGER NOT NULL DEFAULT 0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS tenant_corpus (
+                email TEXT PRIMARY KEY,
+                corpus_key TEXT NOT NULL
+            );
+        """)
+        # Tiering columns, added to stores created before them
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(corpora)")}
+        for column, ddl in (("bytes", "INTEGER NOT NULL DEFAULT 0"), ("last_access", "REAL"),
+                            ("tier", "TEXT NOT NULL DEFAULT 'hot'")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE corpora ADD COLUMN {column} {ddl}")
+        if "last_access" not in {row[1] for row in conn.execute("PRAGMA table_info(tenant_corpus)")}:
+            conn.execute("ALTER TABLE tenant_corpus ADD COLUMN last_access REAL")
+        conn.commit()
+        _store_ready.add(path)
+    return conn
+
+def _embedder_id(embedder) -> str:
+    if embedder is None:
+        return f"{EMBED_MODEL}:{EMBED_BACKEND}"
+    return getattr(embedder, 'model_id', None) or f"{type(embedder).__module__}.{type(embedder).__name__}"
+
+def _chunk_key(model: str, chunk: str) -> str:
+    return hashlib.sha256(f"{model}\n{' '.join(chunk.split())}".encode('utf-8')).hexdigest()
+
+def _embed_chunks(chunks, keys, embedder):
+    """Embeddings for `chunks`, encoding only those not already in the store; (vectors, new rows)."""
+    found = {}
+    conn = _store()
+    unique = list(dict.fromkeys(keys))
+    for i in range(0, len(unique), 500):
+        batch = unique[i:i+500]
+        rows = conn.execute(f"SELECT chunk_key, vector FROM chunk_vectors WHERE chunk_key IN ({','.join('?' * len(batch))})", batch)
+        found.update((key, np.frombuffer(blob, dtype='float32')) for key, blob in rows)
+    conn.close()
+    missing = {}
+    for key, chunk in zip(keys, chunks):
+        if key not in found:
+            missing.setdefault(key, chunk)
+    new_rows = []
+    if missing:
+        if embedder is None:
+            embedder = get_embedder()
+        encoded = np.asarray(embedder.encode(list(missing.values())), dtype='float32')
+        for key, vector in zip(missing, encoded):
+            found[key] = vector
+            new_rows.append((key, vector.tobytes()))
+    return np.vstack([found[key] for key in keys]), new_rows
+
+def _within_quota(chunks, embedder):
+    """The leading chunks whose text and vectors fit in RAG_TENANT_QUOTA_MB (0 = all of them)."""
+    budget = RAG_TENANT_QUOTA_MB * 1024 * 1024
+    if budget <= 0 or sum(4 * len(chunk) + 4 * 4096 for chunk in chunks) <= budget:
+        return chunks  # fits even at 4 bytes per character and 4096-d embeddings
+    if embedder is None:
+        embedder = get_embedder()
+    dim = getattr(embedder, 'get_sentence_embedding_dimension', lambda: None)()
+    dim = dim or len(np.asarray(embedder.encode(["dimension"]))[0])
+    used = 0
+    for n, chunk in enumerate(chunks):
+        used += len(chunk.encode('utf-8')) + 4 * dim
+        if used > budget:
+            print(f"RAG quota of {RAG_TENANT_QUOTA_MB} MB reached: indexing {n} of {len(chunks)} chunks")
+            return chunks[:n]
+    return chunks
+
+def _corpus_bytes(folder):
+    return sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder)) if os.path.isdir(folder) else 0
+
+def _read_chunks(corpus):
+    """chunks.json of a corpus, from whichever tier holds it (None if neither does)."""
+    import gzip
+    try:
+        with open(os.path.join(corpus_dir(corpus), 'chunks.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    try:
+        with gzip.open(os.path.join(archive_dir(corpus), 'chunks.json.gz'), 'rt') as f:
+            return json.load(f)
+    except (OSError, ValueError, EOFError):
+        return None
+
+def _remove_corpus(corpus):
+    import shutil
+    shutil.rmtree(corpus_dir(corpus), ignore_errors=True)
+    shutil.rmtree(archive_dir(corpus), ignore_errors=True)
+
+def _remove_released(corpus):
+    """Delete a released corpus's files unless a tenant registered the same content meanwhile.
+
+    Runs under the store's write lock: a concurrent build either registered the corpus before
+    (its row exists, the files stay) or registers it after the files are gone, and then
+    rewrites them because its post-registration check finds them missing.
+    """
+    conn = _store()
+    try:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if not conn.execute("SELECT 1 FROM corpora WHERE corpus_key = ?", (corpus,)).fetchone():
+                _remove_corpus(corpus)
+    finally:
+        conn.close()
+
+def _replace_json(path, data):
+    """Write `data` as JSON to `path` atomically; a unique temp file per writer, so concurrent
+    writers never interleave into the same file."""
+    import tempfile
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), prefix='.tmp-', suffix='.json', delete=False) as f:
+        json.dump(data, f)
+    try:
+        os.replace(f.name, path)
+    except OSError:
+        os.remove(f.name)
+        raise
+
+def _write_corpus(corpus, chunks, vectors, index_type):
+    import faiss
+    import tempfile
+    import shutil
+    index = new_index(vectors.shape[1], index_type, len(chunks))
+    vectors = _prepare(index, vectors)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    root = os.path.join(RAG_DIR, '_corpora')
+    os.makedirs(root, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=root, prefix='.tmp-')
+    with open(os.path.join(tmp, 'chunks.json'), 'w') as f:
+        json.dump(chunks, f)
+    faiss.write_index(index, os.path.join(tmp, 'faiss_index'))
+    try:
+        os.rename(tmp, corpus_dir(corpus))
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)  # built concurrently by another tenant; same content
+
+def _release(conn, corpus):
+    """Drop one reference to `corpus`; returns True if that was the last one (caller deletes the files)."""
+    row = conn.execute("SELECT model, refs FROM corpora WHERE corpus_key = ?", (corpus,)).fetchone()
+    if row is None:
+        return False
+    if row[1] > 1:
+        conn.execute("UPDATE corpora SET refs = refs - 1 WHERE corpus_key = ?", (corpus,))
+        return False
+    conn.execute("DELETE FROM corpora WHERE corpus_key = ?", (corpus,))
+    keys = {_chunk_key(row[0], chunk) for chunk in _read_chunks(corpus) or []}
+    conn.executemany("UPDATE chunk_vectors SET refs = refs - 1 WHERE chunk_key = ?", [(k,) for k in keys])
+    conn.execute("DELETE FROM chunk_vectors WHERE refs <= 0")
+    return True
 
-    # 2.  Fallback
-    return scrape_with_requests(url)
+def _point_tenant(email, corpus):
+    """Make `corpus.json` in the user's folder point at `corpus` (atomic)."""
+    user_dir = user_rag_dir(email)
+    os.makedirs(user_dir, exist_ok=True)
+    path = os.path.join(user_dir, 'corpus.json')
+    try:
+        with open(path) as f:
+            current = json.load(f).get("corpus")
+    except (OSError, ValueError):
+        current = None
+    if current == corpus:
+        return  # unchanged, keep the version (file mtime)
+    _replace_json(path, {"corpus": corpus})
+    for legacy in ('faiss_index', 'chunks.json'):  # per-user copies from before the shared store
+        try:
+            os.remove(os.path.join(user_dir, legacy))
+        except OSError:
+            pass
 
-def build_rag_for_user(email: str, scraped_text: str, embedder=None) -> bool:
-    """Build and save a RAG index for the user based on scraped text."""
+def build_rag_for_user(email: str, scraped_text: str, embedder=None, chunk_size=None, overlap=None,
+                       strategy=None, index_type=None) -> bool:
+    """Build (or reuse) the RAG corpus for scraped text and point the user at it."""
     if not scraped_text:
         return False
     # Split into chunks
-    chunks = [scraped_text[i:i+500] for i in range(0, len(scraped_text), 500)]
-    # Embedding
-    if embedder is None:
-        embedder = SentenceTransformer('all-MiniLM-L6-v2')  # Lightweight model
-    embeddings = embedder.encode(chunks)
-    # FAISS index
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(np.array(embeddings))
-    # Save per user
-    user_dir = os.path.join(RAG_DIR, email.replace('@', '_'))  # Safe folder name
-    os.makedirs(user_dir, exist_ok=True)
-    faiss.write_index(index, os.path.join(user_dir, 'faiss_index'))
-    with open(os.path.join(user_dir, 'chunks.json'), 'w') as f:
-        json.dump(chunks, f)
+    chunks = _within_quota(chunk_text(scraped_text, chunk_size, overlap, strategy), embedder)
+    if not chunks:
+        return False
+    model = _embedder_id(embedder)
+    index_type = index_type or RAG_INDEX_TYPE
+    keys = [_chunk_key(model, chunk) for chunk in chunks]
+    corpus = hashlib.sha256("\n".join([model, index_type] + keys).encode('utf-8')).hexdigest()
+    new_rows = []
+    if not os.path.exists(os.path.join(corpus_dir(corpus), 'faiss_index')) and not _rehydrate(corpus):
+        # Embedding (chunks already embedded for any tenant are reused)
+        vectors, new_rows = _embed_chunks(chunks, keys, embedder)
+        _write_corpus(corpus, chunks, vectors, index_type)
+    conn = _store()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("INSERT OR IGNORE INTO chunk_vectors (chunk_key, vector) VALUES (?, ?)", new_rows)
+        row = conn.execute("SELECT corpus_key FROM tenant_corpus WHERE email = ?", (email,)).fetchone()
+        previous = row[0] if row else None
+        dropped = False
+        if previous != corpus:
+            created = conn.execute("INSERT OR IGNORE INTO corpora (corpus_key, model, chunks, bytes, last_access) "
+                                   "VALUES (?, ?, ?, ?, ?)",
+                                   (corpus, model, len(chunks), _corpus_bytes(corpus_dir(corpus)), time.time())).rowcount
+            if created:
+                conn.executemany("UPDATE chunk_vectors SET refs = refs + 1 WHERE chunk_key = ?", [(k,) for k in set(keys)])
+            conn.execute("UPDATE corpora SET refs = refs + 1 WHERE corpus_key = ?", (corpus,))
+            conn.execute("INSERT INTO tenant_corpus (email, corpus_key, last_access) VALUES (?, ?, ?) "
+                         "ON CONFLICT(email) DO UPDATE SET corpus_key = excluded.corpus_key, last_access = excluded.last_access",
+                         (email, corpus, time.time()))
+            dropped = previous is not None and _release(conn, previous)
+    conn.close()
+    if not os.path.exists(os.path.join(corpus_dir(corpus), 'faiss_index')) and not _rehydrate(corpus):
+        # Its previous last tenant released it while we were registering; write it again
+        vectors, _ = _embed_chunks(chunks, keys, embedder)
+        _write_corpus(corpus, chunks, vectors, index_type)
+    _point_tenant(email, corpus)
+    if dropped:
+        _remove_released(previous)
     return True
 
-def retrieve_from_rag(email: str, query: str, top_k=3, embedder=None) -> str:
-    """Retrieve relevant chunks from the user's RAG index."""
-    user_dir = os.path.join(RAG_DIR, email.replace('@', '_'))
-    if not os.path.exists(os.path.join(user_dir, 'faiss_index')):
+def delete_rag(email: str):
+    """Remove the user's RAG index, releasing their reference to the shared corpus."""
+    import shutil
+    conn = _store()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT corpus_key FROM tenant_corpus WHERE email = ?", (email,)).fetchone()
+        conn.execute("DELETE FROM tenant_corpus WHERE email = ?", (email,))
+        dropped = row is not None and _release(conn, row[0])
+    conn.close()
+    shutil.rmtree(user_rag_dir(email), ignore_errors=True)
+    if dropped:
+        _remove_released(row[0])
+
+def store_stats():
+    """Sizes of the shared store: tenants, corpora per tier, stored chunk vectors and how much is shared."""
+    conn = _store()
+    tenants, = conn.execute("SELECT COUNT(*) FROM tenant_corpus").fetchone()
+    corpora, refs, chunks = conn.execute("SELECT COUNT(*), COALESCE(SUM(refs), 0), COALESCE(SUM(chunks), 0) FROM corpora").fetchone()
+    tiers = {tier: {"corpora": count, "bytes": size} for tier, count, size in
+             conn.execute("SELECT tier, COUNT(*), SUM(bytes) FROM corpora GROUP BY tier")}
+    vectors, vector_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM chunk_vectors").fetchone()
+    conn.close()
+    return {"tenants": tenants, "corpora": corpora, "corpus_refs": refs, "corpus_chunks": chunks,
+            "chunk_vectors": vectors, "chunk_vector_bytes": vector_bytes, "tiers": tiers}
+
+def _touch(email, corpus):
+    """Record that the tenant and corpus were used (at most once per RAG_ACCESS_RESOLUTION seconds)."""
+    now = time.time()
+    with _index_lock:
+        if now - _touched.get(corpus, 0) < RAG_ACCESS_RESOLUTION and now - _touched.get(email, 0) < RAG_ACCESS_RESOLUTION:
+            return
+        for key in (corpus, email):
+            _touched[key] = now
+            _touched.move_to_end(key)
+        # Entries older than the resolution no longer suppress a write, so they can go
+        while _touched and now - next(iter(_touched.values())) >= RAG_ACCESS_RESOLUTION:
+            _touched.popitem(last=False)
+    try:
+        conn = _store()
+        with conn:
+            conn.execute("UPDATE corpora SET last_access = ? WHERE corpus_key = ?", (now, corpus))
+            conn.execute("UPDATE tenant_corpus SET last_access = ? WHERE email = ?", (now, email))
+        conn.close()
+    except sqlite3.Error as e:
+        print(f"Recording RAG access failed: {e}")
+
+def _rehydrate(corpus):
+    """Bring an archived corpus back into the hot tier; False if there is no archive of it."""
+    import gzip
+    import shutil
+    import tempfile
+    with _rehydrate_lock:
+        if os.path.exists(os.path.join(corpus_dir(corpus), 'faiss_index')):
+            return True
+        root = os.path.join(RAG_DIR, '_corpora')
+        os.makedirs(root, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=root, prefix='.tmp-')
+        try:
+            for name in CORPUS_FILES:
+                with gzip.open(os.path.join(archive_dir(corpus), name + '.gz'), 'rb') as f_in, \
+                        open(os.path.join(tmp, name), 'wb') as f_out:
+                    shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            os.rename(tmp, corpus_dir(corpus))
+        except (OSError, EOFError):
+            shutil.rmtree(tmp, ignore_errors=True)
+            # Another process may have rehydrated it (and removed the archive) meanwhile
+            return os.path.exists(os.path.join(corpus_dir(corpus), 'faiss_index'))
+    conn = _store()
+    with conn:
+        conn.execute("UPDATE corpora SET tier = 'hot', bytes = ?, last_access = ? WHERE corpus_key = ?",
+                     (_corpus_bytes(corpus_dir(corpus)), time.time(), corpus))
+    conn.close()
+    return True
+
+def evict_corpus(corpus):
+    """Move a hot corpus into the compressed archive tier; True if it was moved."""
+    import gzip
+    import shutil
+    import tempfile
+    folder = corpus_dir(corpus)
+    if not os.path.exists(os.path.join(folder, 'faiss_index')):
+        return False
+    if not os.path.isdir(archive_dir(corpus)):
+        root = os.path.join(RAG_DIR, '_archive')
+        os.makedirs(root, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=root, prefix='.tmp-')
+        for name in CORPUS_FILES:
+            with open(os.path.join(folder, name), 'rb') as f_in, \
+                    gzip.open(os.path.join(tmp, name + '.gz'), 'wb', compresslevel=6) as f_out:
+                shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        try:
+            os.rename(tmp, archive_dir(corpus))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # archived concurrently; same content
+    conn = _store()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        still_used = conn.execute("UPDATE corpora SET tier = 'cold', bytes = ? WHERE corpus_key = ?",
+                                  (_corpus_bytes(archive_dir(corpus)), corpus)).rowcount
+    conn.close()
+    if not still_used:
+        shutil.rmtree(archive_dir(corpus), ignore_errors=True)  # released while we were archiving
+        return False
+    # Readers see the whole folder or none (then they rehydrate); the rename makes that atomic
+    trash = os.path.join(RAG_DIR, '_corpora', f'.evicted-{corpus}-{os.getpid()}')
+    try:
+        os.rename(folder, trash)
+    except OSError:
+        return False
+    shutil.rmtree(trash, ignore_errors=True)
+    with _index_lock:
+        _index_cache.pop(corpus, None)
+    return True
+
+def run_janitor(cold_after_days=None, budget_mb=None):
+    """Archive idle corpora and, beyond the disk budget, the least recently used hot ones.
+
+    Corpora idle for `cold_after_days` (default RAG_COLD_AFTER_DAYS) are evicted first; then,
+    while the hot tier is larger than `budget_mb` (default RAG_DISK_BUDGET_MB), the least
+    recently used. 0 disables either rule. Returns what was evicted and the tier sizes.
+    """
+    cold_after_days = RAG_COLD_AFTER_DAYS if cold_after_days is None else cold_after_days
+    budget_mb = RAG_DISK_BUDGET_MB if budget_mb is None else budget_mb
+    started = time.time()
+    conn = _store()
+    hot = conn.execute(
+        """SELECT corpus_key, bytes, COALESCE(last_access, CAST(strftime('%s', created_at) AS REAL))
+           FROM corpora WHERE tier = 'hot' ORDER BY 3"""
+    ).fetchall()
+    sized, refresh = [], []
+    for key, size, last in hot:
+        if not size:  # registered before tiering existed
+            size = _corpus_bytes(corpus_dir(key))
+            refresh.append((size, key))
+        sized.append((key, size, last))
+    with conn:
+        conn.executemany("UPDATE corpora SET bytes = ? WHERE corpus_key = ?", refresh)
+    conn.close()
+    idle, over_budget = [], []
+    total = sum(size for _, size, _ in sized)
+    for key, size, last in sized:  # least recently used first
+        if cold_after_days > 0 and last < started - cold_after_days * 86400:
+            idle.append(key)
+            total -= size
+        elif budget_mb > 0 and total > budget_mb * 1024 * 1024:
+            over_budget.append(key)
+            total -= size
+    evicted = {"idle": sum(evict_corpus(key) for key in idle),
+               "over_budget": sum(evict_corpus(key) for key in over_budget)}
+    return {"evicted": evicted, "tiers": store_stats()["tiers"], "seconds": round(time.time() - started, 3)}
+
+def start_janitor(interval=None):
+    """Run run_janitor() every `interval` seconds on a daemon thread, one process at a time."""
+    interval = RAG_JANITOR_INTERVAL if interval is None else interval
+    if interval <= 0:
         return None
-    # Load index and chunks
-    index = faiss.read_index(os.path.join(user_dir, 'faiss_index'))
-    with open(os.path.join(user_dir, 'chunks.json'), 'r') as f:
-        chunks = json.load(f)
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                os.makedirs(RAG_DIR, exist_ok=True)
+                with open(os.path.join(RAG_DIR, '.janitor.lock'), 'w') as lock:
+                    if fcntl:
+                        try:
+                            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            continue  # another worker is on it
+                    JANITOR["last_run"] = time.time()
+                    JANITOR["last_result"] = run_janitor()
+                    JANITOR["last_error"] = None
+            except Exception as e:
+                print(f"RAG janitor failed: {e}")
+                JANITOR["last_error"] = str(e)
+
+    thread = threading.Thread(target=loop, name="rag-janitor", daemon=True)
+    thread.start()
+    return thread
+
+def index_files(email: str):
+    """(cache key, folder) holding the user's faiss_index and chunks.json, or None."""
+    user_dir = user_rag_dir(email)
+    try:
+        with open(os.path.join(user_dir, 'corpus.json')) as f:
+            corpus = json.load(f)["corpus"]
+        return corpus, corpus_dir(corpus)
+    except (OSError, ValueError, KeyError):
+        pass
+    if os.path.exists(os.path.join(user_dir, 'faiss_index')):
+        return email, user_dir  # per-user copy from before the shared store
+    return None
+
+def rag_version(email: str):
+    """Version of the user's RAG index (mtime of its corpus pointer), or None if the user has none."""
+    user_dir = user_rag_dir(email)
+    for name in ('corpus.json', 'faiss_index'):
+        try:
+            return os.stat(os.path.join(user_dir, name)).st_mtime_ns
+        except OSError:
+            pass
+    return None
+
+def query_key(email: str, query: str):
+    """Coalescing key for a chat query: (tenant, RAG version, normalized query).
+
+    Users without a RAG index all get the same (context-free) prompt, so they share
+    tenant None; a rebuilt index changes the version and starts fresh computations.
+    """
+    version = rag_version(email) if email else None
+    normalized = " ".join(query.lower().split()).strip(" ?!.")
+    return (email if version else None, version, normalized)
+
+def load_rag(email: str):
+    """(index, chunks) for the user, or None. Cached in memory (LRU, one entry per corpus) until the files change.
+
+    An archived (cold) corpus is rehydrated transparently.
+    """
+    located = index_files(email)
+    if located is None:
+        return None
+    key, folder = located
+    shared = key != email
+    if shared:
+        _touch(email, key)
+    import faiss
+    for attempt in range(3):
+        try:
+            mtime = os.stat(os.path.join(folder, 'faiss_index')).st_mtime_ns
+        except OSError:
+            mtime = None
+        with _index_lock:
+            cached = _index_cache.get(key)
+            if cached and (cached[0] == mtime or (mtime is None and shared)):
+                # (an evicted corpus that is still in memory keeps being served from there)
+                _index_cache.move_to_end(key)
+                return cached[1], cached[2]
+        try:
+            if mtime is None:
+                raise FileNotFoundError(folder)
+            index = faiss.read_index(os.path.join(folder, 'faiss_index'))
+            with open(os.path.join(folder, 'chunks.json'), 'r') as f:
+                chunks = json.load(f)
+            break
+        except (OSError, RuntimeError):
+            # Archived (or archived between the stat and the reads): rehydrate and retry
+            if attempt == 2 or not shared or not _rehydrate(key):
+                return None
+    with _index_lock:
+        _index_cache[key] = (mtime, index, chunks)
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > RAG_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index, chunks
+
+def search_rag(email: str, query: str, top_k=3, embedder=None) -> list:
+    """Ranked (chunk_id, chunk, distance) hits from the user's RAG index, best first."""
+    loaded = load_rag(email)
+    if loaded is None:
+        return []
+    index, chunks = loaded
     # Embed query
     if embedder is None:
-        embedder = SentenceTransformer('all-MiniLM-L6-v2')
-    query_emb = embedder.encode([query])
+        embedder = get_embedder()
+    query_emb = _prepare(index, embedder.encode([query]))
     # Search
-    _, indices = index.search(np.array(query_emb), top_k)
-    retrieved = [chunks[i] for i in indices[0] if i < len(chunks)]
-    return ' '.join(retrieved) if retrieved else None
\ No newline at end of file
+    distances, indices = index.search(query_emb, top_k)
+    return [(int(i), chunks[i], float(d)) for d, i in zip(distances[0], indices[0]) if 0 <= i < len(chunks)]
+
+def retrieve_batch(pairs, top_k=3, embedder=None) -> list:
+    """retrieve_from_rag for many (email, query) pairs, in input order.
+
+    All queries are encoded in one call and each distinct index (tenants sharing a corpus
+    share one) is searched once with the matrix of its queries.
+    """
+    results = [None] * len(pairs)
+    groups = {}  # id(index) -> (index, chunks, [positions in pairs])
+    loaded = {}
+    for i, (email, _) in enumerate(pairs):
+        if email and email not in loaded:
+            loaded[email] = load_rag(email)
+        if email and loaded[email]:
+            index, chunks = loaded[email]
+            groups.setdefault(id(index), (index, chunks, []))[2].append(i)
+    wanted = [i for _, _, positions in groups.values() for i in positions]
+    if not wanted:
+        return results
+    if embedder is None:
+        embedder = get_embedder()
+    vectors = np.asarray(embedder.encode([pairs[i][1] for i in wanted]), dtype='float32')
+    row = {i: n for n, i in enumerate(wanted)}
+    for index, chunks, positions in groups.values():
+        _, indices = index.search(_prepare(index, vectors[[row[i] for i in positions]]), top_k)
+        for i, hits in zip(positions, indices):
+            retrieved = [chunks[h] for h in hits if 0 <= h < len(chunks)]
+            results[i] = ' '.join(retrieved) if retrieved else None
+    return results
+
+def retrieve_from_rag(email: str, query: str, top_k=3, embedder=None) -> str:
+    """Retrieve relevant chunks from the user's RAG index."""
+    retrieved = [chunk for _, chunk, _ in search_rag(email, query, top_k, embedder)]
+    return ' '.join(retrieved) if retrieved else None
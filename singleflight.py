@@ -0,0 +1,55 @@
+# singleflight.py
+# Request coalescing: concurrent calls with the same key share one in-flight computation and all
+# get its result (or its exception). Thread callers (sync FastAPI endpoints, Streamlit sessions)
+# and asyncio callers use the same table, so they coalesce with each other too.
+# Nothing is cached: once the computation finishes, the next call with that key runs again.
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future of the running computation
+        self.leaders = 0
+        self.shared = 0
+
+    def _join(self, key):
+        """(future, is_leader) for `key`, registering a new call if none is running."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.shared += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key, future, fn):
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def do(self, key, fn):
+        """Run fn() once per key at a time; returns (result, shared)."""
+        future, leader = self._join(key)
+        if leader:
+            self._finish(key, future, fn)
+        return future.result(), not leader
+
+    async def do_async(self, key, fn):
+        """Async variant of do(): the blocking fn runs in a worker thread, followers just await it."""
+        future, leader = self._join(key)
+        if leader:
+            await asyncio.to_thread(self._finish, key, future, fn)
+        return await asyncio.wrap_future(future), not leader
+
+    def metrics(self):
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "shared": self.shared}
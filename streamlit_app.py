@@ -1,40 +1,82 @@
 import time
-import sqlite3
 import json
 import difflib
 import logging
-import google.generativeai as genai
 import streamlit as st
-from sentence_transformers import SentenceTransformer
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
-from config import DB_NAME, GEMINI_API_KEY, HF_API_KEY, KB_FILE, RAG_DIR
-from rag import scrape_website, build_rag_for_user, retrieve_from_rag
-from database import save_lead, save_order
-
-# Configure AI
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Products Data (Shared)
-PRODUCTS = [
-    {"id": 1, "name": "Wireless Headphones", "price": 4500},
-    {"id": 2, "name": "Smartwatch", "price": 7500},
-    {"id": 3, "name": "Bluetooth Speaker", "price": 3800},
-    {"id": 4, "name": "USB-C Charger", "price": 1200},
-    {"id": 5, "name": "Gaming Mouse", "price": 3100},
-    {"id": 6, "name": "HP laptop elitebook prox", "price": 150000},
-]
-
-# Cached Embedder
+from config import GEMINI_API_KEY, HF_API_KEY, KB_FILE, RAG_DIR, BACKEND_URL, ADMIN_TOKEN, init_app
+from chat_view import render_chat, append_bubble, update_bubble, reset_window, memory_panel
+from order_form import render_order_form
+import api_client
+
+# Thin-client mode: chat, orders and sessions go to the app.py API, which holds all models and data
+THIN_CLIENT = bool(BACKEND_URL)
+# The local stack (RAG, database, catalog, order matcher) is only loaded when this process answers itself
+if not THIN_CLIENT:
+    from rag import ingest_url, retrieve_from_rag, query_key
+    from singleflight import SingleFlight
+    from memory import load_memory, remember, fingerprint, build_prompt
+    from database import save_lead, save_order, session_emails, session_history
+    from catalog import get_product, list_products, search_products
+    from matcher import order_reply
+if THIN_CLIENT and not ADMIN_TOKEN:
+    logger.warning("ADMIN_TOKEN is not set: the backend refuses /sessions, so previous chat sessions are not listed")
+
+# One-time process startup (DB tables, RAG folder) instead of import side effects
+@st.cache_resource(show_spinner=False)
+def startup():
+    init_app()
+
+if not THIN_CLIENT:
+    startup()
+
+# Gemini is imported on first use; the embedder is loaded lazily by rag.get_embedder()
 @st.cache_resource(show_spinner=False)
-def load_embedder():
-    return SentenceTransformer('all-MiniLM-L6-v2')
+def load_genai():
+    import google.generativeai as genai
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai
+
+# Shared by every session in this process, so concurrent identical questions coalesce
+@st.cache_resource(show_spinner=False)
+def llm_flights():
+    return SingleFlight()
+
+# ---- Data access: local modules, or the backend API in thin-client mode ----
+def find_products(query):
+    """Up to 50 products matching `query`, or the first page of the catalog."""
+    if THIN_CLIENT:
+        return api_client.list_products(1, 50, query or None)[0]
+    return search_products(query, 50) if query else list_products(1, 50)[0]
+
+def lookup_product(product_id):
+    return api_client.get_product(product_id) if THIN_CLIENT else get_product(product_id)
+
+def submit_order(name, address, contact_number, product, quantity, idempotency_key):
+    """Place an order and return the confirmation message."""
+    if THIN_CLIENT:
+        return api_client.place_order(name, address, contact_number, product["id"], quantity, idempotency_key)["response"]
+    save_order({
+        "customer_name": name,
+        "address": address,
+        "contact_number": contact_number,
+        "item_id": product["id"],
+        "item": product["name"],
+        "price": product["price"],
+        "quantity": quantity,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "idempotency_key": idempotency_key,
+    })
+    return f"Order confirmed for {quantity} x {product['name']}! We'll contact you soon on {contact_number}."
 
-# Pre-load to avoid delay on first chat
-with st.spinner('Initializing AI...'):
-    embedder = load_embedder()
+def chat_sessions():
+    return api_client.session_emails() if THIN_CLIENT else session_emails()
+
+def chat_history(email):
+    return api_client.session_history(email) if THIN_CLIENT else session_history(email)
 
 st.set_page_config(page_title="AI Business Support ChatBot", layout="wide")
 
@@ -82,6 +124,11 @@ st.markdown("""
     font-size: 15px;
     animation: fadeIn 0.3s ease-in-out;
 }
+.chat-row {
+    display: flex;
+    flex-direction: column;
+    padding: 8px 15px 0;
+}
 @keyframes fadeIn {
     from { opacity: 0; transform: translateY(10px); }
     to { opacity: 1; transform: translateY(0); }
@@ -137,26 +184,30 @@ st.markdown("""
 st.title("Business Support ChatBot")
 st.subheader("AI-powered ChatBot with Personalization")
 
+memory_panel()
+
 # ---- Sidebar for Previous Chat Sessions ----
 with st.sidebar:
     st.header("Previous Chat Sessions")
-    # Fetch previous leads from DB (emails as sessions)
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT DISTINCT email FROM leads ORDER BY timestamp DESC")
-    sessions = [row[0] for row in c.fetchall()]
-    conn.close()
+    # Previous leads (emails as sessions)
+    try:
+        sessions = chat_sessions()
+    except api_client.BackendError as e:
+        logger.error(f"Sessions: {e}")
+        sessions = []
     
     if sessions:
         selected_session = st.selectbox("Select a Session to View", ["New Session"] + sessions)
+        if selected_session != st.session_state.get("viewed_session"):
+            st.session_state.viewed_session = selected_session
+            reset_window()
         if selected_session != "New Session":
             # Load chat history for selected email
-            conn = sqlite3.connect(DB_NAME)
-            c = conn.cursor()
-            c.execute("SELECT user_message, bot_response FROM leads WHERE email = ? ORDER BY timestamp", (selected_session,))
-            history = c.fetchall()
-            conn.close()
-            st.session_state.history = [("user", msg) if i % 2 == 0 else ("bot", msg) for i, (msg, resp) in enumerate(history)]
+            st.session_state.history = [
+                (role, text)
+                for user_message, bot_response in chat_history(selected_session)
+                for role, text in (("user", user_message), ("bot", bot_response))
+            ]
             st.session_state.user_email = selected_session  # Switch to this session's email
     else:
         st.info("No previous sessions found.")
@@ -174,6 +225,8 @@ if "order_mode" not in st.session_state:
     st.session_state.order_mode = False
 if "link_provided" not in st.session_state:
     st.session_state.link_provided = False
+if "order_draft" not in st.session_state:
+    st.session_state.order_draft = None
 
 # ---- Logic Functions (Direct execution for Cloud Stability) ----
 def search_knowledge_base(query):
@@ -191,20 +244,21 @@ def search_knowledge_base(query):
         logger.error(f"KB Error: {e}")
     return None
 
-def get_gemini_response(query, email=None):
+def get_gemini_response(query, email=None, memory=None):
     logger.info(f"Gemini: Start. Query='{query}'")
     context = None
     if email:
         logger.info(f"Gemini: Retrieving RAG for {email}")
-        context = retrieve_from_rag(email, query, embedder=embedder)
+        context = retrieve_from_rag(email, query)
 
-    prompt = f"Answer based on context: {context}. Query: {query}" if context else query
+    # Website context + conversation memory, kept within the prompt token budget
+    prompt = build_prompt(query, context, memory)
     
     models = ["gemini-2.5-flash", "gemini-flash-latest", "gemini-pro-latest", "gemini-2.0-flash-exp"]
     for m in models:
         try:
             logger.info(f"Gemini: Trying model {m}...")
-            model = genai.GenerativeModel(m)
+            model = load_genai().GenerativeModel(m)
             out = model.generate_content(prompt)
             if out and out.text: 
                 logger.info(f"Gemini: Success with {m}")
@@ -219,23 +273,38 @@ def get_huggingface_response(query, email=None):
     # Simplified fallback
     return None
 
-def process_chat(name, email, message):
+def backend_chat(name, email, message, on_delta=None):
+    """process_chat through the backend's /chat/stream; on_delta(text so far) as the reply streams in."""
+    text = ""
+    try:
+        for event in api_client.chat_stream(name, email, message):
+            if "delta" in event:
+                text += event["delta"]
+                if on_delta:
+                    on_delta(text)
+            elif event.get("done"):
+                st.session_state.order_draft = event.get("order_draft")
+                return event["response"], event.get("action")
+    except api_client.BackendError as e:
+        logger.error(f"Backend: {e}")
+        if e.retry_after:
+            return f"We're receiving a lot of messages right now. Please try again in {e.retry_after} seconds.", None
+    return text or "I'm having trouble connecting. Please try again later.", None
+
+def process_chat(name, email, message, on_delta=None):
     logger.info(f"ProcessChat: Message='{message}'")
+    if THIN_CLIENT:
+        return backend_chat(name, email, message, on_delta)
     query = message.lower()
     
     # 0. Order Intent Check
     keywords = ["order", "buy", "purchase", "delivery", "book", "cart", "item", "product", "place order"]
     if any(word in query for word in keywords):
         logger.info("ProcessChat: Order intent detected.")
-        product_list = "\n".join([f"{p['id']}. {p['name']} - Rs {p['price']}" for p in PRODUCTS])
-        response = (
-            "Here's our product list:\n\n"
-            f"{product_list}\n\n"
-            "Please reply with the Product ID to place your order!"
-        )
+        response, action, st.session_state.order_draft = order_reply(message)
         # Background save
         save_lead(name, email, message, response)
-        return response, "show_products"
+        return response, action
 
     # 1. URL Scraping
     if "http" in message:
@@ -244,9 +313,10 @@ def process_chat(name, email, message):
         if url:
             url = url.group(0)
             with st.spinner("Analyzing website..."):
-                scraped = scrape_website(url)
-                if scraped and build_rag_for_user(email, scraped, embedder=embedder):
-                    resp = "Website processed! Ask me questions about it."
+                status = ingest_url(email, url)
+                if status:
+                    resp = ("Website unchanged since it was last processed. Ask me questions about it."
+                            if status == "unchanged" else "Website processed! Ask me questions about it.")
                     save_lead(name, email, message, resp)
                     return resp, None
                 else:
@@ -258,8 +328,12 @@ def process_chat(name, email, message):
         save_lead(name, email, message, kb)
         return kb, None
 
-    # 3. Gemini
-    gemini = get_gemini_response(query, email)
+    # 3. Gemini (identical concurrent questions across sessions share one call)
+    memory = load_memory(email)
+    gemini, shared = llm_flights().do(query_key(email, query) + (fingerprint(memory),),
+                                      lambda: get_gemini_response(query, email, memory))
+    if shared:
+        logger.info("ProcessChat: Reused an in-flight Gemini answer.")
     if gemini: 
         save_lead(name, email, message, gemini)
         return gemini, None
@@ -267,54 +341,15 @@ def process_chat(name, email, message):
     return "I'm having trouble connecting. Please try again later.", None
 
 # ---- Chat Display Function ----
-def render_chat():
-    chat_html = "<div class='chat-container'>"
-    for role, msg in st.session_state.history:
-        if role == "user":
-            chat_html += f"<div class='chat-bubble-user'>{msg}</div>"
-        else:
-            chat_html += f"<div class='chat-bubble-bot'>{msg}</div>"
-    chat_html += "</div>"
-    return chat_html
 
-chat_placeholder = st.empty()
-chat_placeholder.markdown(render_chat(), unsafe_allow_html=True)
+# Latest messages only (cached bubble HTML); new bubbles this run are appended to live_chat
+live_chat = render_chat(st.session_state.history)
 
 # ---- Order Form (Only when order_mode is True) ----
 if st.session_state.order_mode:
-    st.subheader("Place Your Order")
-    # Use globally defined PRODUCTS
-    with st.form(key="order_form"):
-        item_id = st.selectbox(
-            "Select Product",
-            options=[p["id"] for p in PRODUCTS],
-            format_func=lambda x: f"ID {x}: {next(p['name'] for p in PRODUCTS if p['id'] == x)} - Rs {next(p['price'] for p in PRODUCTS if p['id'] == x)}"
-        )
-        address = st.text_input("Delivery Address", placeholder="House #, Street, City")
-        contact_number = st.text_input("Contact Number", placeholder="+92xxxxxxxxxx")
-        submit = st.form_submit_button("Submit Order")
-        if submit:
-            if not address or not contact_number:
-                st.error("Please fill all fields!")
-            else:
-                product = next((p for p in PRODUCTS if p["id"] == item_id), None)
-                with st.spinner("Placing your order..."):
-                    # Direct DB Save
-                    save_order({
-                        "customer_name": name or "Guest",
-                        "address": address,
-                        "contact_number": contact_number,
-                        "item": product["name"],
-                        "price": product["price"],
-                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-                    })
-                    
-                    reply = f"Order confirmed for {product['name']}! We'll contact you soon on {contact_number}."
-                    st.session_state.history.append(("bot", reply))
-                    st.success("Order placed successfully!")
-                    st.session_state.order_mode = False
-                    time.sleep(2)
-                    st.rerun()
+    if render_order_form(name, find_products, lookup_product, submit_order):
+        time.sleep(2)
+        st.rerun()
 
 # --- Normal Chat Input (Only if NOT in order mode) ----
 if not st.session_state.order_mode:
@@ -335,26 +370,32 @@ if not st.session_state.order_mode:
             if proceed:
                 # Add user message instantly
                 st.session_state.history.append(("user", user_input))
-                chat_placeholder.markdown(render_chat(), unsafe_allow_html=True)
+                append_bubble(live_chat, "user", user_input)
                 
                 # Show typing animation
                 st.session_state.history.append(("bot", "Thinking..."))
-                chat_placeholder.markdown(render_chat(), unsafe_allow_html=True)
+                reply_slot = append_bubble(live_chat, "bot", "Thinking...")
                 
-                # Call Logic Directly (No API)
+                # Local logic, or the backend API (streamed into the bubble) in thin-client mode
                 message = f"{user_input} (Purpose: {purpose})" if purpose else user_input
+                action = None
                 
                 try:
-                    bot_reply, action = process_chat(name, email, message)
+                    bot_reply, action = process_chat(
+                        name, email, message,
+                        on_delta=lambda text: update_bubble(reply_slot, "bot", text, cache=False)
+                    )
+                    if not THIN_CLIENT:
+                        remember(email, message, bot_reply)  # the backend keeps its own memory
                     
                     st.session_state.history[-1] = ("bot", bot_reply)
-                    if action == "show_products":
+                    if action in ("show_products", "confirm_order"):
                         st.session_state.order_mode = True
                         
                 except Exception as e:
                     st.session_state.history[-1] = ("bot", f"Processing error: {str(e)}")
                 
-                chat_placeholder.markdown(render_chat(), unsafe_allow_html=True)
+                update_bubble(reply_slot, "bot", st.session_state.history[-1][1])
                 # Force rerun to show updated UI state
-                if action == "show_products":
+                if action in ("show_products", "confirm_order"):
                     st.rerun()
\ No newline at end of file
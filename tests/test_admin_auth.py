@@ -0,0 +1,45 @@
+# Endpoints serving customer data or spending LLM calls are refused unless ADMIN_TOKEN is
+# configured and sent.
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+
+PROTECTED = [
+    ("GET", "/sessions", None),
+    ("GET", "/sessions/a@example.com/history", None),
+    ("GET", "/admin/export/leads", None),
+    ("GET", "/admin/leads/search?q=hello", None),
+    ("GET", "/admin/leads/archive", None),
+    ("GET", "/admin/leads/archive/2024-01", None),
+    ("POST", "/chat/batch", {"messages": []}),
+    ("GET", "/admin/memory", None),
+    ("GET", "/admin/orders/stats", None),
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, "session_emails", lambda limit: ["a@example.com"])
+    monkeypatch.setattr(app, "session_history", lambda email, limit: [["hi", "hello"]])
+    return TestClient(app.app)  # not entered: no startup threads touching the real database
+
+
+@pytest.mark.parametrize("method, path, body", PROTECTED)
+def test_refused_without_configured_token(client, monkeypatch, method, path, body):
+    monkeypatch.setattr(app, "ADMIN_TOKEN", None)
+    assert client.request(method, path, json=body).status_code == 503
+
+
+@pytest.mark.parametrize("method, path, body", PROTECTED)
+def test_token_required(client, monkeypatch, method, path, body):
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "secret")
+    assert client.request(method, path, json=body).status_code == 401
+    assert client.request(method, path, json=body, headers={"X-Admin-Token": "wrong"}).status_code == 401
+
+
+@pytest.mark.parametrize("path", ["/sessions", "/sessions/a@example.com/history"])
+def test_sessions_with_token(client, monkeypatch, path):
+    monkeypatch.setattr(app, "ADMIN_TOKEN", "secret")
+    assert client.get(path, headers={"X-Admin-Token": "secret"}).status_code == 200
@@ -0,0 +1,71 @@
+# /chat/stream must never hold an LLM slot it cannot release.
+
+import asyncio
+import gc
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+
+
+@pytest.fixture
+def llm_stubbed(monkeypatch):
+    """No quick answers, no Gemini, no database: the stream yields two canned deltas."""
+    monkeypatch.setattr(app, "quick_answer", lambda req: None)
+    monkeypatch.setattr(app, "load_memory", lambda email: None)
+    monkeypatch.setattr(app, "build_llm_prompt", lambda query, email, memory: query)
+    monkeypatch.setattr(app, "stream_gemini_response", lambda prompt, deadline: iter(["Hello ", "there"]))
+    monkeypatch.setattr(app, "save_lead", lambda *args: None)
+    monkeypatch.setattr(app, "remember", lambda *args: None)
+
+
+def request(email="stream@example.com"):
+    return app.ChatRequest(name="Test", email=email, message="tell me something")
+
+
+def test_unstarted_stream_holds_no_slot(llm_stubbed):
+    response = app.chat_stream(request())
+    assert app.LLM_LIMITER.metrics()["active"] == 0
+    asyncio.run(response.body_iterator.aclose())
+    del response
+    gc.collect()
+    assert app.LLM_LIMITER.metrics()["active"] == 0
+
+
+def test_stream_closed_after_first_chunk_releases_slot(llm_stubbed):
+    response = app.chat_stream(request())
+
+    async def first_chunk_then_close():
+        chunk = await response.body_iterator.__anext__()
+        assert app.LLM_LIMITER.metrics()["active"] == 1
+        await response.body_iterator.aclose()
+        return chunk
+
+    assert json.loads(asyncio.run(first_chunk_then_close())) == {"delta": "Hello "}
+    del response
+    gc.collect()
+    assert app.LLM_LIMITER.metrics()["active"] == 0
+
+
+def test_full_stream_releases_slot(llm_stubbed):
+    client = TestClient(app.app)  # not entered: no startup threads touching the real database
+    response = client.post("/chat/stream", json={"name": "Test", "email": "full@example.com", "message": "hi there"})
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-1]["done"] and events[-1]["response"] == "Hello there"
+    assert app.LLM_LIMITER.metrics()["active"] == 0
+
+
+def test_busy_limiter_ends_stream_with_error_line(llm_stubbed, monkeypatch):
+    def refuse(deadline):
+        raise app.Rejected("queue_full", 3)
+    monkeypatch.setattr(app.LLM_LIMITER, "acquire", refuse)
+    response = app.chat_stream(request("busy@example.com"))
+
+    async def read_all():
+        return [json.loads(chunk) async for chunk in response.body_iterator]
+
+    events = asyncio.run(read_all())
+    assert len(events) == 1 and events[0]["done"]
+    assert events[0]["error"] == "queue_full" and events[0]["retry_after"] == 3
@@ -0,0 +1,57 @@
+# Embedding backends must agree with the torch reference (embedders.drift). Uses a tiny model
+# (EMBED_TEST_MODEL) that has to be in the local Hugging Face cache or downloadable; backend
+# checks are skipped when the model, sentence-transformers or onnxruntime is not available.
+
+import os
+
+import numpy as np
+import pytest
+
+import embedders
+
+MODEL = os.getenv("EMBED_TEST_MODEL", "sentence-transformers-testing/stsb-bert-tiny-safetensors")
+TEXTS = [
+    "What are your business hours?",
+    "Do you ship to Karachi and Lahore?",
+    "I want to order two pairs of wireless headphones",
+    "Our return policy allows refunds within 30 days of delivery.",
+    "",
+    "a",
+]
+# Minimum per-text cosine against torch: exact backends only differ by float rounding
+MIN_COSINE = {"torch": 0.9999, "onnx": 0.999, "torch-int8": 0.95}
+
+
+def test_drift_is_row_wise_cosine():
+    rng = np.random.default_rng(0)
+    reference = rng.normal(size=(4, 8)).astype(np.float32)
+    assert embedders.drift(reference, reference * 3) == pytest.approx({"min": 1.0, "mean": 1.0}, abs=1e-6)
+    flipped = reference.copy()
+    flipped[0] = -flipped[0]
+    result = embedders.drift(reference, flipped)
+    assert result["min"] == pytest.approx(-1.0, abs=1e-6)
+    assert result["mean"] == pytest.approx(0.5, abs=1e-6)
+
+
+def encode(backend):
+    pytest.importorskip("sentence_transformers")
+    if backend.startswith("onnx"):
+        pytest.importorskip("onnxruntime")
+    try:
+        embedder = embedders.load_embedder(backend, MODEL)
+    except (OSError, ValueError, ImportError) as e:  # model not cached / offline, missing extra
+        pytest.skip(f"{backend} backend with {MODEL} unavailable: {e}")
+    return embedder.encode(TEXTS)
+
+
+@pytest.fixture(scope="module")
+def reference():
+    return encode("torch")
+
+
+@pytest.mark.parametrize("backend", sorted(MIN_COSINE))
+def test_backend_matches_torch(reference, backend):
+    vectors = encode(backend)
+    assert vectors.shape == reference.shape
+    assert vectors.dtype == np.float32
+    assert embedders.drift(reference, vectors)["min"] >= MIN_COSINE[backend]
@@ -0,0 +1,25 @@
+# Workers starting together must import the legacy orders.json and backfill the aggregates once.
+
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER = "import database; database.init_orders()"
+
+
+def test_concurrent_init_imports_once(tmp_path):
+    orders = [{"customer_name": f"c{i}", "contact_number": str(i), "item": "Mug", "price": 10,
+               "quantity": 2, "timestamp": "2024-01-02T10:00:00"} for i in range(20000)]
+    (tmp_path / "orders.json").write_text(json.dumps(orders))
+    env = dict(os.environ, DB_NAME=str(tmp_path / "db.sqlite"), ORDERS_FILE=str(tmp_path / "orders.json"),
+               PYTHONPATH=ROOT)
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER], cwd=tmp_path, env=env) for _ in range(12)]
+    assert all(worker.wait(timeout=60) == 0 for worker in workers)
+
+    conn = sqlite3.connect(tmp_path / "db.sqlite")
+    assert conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0] == 20000
+    assert conn.execute("SELECT orders, units, revenue FROM order_stats_daily").fetchall() == [(20000, 40000, 400000)]
+    conn.close()
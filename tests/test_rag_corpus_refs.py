@@ -0,0 +1,71 @@
+# Shared RAG corpora: a released corpus's files survive a tenant that registers the same content
+# before they are removed; tenant metadata writes are atomic under concurrency.
+
+import json
+import os
+import threading
+
+import pytest
+
+import rag
+from benchmarks.hash_embedder import HashEmbedder
+
+SITE_A = "Our shop sells handmade mugs and plates. " * 40
+SITE_B = "We repair bicycles and sell spare parts. " * 40
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag, "RAG_DIR", str(tmp_path))
+    return tmp_path
+
+
+def corpus_of(email):
+    with open(os.path.join(rag.user_rag_dir(email), "corpus.json")) as f:
+        return json.load(f)["corpus"]
+
+
+def index_exists(corpus):
+    return os.path.exists(os.path.join(rag.corpus_dir(corpus), "faiss_index"))
+
+
+def test_released_corpus_kept_when_reregistered(store, monkeypatch):
+    embedder = HashEmbedder()
+    assert rag.build_rag_for_user("a@example.com", SITE_A, embedder=embedder)
+    shared = corpus_of("a@example.com")
+    # a moves to other content; hold back the file removal to interleave another tenant
+    remove_released, released = rag._remove_released, []
+    monkeypatch.setattr(rag, "_remove_released", released.append)
+    assert rag.build_rag_for_user("a@example.com", SITE_B, embedder=embedder)
+    assert released == [shared]
+    assert rag.build_rag_for_user("b@example.com", SITE_A, embedder=embedder)
+    assert corpus_of("b@example.com") == shared
+    remove_released(shared)
+    assert index_exists(shared)
+
+
+def test_released_corpus_removed_when_unreferenced(store):
+    embedder = HashEmbedder()
+    assert rag.build_rag_for_user("a@example.com", SITE_A, embedder=embedder)
+    first = corpus_of("a@example.com")
+    assert rag.build_rag_for_user("a@example.com", SITE_B, embedder=embedder)
+    assert not index_exists(first)
+    assert index_exists(corpus_of("a@example.com"))
+
+
+def test_concurrent_json_writes_are_atomic(store):
+    path = os.path.join(str(store), "corpus.json")
+
+    def write(i):
+        for _ in range(50):
+            rag._replace_json(path, {"corpus": str(i) * 64})
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(path) as f:
+        value = json.load(f)["corpus"]
+    assert len(set(value)) == 1
+    assert os.listdir(str(store)) == ["corpus.json"]
@@ -0,0 +1,25 @@
+# rag._touch throttles access writes without keeping an entry per tenant forever.
+
+import sqlite3
+import time
+
+import rag
+
+
+def test_touched_entries_are_pruned(monkeypatch):
+    writes = []
+
+    def store():
+        writes.append(1)
+        raise sqlite3.Error("no store in tests")
+
+    monkeypatch.setattr(rag, "_store", store)
+    monkeypatch.setattr(rag, "RAG_ACCESS_RESOLUTION", 0.05)
+    monkeypatch.setattr(rag, "_touched", rag.OrderedDict())
+    for i in range(500):
+        rag._touch(f"user{i}@example.com", f"corpus{i}")
+    rag._touch("user0@example.com", "corpus0")  # within the resolution: no second write
+    assert len(writes) == 500
+    time.sleep(0.06)
+    rag._touch("late@example.com", "late")
+    assert list(rag._touched) == ["late", "late@example.com"]